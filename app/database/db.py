@@ -1,22 +1,53 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
-from .models import Base
-from app.storage.config import DB_USER, DB_PASS, DB_HOST, DB_PORT, DB_NAME
+from .models import Base, LEGACY_INDEXES, LoaderState
+from .partitions import ensure_upcoming_partitions, forget_partitions, is_partitioned
+from app.storage.config import (
+    DB_USER, DB_PASS, DB_HOST, DB_PORT, DB_NAME,
+    DB_CONNECT_TIMEOUT,
+    DB_STATEMENT_CACHE_SIZE,
+    DB_READ_MAX_OVERFLOW,
+    DB_READ_POOL_SIZE,
+    DB_REPLICA_HOSTS,
+    DB_REPLICA_RETRY_INTERVAL,
+    DB_WRITE_MAX_OVERFLOW,
+    DB_WRITE_POOL_SIZE,
+)
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+
+def database_url(host: str, port: str) -> str:
+    """URL подключения для asyncpg"""
+    return f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{host}:{port}/{DB_NAME}"
+
+
+def make_engine(host: str, port: str, pool_size: int, max_overflow: int) -> AsyncEngine:
+    """Асинхронный движок со своим пулом соединений"""
+    return create_async_engine(
+        database_url(host, port),
+        echo=False,  # Установите True для отладки SQL-запросов
+        pool_pre_ping=True,  # Проверка соединения перед использованием
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        connect_args={
+            'timeout': DB_CONNECT_TIMEOUT,
+            # Кэш подготовленных выражений SQLAlchemy/asyncpg на соединение
+            'prepared_statement_cache_size': DB_STATEMENT_CACHE_SIZE,
+        },
+    )
+
+
 # Формируем URL подключения для asyncpg
-DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-
-# Создаем асинхронный движок
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=False,  # Установите True для отладки SQL-запросов
-    pool_pre_ping=True,  # Проверка соединения перед использованием
-    pool_size=10,
-    max_overflow=20
-)
+DATABASE_URL = database_url(DB_HOST, DB_PORT)
+
+# Движок записи (основной сервер): загрузчик, миграции, служебные запросы
+engine = make_engine(DB_HOST, DB_PORT, DB_WRITE_POOL_SIZE, DB_WRITE_MAX_OVERFLOW)
 
 # Создаем фабрику сессий
 AsyncSessionLocal = async_sessionmaker(
@@ -26,19 +57,142 @@ AsyncSessionLocal = async_sessionmaker(
 )
 
 
+class ReadTarget:
+    """Сервер для чтения (реплика или основной) со своим пулом соединений"""
+
+    def __init__(self, name: str, engine: AsyncEngine):
+        self.name = name
+        self.engine = engine
+        self.sessionmaker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        self.down_until = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def mark_down(self, error: Exception):
+        """Исключает сервер из маршрутизации на DB_REPLICA_RETRY_INTERVAL секунд"""
+        self.down_until = time.monotonic() + DB_REPLICA_RETRY_INTERVAL
+        logger.warning(
+            f"Сервер чтения {self.name} недоступен ({error}), "
+            f"повторная попытка через {DB_REPLICA_RETRY_INTERVAL:.0f} с"
+        )
+
+
+class ReadRouter:
+    """
+    Распределяет аналитические запросы по серверам чтения.
+
+    Доступные реплики выбираются по кругу. Если к реплике не удалось
+    подключиться, она исключается на DB_REPLICA_RETRY_INTERVAL секунд,
+    и запрос уходит на следующую; последний вариант — основной сервер
+    (через отдельный пул чтения, не общий с загрузчиком).
+    """
+
+    def __init__(self, replicas: List[ReadTarget], primary: ReadTarget):
+        self.replicas = replicas
+        self.primary = primary
+        self._next = 0
+
+    def candidates(self) -> List[ReadTarget]:
+        """Порядок попыток для очередного запроса"""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if healthy:
+            start = self._next % len(healthy)
+            self._next += 1
+            healthy = healthy[start:] + healthy[:start]
+        return healthy + [self.primary]
+
+    def targets(self) -> List[ReadTarget]:
+        return self.replicas + [self.primary]
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncSession]:
+        """Сессия с уже взятым соединением на первом доступном сервере"""
+        last_error = None
+        for target in self.candidates():
+            session = target.sessionmaker()
+            try:
+                await session.connection()
+            except Exception as e:
+                await session.close()
+                last_error = e
+                if target is not self.primary:
+                    target.mark_down(e)
+                    continue
+                raise
+            try:
+                yield session
+            finally:
+                await session.close()
+            return
+        raise Exception(f"Нет доступных серверов БД для чтения: {last_error}")
+
+    async def dispose(self):
+        for target in self.targets():
+            await target.engine.dispose()
+
+
+def make_read_router() -> ReadRouter:
+    replicas = []
+    for address in DB_REPLICA_HOSTS:
+        host, _, port = address.partition(':')
+        replicas.append(ReadTarget(address, make_engine(host, port or DB_PORT, DB_READ_POOL_SIZE, DB_READ_MAX_OVERFLOW)))
+    primary = ReadTarget(
+        f"{DB_HOST}:{DB_PORT}", make_engine(DB_HOST, DB_PORT, DB_READ_POOL_SIZE, DB_READ_MAX_OVERFLOW)
+    )
+    return ReadRouter(replicas, primary)
+
+
+# Пулы чтения для аналитических запросов бота (execute_sql_query)
+read_router = make_read_router()
+
+
+def get_read_session():
+    """Сессия для аналитического запроса: реплика или основной сервер с отказоустойчивостью"""
+    return read_router.session()
+
+
 async def init_db():
     """Создает все таблицы в базе данных"""
     logger.info("Инициализация базы данных...")
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await ensure_indexes(conn)
+        if await is_partitioned(conn):
+            await ensure_upcoming_partitions(conn)
+        else:
+            logger.warning(
+                "Таблица video_snapshots создана прежней версией схемы и не секционирована. "
+                "Пересоздайте таблицы и перезагрузите данные (см. DATABASE_SCHEMA.md)"
+            )
     logger.info("База данных инициализирована успешно")
 
 
+async def ensure_indexes(conn):
+    """
+    Приводит индексы существующих таблиц к models.py.
+
+    create_all не добавляет индексы в уже созданные таблицы, поэтому
+    недостающие индексы создаются отдельно, а дублирующие из прежних
+    версий схемы удаляются.
+    """
+    def create_missing(sync_conn):
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(sync_conn, checkfirst=True)
+
+    await conn.run_sync(create_missing)
+    for name in LEGACY_INDEXES:
+        await conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
 async def drop_db():
     """Удаляет все таблицы (для тестирования)"""
     logger.warning("Удаление всех таблиц из базы данных...")
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
+    forget_partitions()
     logger.info("Все таблицы удалены")
 
 
@@ -46,3 +200,15 @@ async def get_session() -> AsyncSession:
     """Возвращает новую асинхронную сессию"""
     async with AsyncSessionLocal() as session:
         yield session
+
+
+async def read_data_version(session: AsyncSession) -> int:
+    """Версия данных, видимая в транзакции сессии (на ее сервере — основном или реплике)"""
+    result = await session.execute(select(LoaderState.data_version).where(LoaderState.id == 1))
+    return result.scalar() or 0
+
+
+async def get_data_version() -> int:
+    """Возвращает текущую версию данных на основном сервере (увеличивается загрузчиком при каждой загрузке)"""
+    async with AsyncSessionLocal() as session:
+        return await read_data_version(session)
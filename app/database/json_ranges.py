@@ -0,0 +1,143 @@
+"""
+Разбор videos.json по диапазонам байт: каждый процесс загрузчика читает
+и разбирает свою часть файла сам, не дожидаясь общего потокового парсера
+"""
+import codecs
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+# Начало массива videos в корневом объекте
+VIDEOS_ARRAY_RE = re.compile(rb'"videos"\s*:\s*\[')
+
+# Сколько байт от начала файла просматривается в поисках массива videos
+ARRAY_SEARCH_BYTES = 1 << 20
+
+# Размер диапазона по умолчанию (одна задача пула)
+RANGE_BYTES = 4 << 20
+
+# Сколько дочитывается за раз, если видео не поместилось в диапазон
+READ_MORE_BYTES = 1 << 20
+
+# Ошибка разбора ближе к концу буфера — скорее всего, объект просто не дочитан
+TRUNCATED_SLACK = 64
+
+WHITESPACE = ' \t\r\n'
+
+
+def split_ranges(file_path: Path, range_bytes: int = RANGE_BYTES) -> List[Tuple[int, int]]:
+    """
+    Делит массив videos на диапазоны [start, end) примерно по range_bytes.
+
+    Границы не выравниваются по объектам — это делает read_range_videos().
+    Пустой список, если массив videos не найден в начале файла.
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(ARRAY_SEARCH_BYTES)
+    match = VIDEOS_ARRAY_RE.search(head)
+    if match is None:
+        return []
+    size = file_path.stat().st_size
+    return [(start, min(start + range_bytes, size)) for start in range(match.end(), size, range_bytes)]
+
+
+class RangeReader:
+    """Текст файла, начиная с байта start, с дочитыванием по мере надобности"""
+
+    def __init__(self, f, start: int, end: int):
+        f.seek(start)
+        data = f.read(end - start)
+        # Граница могла попасть внутрь многобайтового символа — пропускаем его хвост
+        skip = 0
+        while skip < len(data) and 0x80 <= data[skip] < 0xC0:
+            skip += 1
+        self.file = f
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.text = self.decoder.decode(data[skip:])
+        # Байтовое смещение символа self.mark_char — для перевода позиций в байты
+        self.mark_char = 0
+        self.mark_byte = start + skip
+
+    def more(self) -> bool:
+        """Дочитывает следующий кусок файла; False в конце файла"""
+        data = self.file.read(READ_MORE_BYTES)
+        if not data:
+            return False
+        self.text += self.decoder.decode(data)
+        return True
+
+    def byte_offset(self, pos: int) -> int:
+        """Байтовое смещение символа pos в файле (pos не убывает между вызовами)"""
+        self.mark_byte += len(self.text[self.mark_char:pos].encode('utf-8'))
+        self.mark_char = pos
+        return self.mark_byte
+
+    def decode(self, decoder: json.JSONDecoder, pos: int) -> Tuple[Any, int]:
+        """Объект JSON, начинающийся в pos, и позиция после него"""
+        while True:
+            try:
+                return decoder.raw_decode(self.text, pos)
+            except json.JSONDecodeError as e:
+                truncated = e.msg.startswith('Unterminated string') or e.pos >= len(self.text) - TRUNCATED_SLACK
+                if not truncated or not self.more():
+                    raise
+
+    def skip_separators(self, pos: int) -> int:
+        """Пропускает пробелы и запятые между элементами массива"""
+        while True:
+            while pos < len(self.text) and (self.text[pos] in WHITESPACE or self.text[pos] == ','):
+                pos += 1
+            if pos < len(self.text) or not self.more():
+                return pos
+
+    def find_object(self, pos: int) -> int:
+        """Позиция следующей '{' начиная с pos или -1 в конце файла"""
+        while True:
+            found = self.text.find('{', pos)
+            if found >= 0:
+                return found
+            pos = len(self.text)
+            if not self.more():
+                return -1
+
+
+def is_video(value: Any) -> bool:
+    """Элемент массива videos: у снапшотов нет creator_id"""
+    return isinstance(value, dict) and 'creator_id' in value
+
+
+def read_range_videos(file_path: str, start: int, end: int) -> Iterator[Dict[str, Any]]:
+    """
+    Видео массива videos, открывающая скобка которых лежит в байтах [start, end).
+
+    Диапазон может начинаться посреди видео: тогда первым берется ближайший
+    объект с creator_id, а предыдущее видео дочитывает диапазон, в котором
+    оно началось. Так соседние диапазоны не теряют и не повторяют видео.
+    """
+    decoder = json.JSONDecoder()
+    with open(file_path, 'rb') as f:
+        reader = RangeReader(f, start, end)
+
+        # Ищем начало первого видео диапазона
+        pos = reader.find_object(0)
+        while pos >= 0:
+            try:
+                value, after = reader.decode(decoder, pos)
+            except json.JSONDecodeError:
+                value = None  # '{' внутри строки
+            if is_video(value):
+                break
+            pos = reader.find_object(pos + 1)
+        else:
+            return
+
+        if reader.byte_offset(pos) >= end:
+            return
+        while True:
+            yield value
+            pos = reader.skip_separators(after)
+            # ']' — конец массива videos, иначе следующее видео, если оно еще наше
+            if pos >= len(reader.text) or reader.text[pos] != '{' or reader.byte_offset(pos) >= end:
+                return
+            value, after = reader.decode(decoder, pos)
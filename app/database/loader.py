@@ -1,28 +1,445 @@
+import argparse
 import asyncio
 import json
 import logging
-from datetime import datetime
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
 
-from sqlalchemy import insert
-from src.db import engine, init_db
-from src.models import Video, VideoSnapshot
+import ijson
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+from app.database.db import engine, init_db
+from app.database.json_ranges import RANGE_BYTES, read_range_videos, split_ranges
+from app.storage.config import (
+    LOADER_CONCURRENCY,
+    LOADER_MAX_RETRIES,
+    LOADER_PARSE_WORKERS,
+    LOADER_RETRY_DELAY,
+)
+from app.database.models import LoaderState, Video, VideoSnapshot
+from app.database.partitions import ensure_partitions, is_partitioned, missing_partitions, route_rows
+from app.database.rollups import refresh_rollups
 
 logger = logging.getLogger(__name__)
 
+# Размер батча: сколько снапшотов копим в памяти перед сбросом в БД
+BATCH_SIZE = 5000
 
+
+@lru_cache(maxsize=65536)
 def parse_datetime(dt_str: str) -> datetime:
-    """Парсит строку даты в datetime объект"""
+    """
+    Парсит строку даты в datetime объект.
+
+    Снапшоты снимаются раз в час, поэтому одни и те же метки времени
+    повторяются у тысяч строк — результат кэшируется.
+    """
     return datetime.fromisoformat(dt_str.replace('Z', '+00:00'))
 
 
-async def load_data(json_path: str = "data/videos.json"):
+def iter_videos(file_path: Path, stream: bool = True) -> Iterator[Dict[str, Any]]:
+    """
+    Итерирует сырые объекты видео из JSON файла.
+
+    В потоковом режиме файл читается через ijson: в памяти одновременно
+    находится только одно видео со своими снапшотами.
+    """
+    with open(file_path, 'rb') as f:
+        if stream:
+            yield from ijson.items(f, 'videos.item', use_float=True)
+        else:
+            yield from json.load(f).get('videos', [])
+
+
+# Порядок колонок в кортежах строк — совпадает с порядком полей для COPY
+VIDEO_COLUMNS = (
+    'id', 'creator_id', 'video_created_at',
+    'views_count', 'likes_count', 'comments_count', 'reports_count',
+    'created_at', 'updated_at',
+)
+SNAPSHOT_COLUMNS = (
+    'id', 'video_id',
+    'views_count', 'likes_count', 'comments_count', 'reports_count',
+    'delta_views_count', 'delta_likes_count', 'delta_comments_count', 'delta_reports_count',
+    'created_at', 'updated_at',
+)
+
+Row = Tuple[Any, ...]
+
+
+def build_video(video_raw: Dict[str, Any]) -> Row:
+    """Подготавливает строку для таблицы videos (в порядке VIDEO_COLUMNS)"""
+    return (
+        video_raw['id'],
+        video_raw['creator_id'],
+        parse_datetime(video_raw['video_created_at']),
+        video_raw['views_count'],
+        video_raw['likes_count'],
+        video_raw['comments_count'],
+        video_raw['reports_count'],
+        parse_datetime(video_raw['created_at']),
+        parse_datetime(video_raw['updated_at']),
+    )
+
+
+def build_snapshot(snapshot_raw: Dict[str, Any]) -> Row:
+    """Подготавливает строку для таблицы video_snapshots (в порядке SNAPSHOT_COLUMNS)"""
+    return (
+        snapshot_raw['id'],
+        snapshot_raw['video_id'],
+        snapshot_raw['views_count'],
+        snapshot_raw['likes_count'],
+        snapshot_raw['comments_count'],
+        snapshot_raw['reports_count'],
+        snapshot_raw['delta_views_count'],
+        snapshot_raw['delta_likes_count'],
+        snapshot_raw['delta_comments_count'],
+        snapshot_raw['delta_reports_count'],
+        parse_datetime(snapshot_raw['created_at']),
+        parse_datetime(snapshot_raw['updated_at']),
+    )
+
+
+class Watermarks(NamedTuple):
+    """Водяные знаки инкрементальной загрузки"""
+    videos: Optional[datetime]      # max(Video.updated_at)
+    snapshots: Optional[datetime]   # max(VideoSnapshot.created_at)
+
+
+# Индексы полей, по которым считаются водяные знаки
+VIDEO_UPDATED_AT = VIDEO_COLUMNS.index('updated_at')
+SNAPSHOT_CREATED_AT = SNAPSHOT_COLUMNS.index('created_at')
+
+
+def iter_raw_chunks(
+    videos_raw: Iterator[Dict[str, Any]],
+    batch_size: int = BATCH_SIZE,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Группирует сырые видео в чанки примерно по batch_size снапшотов.
+
+    Снапшоты видео всегда попадают в тот же чанк, что и само видео,
+    поэтому внешний ключ не нарушается при вставке батча.
+    """
+    chunk: List[Dict[str, Any]] = []
+    snapshots_count = 0
+
+    for video_raw in videos_raw:
+        chunk.append(video_raw)
+        snapshots_count += len(video_raw.get('snapshots', []))
+
+        if snapshots_count >= batch_size or len(chunk) >= batch_size:
+            yield chunk
+            chunk, snapshots_count = [], 0
+
+    if chunk:
+        yield chunk
+
+
+def build_batch(
+    chunk: List[Dict[str, Any]],
+    watermarks: Optional[Watermarks] = None,
+) -> Tuple[List[Row], List[Row]]:
+    """
+    Превращает чанк сырых видео в кортежи строк videos и video_snapshots.
+
+    Если переданы watermarks, остаются только видео, обновленные после
+    videos, и снапшоты, снятые после snapshots. Функция чистая и может
+    выполняться в дочернем процессе.
+    """
+    videos_after = watermarks.videos if watermarks else None
+    snapshots_after = watermarks.snapshots if watermarks else None
+
+    videos_batch: List[Row] = []
+    snapshots_batch: List[Row] = []
+
+    for video_raw in chunk:
+        video = build_video(video_raw)
+        if videos_after is None or video[VIDEO_UPDATED_AT] > videos_after:
+            videos_batch.append(video)
+        for snapshot_raw in video_raw.get('snapshots', []):
+            snapshot = build_snapshot(snapshot_raw)
+            if snapshots_after is None or snapshot[SNAPSHOT_CREATED_AT] > snapshots_after:
+                snapshots_batch.append(snapshot)
+
+    return videos_batch, snapshots_batch
+
+
+def iter_batches(
+    videos_raw: Iterator[Dict[str, Any]],
+    batch_size: int = BATCH_SIZE,
+    watermarks: Optional[Watermarks] = None,
+) -> Iterator[Tuple[List[Row], List[Row]]]:
+    """Готовит батчи строк в текущем процессе"""
+    for chunk in iter_raw_chunks(videos_raw, batch_size):
+        yield build_batch(chunk, watermarks)
+
+
+async def aiter_batches(
+    videos_raw: Iterator[Dict[str, Any]],
+    batch_size: int = BATCH_SIZE,
+    watermarks: Optional[Watermarks] = None,
+) -> AsyncIterator[Tuple[List[Row], List[Row]]]:
+    """Асинхронно отдает батчи строк: разбор идет в отдельном потоке и не блокирует event loop"""
+    batches = iter_batches(videos_raw, batch_size, watermarks)
+    while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+        yield batch
+
+
+def build_range(
+    file_path: str,
+    start: int,
+    end: int,
+    batch_size: int = BATCH_SIZE,
+    watermarks: Optional[Watermarks] = None,
+) -> List[Tuple[List[Row], List[Row]]]:
+    """Задача пула разбора: читает диапазон байт файла и готовит его батчи"""
+    return list(iter_batches(read_range_videos(file_path, start, end), batch_size, watermarks))
+
+
+async def aiter_batches_parallel(
+    file_path: Path,
+    batch_size: int = BATCH_SIZE,
+    watermarks: Optional[Watermarks] = None,
+    parse_workers: int = LOADER_PARSE_WORKERS,
+    range_bytes: int = RANGE_BYTES,
+) -> AsyncIterator[Tuple[List[Row], List[Row]]]:
+    """
+    Асинхронно отдает батчи, подготовленные пулом из parse_workers процессов.
+
+    Файл делится на диапазоны байт (json_ranges.py), и каждый процесс сам
+    читает и разбирает свой диапазон: и разбор JSON, и сборка строк идут
+    параллельно, родителю остается принять готовые батчи. В работе держится
+    не больше 2 * parse_workers диапазонов, порядок батчей сохраняется.
+
+    Процессы запускаются через spawn: загрузчик к этому моменту уже держит
+    event loop и потоки, которые fork скопировал бы в дочерний процесс.
+    При parse_workers <= 1 или файле без массива videos в начале батчи
+    готовятся в отдельном потоке текущего процесса (aiter_batches).
+    """
+    ranges = split_ranges(file_path, range_bytes) if parse_workers > 1 else []
+    if not ranges:
+        if parse_workers > 1:
+            logger.warning("Массив videos не найден в начале файла — разбор в одном процессе")
+        async for batch in aiter_batches(iter_videos(file_path), batch_size, watermarks):
+            yield batch
+        return
+
+    loop = asyncio.get_running_loop()
+    pending: deque = deque()
+    pool = ProcessPoolExecutor(max_workers=parse_workers, mp_context=multiprocessing.get_context('spawn'))
+    try:
+        for start, end in ranges:
+            pending.append(loop.run_in_executor(pool, build_range, str(file_path), start, end, batch_size, watermarks))
+            if len(pending) >= parse_workers * 2:
+                for batch in await pending.popleft():
+                    yield batch
+        while pending:
+            for batch in await pending.popleft():
+                yield batch
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def advance_watermarks(current: Watermarks, videos: List[Row], snapshots: List[Row]) -> Watermarks:
+    """Сдвигает водяные знаки на максимумы из записанного батча"""
+    videos_mark = current.videos
+    if videos:
+        batch_max = max(row[VIDEO_UPDATED_AT] for row in videos)
+        videos_mark = batch_max if videos_mark is None else max(videos_mark, batch_max)
+
+    snapshots_mark = current.snapshots
+    if snapshots:
+        batch_max = max(row[SNAPSHOT_CREATED_AT] for row in snapshots)
+        snapshots_mark = batch_max if snapshots_mark is None else max(snapshots_mark, batch_max)
+
+    return Watermarks(videos_mark, snapshots_mark)
+
+
+async def get_watermarks(conn: AsyncConnection) -> Watermarks:
+    """
+    Читает сохраненные водяные знаки из loader_state.
+
+    Если состояние еще не сохранялось (БД загружалась старой версией
+    загрузчика), водяные знаки вычисляются по самим таблицам.
+    """
+    state = (await conn.execute(
+        select(LoaderState.videos_watermark, LoaderState.snapshots_watermark).where(LoaderState.id == 1)
+    )).first()
+    if state is not None:
+        return Watermarks(state.videos_watermark, state.snapshots_watermark)
+
+    videos_mark = (await conn.execute(select(func.max(Video.updated_at)))).scalar()
+    snapshots_mark = (await conn.execute(select(func.max(VideoSnapshot.created_at)))).scalar()
+    return Watermarks(videos_mark, snapshots_mark)
+
+
+async def save_load_state(conn: AsyncConnection, watermarks: Watermarks, bump_version: bool = True):
+    """Сохраняет водяные знаки и (по умолчанию) увеличивает версию данных"""
+    now = datetime.now(timezone.utc)
+    stmt = pg_insert(LoaderState).values(
+        id=1,
+        videos_watermark=watermarks.videos,
+        snapshots_watermark=watermarks.snapshots,
+        data_version=1 if bump_version else 0,
+        updated_at=now,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[LoaderState.id],
+        set_={
+            'videos_watermark': stmt.excluded.videos_watermark,
+            'snapshots_watermark': stmt.excluded.snapshots_watermark,
+            'data_version': LoaderState.data_version + (1 if bump_version else 0),
+            'updated_at': stmt.excluded.updated_at,
+        },
+    )
+    await conn.execute(stmt)
+
+
+async def write_batch_insert(conn: AsyncConnection, videos: List[Row], snapshots: List[Row]):
+    """Пишет батч через SQLAlchemy insert() (executemany)"""
+    if videos:
+        await conn.execute(insert(Video), [dict(zip(VIDEO_COLUMNS, row)) for row in videos])
+    if snapshots:
+        await conn.execute(insert(VideoSnapshot), [dict(zip(SNAPSHOT_COLUMNS, row)) for row in snapshots])
+
+
+async def write_batch_copy(conn: AsyncConnection, videos: List[Row], snapshots: List[Row]):
+    """
+    Пишет батч через бинарный COPY asyncpg (copy_records_to_table).
+
+    Кортежи передаются драйверу как есть, без промежуточных словарей.
+    Снапшоты копируются прямо в секции video_snapshots (см. partitions.py).
+    """
+    # SET LOCAL заодно открывает транзакцию SQLAlchemy, в которой затем выполняется COPY
+    await conn.exec_driver_sql("SET LOCAL synchronous_commit TO OFF")
+    raw_connection = await conn.get_raw_connection()
+    driver = raw_connection.driver_connection
+
+    if videos:
+        await driver.copy_records_to_table(Video.__tablename__, records=videos, columns=VIDEO_COLUMNS)
+    for table, rows in route_rows(snapshots, SNAPSHOT_CREATED_AT).items():
+        await driver.copy_records_to_table(table, records=rows, columns=SNAPSHOT_COLUMNS)
+
+
+async def write_batch_upsert(conn: AsyncConnection, videos: List[Row], snapshots: List[Row]):
+    """
+    Идемпотентная запись батча для инкрементальной загрузки.
+
+    Видео обновляются через ON CONFLICT DO UPDATE (только если пришла более
+    свежая версия), уже загруженные снапшоты пропускаются.
+    """
+    if videos:
+        stmt = pg_insert(Video)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Video.id],
+            set_={column: stmt.excluded[column] for column in VIDEO_COLUMNS if column != 'id'},
+            where=Video.updated_at < stmt.excluded.updated_at,
+        )
+        await conn.execute(stmt, [dict(zip(VIDEO_COLUMNS, row)) for row in videos])
+    if snapshots:
+        stmt = pg_insert(VideoSnapshot).on_conflict_do_nothing()
+        await conn.execute(stmt, [dict(zip(SNAPSHOT_COLUMNS, row)) for row in snapshots])
+
+
+BatchWriter = Callable[[AsyncConnection, List[Row], List[Row]], Awaitable[None]]
+
+WRITERS: Dict[str, BatchWriter] = {
+    'insert': write_batch_insert,
+    'copy': write_batch_copy,
+}
+
+
+async def count_rows(conn: AsyncConnection) -> Tuple[int, int]:
+    """Возвращает количество строк в videos и video_snapshots"""
+    videos_count = (await conn.execute(select(func.count()).select_from(Video))).scalar()
+    snapshots_count = (await conn.execute(select(func.count()).select_from(VideoSnapshot))).scalar()
+    return videos_count, snapshots_count
+
+
+async def vacuum_analyze():
+    """
+    Обновляет статистику планировщика и карту видимости после загрузки.
+
+    Без VACUUM свежие страницы не помечены all-visible, и covering-индекс
+    по video_snapshots не может дать index-only scan.
+    """
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for table in (Video.__tablename__, VideoSnapshot.__tablename__):
+            await conn.execute(text(f"VACUUM (ANALYZE) {table}"))
+    logger.info("VACUUM ANALYZE выполнен")
+
+
+async def write_with_retry(
+    write_batch: BatchWriter,
+    videos: List[Row],
+    snapshots: List[Row],
+    max_retries: int = LOADER_MAX_RETRIES,
+):
+    """
+    Пишет батч в отдельной транзакции на своем соединении из пула.
+
+    При ошибке транзакция батча откатывается и запись повторяется
+    с экспоненциальной задержкой; остальные батчи это не затрагивает.
+    """
+    for attempt in range(1, max_retries + 1):
+        try:
+            async with engine.begin() as conn:
+                await write_batch(conn, videos, snapshots)
+            return
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = LOADER_RETRY_DELAY * 2 ** (attempt - 1)
+            logger.warning(f"Ошибка записи батча (попытка {attempt}/{max_retries}): {e}. Повтор через {delay:.1f} с")
+            await asyncio.sleep(delay)
+
+
+async def load_data(
+    json_path: str = "data/videos.json",
+    stream: bool = True,
+    batch_size: int = BATCH_SIZE,
+    mode: str = "copy",
+    incremental: bool = False,
+    concurrency: int = LOADER_CONCURRENCY,
+    parse_workers: int = LOADER_PARSE_WORKERS,
+):
     """
     Загружает данные из JSON файла в базу данных.
-    Использует bulk insert для максимальной производительности.
+
+    В потоковом режиме (по умолчанию) видео читаются из файла по одному
+    и сбрасываются в БД батчами, поэтому потребление памяти не зависит
+    от размера файла. stream=False читает файл целиком через json.load.
+
+    mode выбирает способ записи: 'copy' — бинарный COPY asyncpg,
+    'insert' — SQLAlchemy insert() батчами.
+
+    incremental=True пишет только строки новее сохраненных водяных знаков
+    через идемпотентный upsert, поэтому загрузку можно повторять на
+    непустой БД. После загрузки водяные знаки и версия данных сохраняются
+    в loader_state.
+
+    Разбор JSON и запись разделены очередью: продюсер готовит батчи,
+    concurrency воркеров пишут их параллельно, каждый батч — в своей
+    транзакции с повторами. В конце количество строк в таблицах
+    сверяется с количеством прочитанных, пересчитываются дневные агрегаты
+    (rollups.py).
+
+    parse_workers > 1 разбирает файл пулом процессов по диапазонам байт
+    (aiter_batches_parallel), иначе — потоково в одном процессе.
     """
-    logger.info(f"Начинаем загрузку данных из {json_path}")
+    logger.info(
+        f"Начинаем загрузку данных из {json_path} "
+        f"(режим {mode}, воркеров записи: {concurrency}, процессов разбора: {parse_workers})"
+    )
     
     # Проверяем существование файла
     file_path = Path(json_path)
@@ -30,77 +447,147 @@ async def load_data(json_path: str = "data/videos.json"):
         logger.error(f"Файл {json_path} не найден!")
         return
     
-    # Читаем JSON файл
-    logger.info("Чтение JSON файла...")
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    videos_data = data.get('videos', [])
-    logger.info(f"Найдено {len(videos_data)} видео")
-    
-    # Подготавливаем данные для bulk insert
-    videos_to_insert: List[Dict[str, Any]] = []
-    snapshots_to_insert: List[Dict[str, Any]] = []
-    
-    logger.info("Подготовка данных для вставки...")
-    for video_raw in videos_data:
-        # Подготавливаем данные видео
-        video_dict = {
-            'id': video_raw['id'],
-            'creator_id': video_raw['creator_id'],
-            'video_created_at': parse_datetime(video_raw['video_created_at']),
-            'views_count': video_raw['views_count'],
-            'likes_count': video_raw['likes_count'],
-            'comments_count': video_raw['comments_count'],
-            'reports_count': video_raw['reports_count'],
-            'created_at': parse_datetime(video_raw['created_at']),
-            'updated_at': parse_datetime(video_raw['updated_at']),
-        }
-        videos_to_insert.append(video_dict)
-        
-        # Подготавливаем данные снапшотов
-        for snapshot_raw in video_raw.get('snapshots', []):
-            snapshot_dict = {
-                'id': snapshot_raw['id'],
-                'video_id': snapshot_raw['video_id'],
-                'views_count': snapshot_raw['views_count'],
-                'likes_count': snapshot_raw['likes_count'],
-                'comments_count': snapshot_raw['comments_count'],
-                'reports_count': snapshot_raw['reports_count'],
-                'delta_views_count': snapshot_raw['delta_views_count'],
-                'delta_likes_count': snapshot_raw['delta_likes_count'],
-                'delta_comments_count': snapshot_raw['delta_comments_count'],
-                'delta_reports_count': snapshot_raw['delta_reports_count'],
-                'created_at': parse_datetime(snapshot_raw['created_at']),
-                'updated_at': parse_datetime(snapshot_raw['updated_at']),
-            }
-            snapshots_to_insert.append(snapshot_dict)
-    
-    logger.info(f"Подготовлено {len(videos_to_insert)} видео и {len(snapshots_to_insert)} снапшотов")
-    
-    # Вставляем данные в БД
-    logger.info("Вставка данных в базу данных...")
+    if incremental and mode != 'insert':
+        logger.info("Инкрементальная загрузка использует upsert вместо COPY")
+    write_batch = write_batch_upsert if incremental else WRITERS[mode]
+
     async with engine.begin() as conn:
-        # Сначала вставляем видео
-        logger.info("Вставка видео...")
-        await conn.execute(insert(Video), videos_to_insert)
-        logger.info(f"✓ Вставлено {len(videos_to_insert)} видео")
-        
-        # Затем вставляем снапшоты (батчами для больших объемов)
-        logger.info("Вставка снапшотов...")
-        batch_size = 5000
-        for i in range(0, len(snapshots_to_insert), batch_size):
-            batch = snapshots_to_insert[i:i + batch_size]
-            await conn.execute(insert(VideoSnapshot), batch)
-            logger.info(f"  Вставлено {min(i + batch_size, len(snapshots_to_insert))}/{len(snapshots_to_insert)} снапшотов")
-        
-        logger.info(f"✓ Вставлено {len(snapshots_to_insert)} снапшотов")
+        videos_before, snapshots_before = await count_rows(conn)
+        partitioned = await is_partitioned(conn)
+        if incremental:
+            watermarks = await get_watermarks(conn)
+            initial_watermarks = watermarks
+            logger.info(f"Водяные знаки: видео > {watermarks.videos}, снапшоты > {watermarks.snapshots}")
+        else:
+            # Сбрасываем водяные знаки: если полная загрузка прервется,
+            # повторный запуск с --incremental догрузит все через upsert
+            watermarks = initial_watermarks = Watermarks(None, None)
+            await save_load_state(conn, watermarks, bump_version=False)
+
+    if parse_workers > 1:
+        logger.info(f"Чтение JSON файла (по диапазонам байт, процессов: {parse_workers})...")
+    else:
+        logger.info(f"Чтение JSON файла ({'потоково' if stream else 'целиком'})...")
+    videos_total = 0
+    snapshots_total = 0
+    videos_written = 0
+    snapshots_written = 0
+    started = time.perf_counter()
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    async def produce():
+        nonlocal watermarks, videos_total, snapshots_total
+        if parse_workers > 1:
+            batches = aiter_batches_parallel(file_path, batch_size, watermarks if incremental else None, parse_workers)
+        else:
+            batches = aiter_batches(iter_videos(file_path, stream), batch_size, watermarks if incremental else None)
+        async for batch in batches:
+            videos_batch, snapshots_batch = batch
+            if not videos_batch and not snapshots_batch:
+                continue
+            watermarks = advance_watermarks(watermarks, videos_batch, snapshots_batch)
+            videos_total += len(videos_batch)
+            snapshots_total += len(snapshots_batch)
+            if partitioned and snapshots_batch:
+                # Секции создаются здесь, последовательно, до того как батч попадет к воркерам
+                created = [row[SNAPSHOT_CREATED_AT] for row in snapshots_batch]
+                first, last = min(created), max(created)
+                if missing_partitions(first, last):
+                    async with engine.begin() as conn:
+                        await ensure_partitions(conn, first, last)
+            await queue.put(batch)
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def consume():
+        nonlocal videos_written, snapshots_written
+        while (batch := await queue.get()) is not None:
+            videos_batch, snapshots_batch = batch
+            # Сначала пишутся видео, затем их снапшоты — в одной транзакции
+            await write_with_retry(write_batch, videos_batch, snapshots_batch)
+            videos_written += len(videos_batch)
+            snapshots_written += len(snapshots_batch)
+            logger.info(f"  Записано {videos_written} видео и {snapshots_written} снапшотов")
+
+    # Если упадет любой из участников, остальные отменяются
+    tasks = [asyncio.create_task(produce())] + [asyncio.create_task(consume()) for _ in range(concurrency)]
+    try:
+        await asyncio.gather(*tasks)
+    except Exception:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        logger.error(
+            f"Загрузка прервана: записано {videos_written} видео и {snapshots_written} снапшотов. "
+            "Повторите запуск с --incremental, чтобы догрузить остальное"
+        )
+        raise
+
+    async with engine.begin() as conn:
+        # Проверка целостности: в таблицах должно оказаться все прочитанное
+        videos_after, snapshots_after = await count_rows(conn)
+        snapshots_added = snapshots_after - snapshots_before
+        if incremental:
+            if snapshots_added != snapshots_total:
+                logger.warning(
+                    f"Добавлено {snapshots_added} снапшотов из {snapshots_total} прочитанных "
+                    "(остальные уже были в БД)"
+                )
+        elif videos_after - videos_before != videos_total or snapshots_added != snapshots_total:
+            raise Exception(
+                f"Проверка целостности не пройдена: прочитано {videos_total} видео и {snapshots_total} снапшотов, "
+                f"в БД добавилось {videos_after - videos_before} и {snapshots_added}"
+            )
+
+        if videos_total or snapshots_total or not incremental:
+            # Дневные агрегаты: при инкрементальной загрузке меняются только дни
+            # начиная с прежнего водяного знака снапшотов
+            await refresh_rollups(conn, since=initial_watermarks.snapshots)
+            await save_load_state(conn, watermarks)
+
+    if videos_total or snapshots_total:
+        await vacuum_analyze()
     
+    elapsed = time.perf_counter() - started
+    rows_total = videos_total + snapshots_total
+    rows_per_sec = rows_total / elapsed if elapsed > 0 else 0.0
+    logger.info(f"✓ Вставлено {videos_total} видео и {snapshots_total} снапшотов")
+    logger.info(f"⏱ {rows_total} строк за {elapsed:.2f} с — {rows_per_sec:,.0f} строк/с (режим {mode})")
     logger.info("✅ Загрузка данных завершена успешно!")
 
 
+def parse_args() -> argparse.Namespace:
+    """Разбирает аргументы командной строки загрузчика"""
+    parser = argparse.ArgumentParser(description="Загрузка videos.json в базу данных")
+    parser.add_argument("json_path", nargs="?", default="data/videos.json", help="Путь к JSON файлу")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Размер батча снапшотов")
+    parser.add_argument("--mode", choices=sorted(WRITERS), default="copy", help="Способ записи в БД")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Загрузить только новые данные (после водяных знаков) через upsert",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=LOADER_CONCURRENCY,
+        help="Количество параллельных воркеров записи",
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=LOADER_PARSE_WORKERS,
+        help="Количество процессов разбора JSON (1 — в текущем процессе)",
+    )
+    parser.add_argument("--no-stream", action="store_true", help="Читать JSON целиком (json.load)")
+    return parser.parse_args()
+
+
 async def main():
     """Основная функция для запуска загрузки данных"""
+    args = parse_args()
+
     logging.basicConfig(
         level=logging.INFO,
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -110,7 +597,15 @@ async def main():
     await init_db()
     
     # Загружаем данные
-    await load_data()
+    await load_data(
+        args.json_path,
+        stream=not args.no_stream,
+        batch_size=args.batch_size,
+        mode=args.mode,
+        incremental=args.incremental,
+        concurrency=max(1, args.concurrency),
+        parse_workers=max(1, args.parse_workers),
+    )
 
 
 if __name__ == '__main__':
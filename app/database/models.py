@@ -1,7 +1,7 @@
-from datetime import datetime
-from sqlalchemy import String, BigInteger, Integer, DateTime, ForeignKey, Index
+from datetime import date, datetime
+from sqlalchemy import String, BigInteger, Integer, Date, DateTime, ForeignKey, Index
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from typing import List
+from typing import List, Optional
 
 
 class Base(DeclarativeBase):
@@ -28,6 +28,11 @@ class Video(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
     
+    # "Сколько видео у креатора за период" — фильтр по creator_id и диапазону дат
+    __table_args__ = (
+        Index('idx_videos_creator_created_at', 'creator_id', 'video_created_at'),
+    )
+
     # Связь с снапшотами
     snapshots: Mapped[List["VideoSnapshot"]] = relationship(
         "VideoSnapshot", 
@@ -66,20 +71,105 @@ class VideoSnapshot(Base):
     delta_reports_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     
     # Время замера (это поле из JSON created_at) - КРИТИЧНО для запросов по датам
-    created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), 
-        nullable=False,
-        index=True  # Индекс для быстрой фильтрации по датам
-    )
+    # Ключ секционирования (см. partitions.py), поэтому входит в primary key.
+    # Индексы по нему — см. __table_args__ (covering btree + BRIN)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
     
     # Связь с видео
     video: Mapped["Video"] = relationship("Video", back_populates="snapshots")
 
+    __table_args__ = (
+        # Суммы delta_* и COUNT(DISTINCT video_id) за период читаются index-only scan
+        Index(
+            'idx_snapshots_created_at_covering',
+            'created_at',
+            postgresql_include=[
+                'video_id',
+                'delta_views_count',
+                'delta_likes_count',
+                'delta_comments_count',
+                'delta_reports_count',
+            ],
+        ),
+        # Снапшоты дописываются по времени — BRIN по created_at занимает килобайты
+        Index('idx_snapshots_created_at_brin', 'created_at', postgresql_using='brin'),
+        # Секции по дням/месяцам created_at: запросы за период читают только свои секции
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
+
     def __repr__(self):
         return f"<VideoSnapshot(id={self.id}, video_id={self.video_id}, created_at={self.created_at})>"
 
 
-# Дополнительные индексы для оптимизации запросов
-Index('idx_snapshots_created_at_date', VideoSnapshot.created_at)
-Index('idx_videos_created_at_date', Video.video_created_at)
+class DailySnapshotStats(Base):
+    """Дневной rollup video_snapshots: суммы приростов и число видео с приростом за день"""
+    __tablename__ = "daily_snapshot_stats"
+
+    # День замера (created_at::date)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+
+    snapshots_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    videos_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    # Суммы приростов за день
+    sum_delta_views_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    sum_delta_likes_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    sum_delta_comments_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    sum_delta_reports_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+    # Число разных видео с приростом > 0 за день (не суммируется между днями!)
+    videos_with_views_growth: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    videos_with_likes_growth: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    videos_with_comments_growth: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    videos_with_reports_growth: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DailySnapshotStats(day={self.day}, sum_delta_views_count={self.sum_delta_views_count})>"
+
+
+class CreatorDailyStats(Base):
+    """Дневной rollup video_snapshots в разрезе креатора"""
+    __tablename__ = "creator_daily_stats"
+
+    creator_id: Mapped[str] = mapped_column(String, primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True, index=True)
+
+    snapshots_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    videos_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    sum_delta_views_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    sum_delta_likes_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    sum_delta_comments_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    sum_delta_reports_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+    videos_with_views_growth: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    videos_with_likes_growth: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    videos_with_comments_growth: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    videos_with_reports_growth: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CreatorDailyStats(creator_id={self.creator_id}, day={self.day})>"
+
+
+class LoaderState(Base):
+    """Состояние загрузчика: водяные знаки инкрементальной загрузки и версия данных"""
+    __tablename__ = "loader_state"
+
+    # Единственная строка с id = 1
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, default=1)
+
+    # Максимальные Video.updated_at и VideoSnapshot.created_at среди загруженных строк
+    videos_watermark: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    snapshots_watermark: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    # Увеличивается при каждой загрузке, изменившей данные
+    data_version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<LoaderState(data_version={self.data_version}, snapshots_watermark={self.snapshots_watermark})>"
+
+
+# Индексы прежних версий схемы, дублировавшие index=True на тех же колонках
+LEGACY_INDEXES = ('idx_snapshots_created_at_date', 'idx_videos_created_at_date', 'ix_video_snapshots_created_at')
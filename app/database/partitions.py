@@ -0,0 +1,185 @@
+"""
+Partitions - секционирование video_snapshots по created_at (RANGE, по дням или месяцам)
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.database.models import VideoSnapshot
+from app.storage.config import SNAPSHOT_PARTITION_INTERVAL, SNAPSHOT_PARTITIONS_AHEAD
+
+logger = logging.getLogger(__name__)
+
+PARENT = VideoSnapshot.__tablename__
+
+# Секции, про которые известно, что они уже созданы (в рамках процесса)
+_known_partitions: Set[str] = set()
+
+
+def period_start(ts: datetime, interval: str = SNAPSHOT_PARTITION_INTERVAL) -> datetime:
+    """Начало дня/месяца (UTC), в который попадает ts"""
+    ts = ts.astimezone(timezone.utc)
+    if interval == 'day':
+        return datetime(ts.year, ts.month, ts.day, tzinfo=timezone.utc)
+    return datetime(ts.year, ts.month, 1, tzinfo=timezone.utc)
+
+
+def next_period(start: datetime, interval: str = SNAPSHOT_PARTITION_INTERVAL) -> datetime:
+    """Начало следующего дня/месяца"""
+    if interval == 'day':
+        return start + timedelta(days=1)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def partition_name(ts: datetime, interval: str = SNAPSHOT_PARTITION_INTERVAL) -> str:
+    """Имя секции для момента ts: video_snapshots_2025_11 / video_snapshots_2025_11_28"""
+    start = period_start(ts, interval)
+    if interval == 'day':
+        return f"{PARENT}_{start:%Y_%m_%d}"
+    return f"{PARENT}_{start:%Y_%m}"
+
+
+def iter_partitions(
+    first: datetime,
+    last: datetime,
+    interval: str = SNAPSHOT_PARTITION_INTERVAL,
+) -> Iterator[Tuple[str, datetime, datetime]]:
+    """Секции (имя, нижняя граница, верхняя граница), покрывающие [first, last]"""
+    start = period_start(first, interval)
+    while start <= last:
+        end = next_period(start, interval)
+        yield partition_name(start, interval), start, end
+        start = end
+
+
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    """True, если video_snapshots — секционированная таблица"""
+    result = await conn.execute(
+        text("SELECT relkind::text FROM pg_class WHERE oid = to_regclass(:name)"),
+        {'name': PARENT},
+    )
+    return result.scalar() == 'p'
+
+
+async def ensure_partitions(conn: AsyncConnection, first: datetime, last: datetime):
+    """Создает недостающие секции для диапазона [first, last]"""
+    for name, start, end in iter_partitions(first, last):
+        if name in _known_partitions:
+            continue
+        await conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        ))
+        _known_partitions.add(name)
+        logger.info(f"Секция {name} готова [{start:%Y-%m-%d}, {end:%Y-%m-%d})")
+
+
+def forget_partitions():
+    """Сбрасывает список известных секций (после удаления таблиц)"""
+    _known_partitions.clear()
+
+
+def missing_partitions(first: datetime, last: datetime) -> bool:
+    """True, если для диапазона есть секции, еще не созданные этим процессом"""
+    return any(name not in _known_partitions for name, _, _ in iter_partitions(first, last))
+
+
+def route_rows(rows: List[tuple], created_at_index: int) -> Dict[str, List[tuple]]:
+    """
+    Раскладывает строки снапшотов по секциям.
+
+    Строки для секций, созданных этим процессом, пишутся прямо в секцию
+    (COPY минует маршрутизацию в родительской таблице), остальные —
+    в video_snapshots, и Postgres разложит их сам.
+    """
+    routed: Dict[str, List[tuple]] = {}
+    for row in rows:
+        name = partition_name(row[created_at_index])
+        if name not in _known_partitions:
+            name = PARENT
+        routed.setdefault(name, []).append(row)
+    return routed
+
+
+async def ensure_upcoming_partitions(conn: AsyncConnection, ahead: int = SNAPSHOT_PARTITIONS_AHEAD):
+    """Создает секцию текущего периода и ahead следующих"""
+    start = period_start(datetime.now(timezone.utc))
+    last = start
+    for _ in range(ahead):
+        last = next_period(last)
+    await ensure_partitions(conn, start, last)
+
+
+async def list_partitions(conn: AsyncConnection) -> List[Tuple[str, str]]:
+    """Секции video_snapshots и их границы"""
+    result = await conn.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+        "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:name) ORDER BY c.relname"
+    ), {'name': PARENT})
+    return [(row[0], row[1]) for row in result]
+
+
+async def detach_partitions_before(conn: AsyncConnection, before: datetime, drop: bool = False) -> List[str]:
+    """
+    Отсоединяет секции, целиком лежащие до момента before.
+
+    DETACH — операция над метаданными: данные остаются в отдельной таблице
+    (или удаляются при drop=True) без построчного DELETE.
+    """
+    detached = []
+    for name, _ in await list_partitions(conn):
+        if not name_before(name, before):
+            continue
+        await conn.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+        if drop:
+            await conn.execute(text(f"DROP TABLE {name}"))
+        _known_partitions.discard(name)
+        detached.append(name)
+        logger.info(f"Секция {name} {'удалена' if drop else 'отсоединена'}")
+    return detached
+
+
+def name_before(name: str, before: datetime) -> bool:
+    """True, если секция name (см. partition_name) целиком лежит раньше before"""
+    parts = name[len(PARENT) + 1:].split('_')
+    try:
+        start = datetime(int(parts[0]), int(parts[1]), int(parts[2]) if len(parts) > 2 else 1, tzinfo=timezone.utc)
+    except (ValueError, IndexError):
+        return False
+    return next_period(start, 'day' if len(parts) > 2 else 'month') <= before
+
+
+async def main():
+    """Обслуживание секций: создание будущих и отсоединение старых"""
+    from app.database.db import engine
+
+    parser = argparse.ArgumentParser(description="Секции video_snapshots")
+    parser.add_argument("--detach-before", help="Отсоединить секции, целиком лежащие до даты YYYY-MM-DD")
+    parser.add_argument("--drop", action="store_true", help="Удалить отсоединенные секции")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    async with engine.begin() as conn:
+        if not await is_partitioned(conn):
+            raise Exception(f"Таблица {PARENT} не секционирована")
+        await ensure_upcoming_partitions(conn)
+        if args.detach_before:
+            before = datetime.fromisoformat(args.detach_before).replace(tzinfo=timezone.utc)
+            await detach_partitions_before(conn, before, drop=args.drop)
+        for name, bounds in await list_partitions(conn):
+            logger.info(f"{name}: {bounds}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
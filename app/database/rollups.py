@@ -0,0 +1,89 @@
+"""
+Rollups - дневные агрегаты video_snapshots для быстрых ответов по датам
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.database.db import engine, init_db
+from app.database.models import CreatorDailyStats, DailySnapshotStats
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('views', 'likes', 'comments', 'reports')
+
+# Агрегаты одного дня: суммы приростов и число разных видео с приростом
+AGGREGATES = ",\n".join(
+    ["COUNT(*)", "COUNT(DISTINCT s.video_id)"]
+    + [f"COALESCE(SUM(s.delta_{metric}_count), 0)" for metric in METRICS]
+    + [f"COUNT(DISTINCT s.video_id) FILTER (WHERE s.delta_{metric}_count > 0)" for metric in METRICS]
+)
+COLUMNS = ", ".join(
+    ["snapshots_count", "videos_count"]
+    + [f"sum_delta_{metric}_count" for metric in METRICS]
+    + [f"videos_with_{metric}_growth" for metric in METRICS]
+)
+
+# Пересчитываются дни, начиная с дня :since (в часовом поясе сессии, как и created_at::date)
+SINCE_DAY = "(CAST(:since AS timestamptz))::date"
+
+REFRESH_DAILY = f"""
+INSERT INTO {DailySnapshotStats.__tablename__} (day, {COLUMNS})
+SELECT s.created_at::date AS day,
+{AGGREGATES}
+FROM video_snapshots s
+WHERE (CAST(:since AS timestamptz) IS NULL OR s.created_at >= {SINCE_DAY})
+GROUP BY s.created_at::date
+"""
+
+REFRESH_CREATOR_DAILY = f"""
+INSERT INTO {CreatorDailyStats.__tablename__} (creator_id, day, {COLUMNS})
+SELECT v.creator_id, s.created_at::date AS day,
+{AGGREGATES}
+FROM video_snapshots s
+JOIN videos v ON v.id = s.video_id
+WHERE (CAST(:since AS timestamptz) IS NULL OR s.created_at >= {SINCE_DAY})
+GROUP BY v.creator_id, s.created_at::date
+"""
+
+
+async def refresh_rollups(conn: AsyncConnection, since: Optional[datetime] = None):
+    """
+    Пересчитывает дневные агрегаты.
+
+    since=None перестраивает агрегаты целиком. Иначе пересчитываются только
+    дни, начиная с дня since: снапшоты дописываются строго по времени, поэтому
+    более ранние дни не меняются. Выполняется в транзакции conn — читатели
+    видят старые агрегаты до коммита.
+    """
+    for model in (DailySnapshotStats, CreatorDailyStats):
+        if since is None:
+            await conn.execute(text(f"DELETE FROM {model.__tablename__}"))
+        else:
+            await conn.execute(
+                text(f"DELETE FROM {model.__tablename__} WHERE day >= {SINCE_DAY}"),
+                {'since': since},
+            )
+
+    await conn.execute(text(REFRESH_DAILY), {'since': since})
+    await conn.execute(text(REFRESH_CREATOR_DAILY), {'since': since})
+    logger.info(f"Дневные агрегаты пересчитаны ({'полностью' if since is None else f'с {since}'})")
+
+
+async def main():
+    """Полностью перестраивает агрегаты (например, после обновления схемы)"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    await init_db()
+    async with engine.begin() as conn:
+        await refresh_rollups(conn)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,297 @@
+"""
+Columnar - колоночная копия videos и video_snapshots в памяти процесса (NumPy)
+для ответов на типовые вопросы без запроса к PostgreSQL.
+
+Идентификаторы видео и креаторов закодированы словарем (int32), даты —
+номера дней (int32), снапшоты отсортированы по created_at, а для дней
+построен индекс смещений: выборка за период — это срез массива.
+Копия помечена версией данных loader_state и перечитывается в фоне,
+когда загрузчик ее меняет; пока копия не актуальна, вопросы уходят в SQL.
+
+Включается COLUMNAR_ENGINE=1, нужен numpy (pip install numpy).
+"""
+import asyncio
+import logging
+import time
+from datetime import date
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+
+from app.database.db import get_read_session, read_data_version
+from app.services.fast_path import QueryIntent
+from app.services.metrics import registry
+from app.services.result_cache import data_version
+from app.storage.config import COLUMNAR_ENGINE
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('views', 'likes', 'comments', 'reports')
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# Не чаще одной попытки перечитать данные за столько секунд
+RELOAD_INTERVAL = 5.0
+# Строк в одной части результата при загрузке копии
+LOAD_CHUNK_ROWS = 50000
+
+# Дни считаются в часовом поясе сессии БД — так же, как ::date в SQL
+VIDEOS_SQL = (
+    "SELECT id, creator_id, video_created_at::date - DATE '1970-01-01', "
+    + ", ".join(f"{metric}_count" for metric in METRICS)
+    + " FROM videos"
+)
+SNAPSHOTS_SQL = (
+    "SELECT video_id, created_at::date - DATE '1970-01-01', "
+    + ", ".join(f"delta_{metric}_count" for metric in METRICS)
+    + " FROM video_snapshots ORDER BY created_at"
+)
+
+
+# Типы вопросов fast_path, которые движок считает сам (метод с тем же именем)
+EVALUATED_KINDS = (
+    'count_videos',
+    'count_videos_by_creator',
+    'count_videos_published',
+    'count_videos_threshold',
+    'sum_delta',
+    'count_videos_with_growth',
+)
+
+
+def day_number(value: str) -> int:
+    """'YYYY-MM-DD' -> номер дня от 1970-01-01"""
+    return date.fromisoformat(value).toordinal() - EPOCH_ORDINAL
+
+
+class ColumnarBuilder:
+    """
+    Собирает колоночную копию по частям результата запроса.
+
+    Массивы выделяются сразу по числу строк, каждая часть раскладывается
+    по ним и отбрасывается — строки SQLAlchemy не копятся в памяти.
+    """
+
+    def __init__(self, videos_count: int, snapshots_count: int):
+        self.video_index: Dict[str, int] = {}
+        self.creators: List[str] = []
+        self.video_day = np.empty(videos_count, dtype=np.int32)
+        self.counts = {metric: np.empty(videos_count, dtype=np.int64) for metric in METRICS}
+        self.videos_filled = 0
+
+        self.snapshot_video = np.empty(snapshots_count, dtype=np.int32)
+        self.snapshot_day = np.empty(snapshots_count, dtype=np.int32)
+        self.deltas = {metric: np.empty(snapshots_count, dtype=np.int64) for metric in METRICS}
+        self.snapshots_filled = 0
+
+    def add_videos(self, rows: Sequence[Tuple]):
+        """id, creator_id, день публикации, счетчики METRICS"""
+        start, stop = self.videos_filled, self.videos_filled + len(rows)
+        for code, row in enumerate(rows, start):
+            self.video_index[row[0]] = code
+        self.creators.extend(row[1] for row in rows)
+        self.video_day[start:stop] = [row[2] for row in rows]
+        for i, metric in enumerate(METRICS):
+            self.counts[metric][start:stop] = [row[3 + i] for row in rows]
+        self.videos_filled = stop
+
+    def add_snapshots(self, rows: Sequence[Tuple]):
+        """video_id, день, приросты METRICS; части — в порядке created_at"""
+        start, stop = self.snapshots_filled, self.snapshots_filled + len(rows)
+        self.snapshot_video[start:stop] = [self.video_index[row[0]] for row in rows]
+        self.snapshot_day[start:stop] = [row[1] for row in rows]
+        for i, metric in enumerate(METRICS):
+            self.deltas[metric][start:stop] = [row[2 + i] for row in rows]
+        self.snapshots_filled = stop
+
+    def build(self, version: int) -> 'ColumnarData':
+        return ColumnarData(version, self)
+
+
+class ColumnarData:
+    """Неизменяемая колоночная копия обеих таблиц для одной версии данных"""
+
+    def __init__(self, version: int, builder: ColumnarBuilder):
+        self.version = version
+
+        videos = slice(0, builder.videos_filled)
+        self.video_index = builder.video_index
+        creators, creator_codes = np.unique(np.array(builder.creators, dtype=object), return_inverse=True)
+        self.creator_index: Dict[str, int] = {creator: code for code, creator in enumerate(creators)}
+        self.creator_code = creator_codes.astype(np.int32)
+        self.video_day = builder.video_day[videos]
+        self.counts = {metric: values[videos] for metric, values in builder.counts.items()}
+
+        snapshots = slice(0, builder.snapshots_filled)
+        self.snapshot_video = builder.snapshot_video[snapshots]
+        self.snapshot_day = builder.snapshot_day[snapshots]
+        self.deltas = {metric: values[snapshots] for metric, values in builder.deltas.items()}
+
+        # day_offsets[d - first_day] — индекс первого снапшота дня d (снапшоты отсортированы по времени)
+        if len(self.snapshot_day):
+            self.first_day = int(self.snapshot_day[0])
+            days = np.arange(self.first_day, int(self.snapshot_day[-1]) + 2, dtype=np.int32)
+            self.day_offsets = np.searchsorted(self.snapshot_day, days, side='left')
+        else:
+            self.first_day = 0
+            self.day_offsets = np.zeros(1, dtype=np.int64)
+
+    @classmethod
+    def from_rows(cls, version: int, videos: Sequence[Tuple], snapshots: Sequence[Tuple]) -> 'ColumnarData':
+        """Копия из готовых строк (в порядке VIDEOS_SQL и SNAPSHOTS_SQL)"""
+        builder = ColumnarBuilder(len(videos), len(snapshots))
+        builder.add_videos(videos)
+        builder.add_snapshots(snapshots)
+        return builder.build(version)
+
+    @property
+    def rows(self) -> int:
+        return len(self.video_day) + len(self.snapshot_day)
+
+    def day_slice(self, intent: QueryIntent) -> slice:
+        """Снапшоты за дни date_from..date_to включительно"""
+        last = len(self.day_offsets) - 1
+        start = min(max(day_number(intent.date_from) - self.first_day, 0), last)
+        stop = min(max(day_number(intent.date_to) + 1 - self.first_day, 0), last)
+        return slice(int(self.day_offsets[start]), int(self.day_offsets[max(start, stop)]))
+
+    def published_mask(self, intent: QueryIntent):
+        return (self.video_day >= day_number(intent.date_from)) & (self.video_day <= day_number(intent.date_to))
+
+    def count_videos(self, intent: QueryIntent) -> int:
+        return len(self.video_day)
+
+    def count_videos_by_creator(self, intent: QueryIntent) -> int:
+        code = self.creator_index.get(intent.creator_id)
+        if code is None:
+            return 0
+        mask = self.creator_code == code
+        if intent.date_from:
+            mask &= self.published_mask(intent)
+        return int(np.count_nonzero(mask))
+
+    def count_videos_published(self, intent: QueryIntent) -> int:
+        return int(np.count_nonzero(self.published_mask(intent)))
+
+    def count_videos_threshold(self, intent: QueryIntent) -> int:
+        values = self.counts[intent.metric]
+        mask = values > intent.threshold if intent.operator == '>' else values < intent.threshold
+        return int(np.count_nonzero(mask))
+
+    def sum_delta(self, intent: QueryIntent) -> int:
+        return int(self.deltas[intent.metric][self.day_slice(intent)].sum())
+
+    def count_videos_with_growth(self, intent: QueryIntent) -> int:
+        window = self.day_slice(intent)
+        videos = self.snapshot_video[window][self.deltas[intent.metric][window] > 0]
+        seen = np.zeros(len(self.video_day), dtype=bool)
+        seen[videos] = True
+        return int(np.count_nonzero(seen))
+
+    def evaluate(self, intent: QueryIntent) -> Optional[int]:
+        """Ответ на распознанный вопрос или None, если такой тип не поддерживается"""
+        if intent.kind not in EVALUATED_KINDS:
+            return None
+        return getattr(self, intent.kind)(intent)
+
+
+async def read_chunks(session, sql: str, add: Callable[[Sequence[Tuple]], None]):
+    """Читает результат серверным курсором по LOAD_CHUNK_ROWS строк и раскладывает каждую часть"""
+    result = await session.stream(text(sql))
+    # Размер части задается явно: yield_per для text() в сессии не действует, и partitions() отдал бы все разом
+    async for rows in result.partitions(LOAD_CHUNK_ROWS):
+        # Раскладка по массивам — CPU, не блокируем цикл событий
+        await asyncio.to_thread(add, rows)
+
+
+async def load_columnar() -> ColumnarData:
+    """Читает обе таблицы и версию данных одним снимком (REPEATABLE READ)"""
+    async with get_read_session() as session:
+        await session.execute(text("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY"))
+        version = await read_data_version(session)
+        # В том же снимке число строк точное — массивы выделяются один раз
+        videos_count = (await session.execute(text("SELECT COUNT(*) FROM videos"))).scalar()
+        snapshots_count = (await session.execute(text("SELECT COUNT(*) FROM video_snapshots"))).scalar()
+        builder = ColumnarBuilder(videos_count, snapshots_count)
+        await read_chunks(session, VIDEOS_SQL, builder.add_videos)
+        await read_chunks(session, SNAPSHOTS_SQL, builder.add_snapshots)
+    return await asyncio.to_thread(builder.build, version)
+
+
+class ColumnarEngine:
+    """
+    Отвечает на типовые вопросы по колоночной копии, если она актуальна.
+
+    answer() возвращает None (и вопрос уходит в SQL), пока копия не
+    загружена или ее версия отличается от текущей версии данных;
+    перезагрузка в этом случае запускается в фоне.
+    """
+
+    def __init__(self, enabled: bool = COLUMNAR_ENGINE):
+        if enabled and np is None:
+            logger.warning("COLUMNAR_ENGINE=1, но numpy не установлен — колоночный движок отключен")
+        self.enabled = enabled and np is not None
+        self.data: Optional[ColumnarData] = None
+        self.hits = 0
+        self.misses = 0
+        self._reload: Optional[asyncio.Task] = None
+        self._reload_started = 0.0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0,
+            'version': self.data.version if self.data else None,
+            'rows': self.data.rows if self.data else 0,
+        }
+
+    async def answer(self, intent: QueryIntent) -> Optional[int]:
+        if not self.enabled:
+            return None
+        version = await data_version.current()
+        data = self.data
+        if version is None or data is None or data.version != version:
+            self.schedule_reload()
+            self.misses += 1
+            return None
+
+        started = time.perf_counter()
+        result = data.evaluate(intent)
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        logger.info(f"Колоночный движок: {intent.kind} за {(time.perf_counter() - started) * 1e6:.0f} мкс")
+        return result
+
+    def schedule_reload(self):
+        """Запускает фоновую перезагрузку, если она не идет и не запускалась недавно"""
+        if self._reload is not None and not self._reload.done():
+            return
+        if time.monotonic() - self._reload_started < RELOAD_INTERVAL:
+            return
+        self._reload_started = time.monotonic()
+        self._reload = asyncio.create_task(self.reload())
+
+    async def reload(self):
+        started = time.perf_counter()
+        try:
+            data = await load_columnar()
+        except Exception as e:
+            logger.warning(f"Не удалось загрузить колоночную копию, вопросы выполняются в SQL: {e}")
+            return
+        self.data = data
+        logger.info(
+            f"Колоночная копия загружена: версия данных {data.version}, {data.rows} строк "
+            f"за {time.perf_counter() - started:.2f} с"
+        )
+
+
+columnar_engine = ColumnarEngine()
+registry.gauge('bot_columnar_hit_ratio', 'Доля типовых вопросов, отвеченных колоночным движком', lambda: columnar_engine.stats()['hit_ratio'])
+registry.gauge('bot_columnar_rows', 'Строк в колоночной копии', lambda: columnar_engine.stats()['rows'])
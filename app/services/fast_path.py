@@ -0,0 +1,245 @@
+"""
+Fast Path - детерминированный разбор типовых вопросов в SQL без обращения к LLM
+"""
+import logging
+import re
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from app.services.metrics import registry
+from app.services.question_normalizer import NormalizedQuestion, normalize_question
+from app.storage.config import USE_ROLLUPS
+
+logger = logging.getLogger(__name__)
+
+# Метрика по слову из вопроса -> суффикс колонки (*_count, delta_*_count)
+METRICS = {
+    'просмотр': 'views',
+    'лайк': 'likes',
+    'коммент': 'comments',
+    'жалоб': 'reports',
+}
+METRIC = r'(?P<metric>просмотр\w*|лайк\w*|комментари\w*|жалоб\w*)'
+DATES = r'(?P<dates><date>(?: <date>)?)'
+PERIOD = r'(?: за период| в период| за)?'
+
+GREATER = ('больше', 'более', 'свыше', 'выше')
+LESS = ('меньше', 'менее', 'ниже')
+
+
+class QueryIntent(NamedTuple):
+    """Распознанный типовой вопрос"""
+    kind: str                           # см. INTENT_KINDS
+    metric: Optional[str] = None        # 'views' | 'likes' | 'comments' | 'reports'
+    creator_id: Optional[str] = None
+    date_from: Optional[str] = None     # YYYY-MM-DD
+    date_to: Optional[str] = None       # YYYY-MM-DD, включительно
+    operator: Optional[str] = None      # '>' | '<'
+    threshold: Optional[int] = None
+
+
+# Шаблоны нормализованных вопросов (см. question_normalizer) -> тип вопроса
+PATTERNS: List[Tuple[str, re.Pattern]] = [
+    ('count_videos', re.compile(
+        r'^сколько (?:всего )?видео(?: всего)?(?: есть)?(?: в (?:системе|базе|бд))?$'
+    )),
+    ('count_videos_by_creator', re.compile(
+        r'^сколько (?:всего )?видео (?:у|от) креатора(?: с)? <id>'
+        r'(?: (?:было )?(?:вышло|опубликовано|выпущено|загружено)' + PERIOD + r' ' + DATES + r')?$'
+    )),
+    ('count_videos_published', re.compile(
+        r'^сколько (?:всего )?видео (?:было )?(?:вышло|опубликовано|выпущено|загружено)' + PERIOD + r' ' + DATES + r'$'
+    )),
+    ('count_videos_threshold', re.compile(
+        r'^сколько (?:всего )?видео (?:набрало|набрали|получило|получили|имеет|имеют|имело) '
+        r'(?P<compare>' + '|'.join(GREATER + LESS) + r') <num> ' + METRIC + r'(?: за все время)?$'
+    )),
+    ('sum_delta', re.compile(
+        r'^(?:на )?сколько (?:всего )?' + METRIC + r' (?:в сумме |суммарно |всего )?'
+        r'(?:выросли|выросло|прибавили|набрали|получили) (?:в сумме |суммарно )?все видео' + PERIOD + r' ' + DATES + r'$'
+    )),
+    ('sum_delta', re.compile(
+        r'^на сколько (?:в сумме |суммарно )?(?:выросли|выросло|выросла) (?:все )?' + METRIC +
+        r'(?: всех видео)?' + PERIOD + r' ' + DATES + r'$'
+    )),
+    ('count_videos_with_growth', re.compile(
+        r'^сколько (?:разных|уникальных|различных) видео (?:получали|получили|набирали|набрали) (?:новые )?' + METRIC +
+        PERIOD + r' ' + DATES + r'$'
+    )),
+]
+
+
+def metric_of(word: str) -> str:
+    """Возвращает метрику по слову из вопроса ("просмотров" -> "views")"""
+    for stem, metric in METRICS.items():
+        if word.startswith(stem):
+            return metric
+    raise ValueError(f"Неизвестная метрика: {word}")
+
+
+def match_question(question: str) -> Optional[QueryIntent]:
+    """Распознает типовой вопрос; None, если вопрос не подходит ни под один шаблон"""
+    return match_normalized(normalize_question(question))
+
+
+def match_normalized(normalized: NormalizedQuestion) -> Optional[QueryIntent]:
+    """Распознает типовой вопрос по его нормализованной форме"""
+    ids = [literal.value for literal in normalized.literals if literal.kind == 'id']
+    dates = [literal.value for literal in normalized.literals if literal.kind == 'date']
+    numbers = [int(literal.value) for literal in normalized.literals if literal.kind == 'num']
+
+    for kind, pattern in PATTERNS:
+        match = pattern.match(normalized.template)
+        if match is None:
+            continue
+
+        groups = match.groupdict()
+        date_from = dates[0] if dates else None
+        date_to = dates[-1] if dates else None
+        if date_from and date_to and date_from > date_to:
+            return None
+
+        return QueryIntent(
+            kind=kind,
+            metric=metric_of(groups['metric']) if groups.get('metric') else None,
+            creator_id=ids[0] if ids else None,
+            date_from=date_from,
+            date_to=date_to,
+            operator=('>' if groups['compare'] in GREATER else '<') if groups.get('compare') else None,
+            threshold=numbers[0] if numbers else None,
+        )
+    return None
+
+
+def quote(value: str) -> str:
+    """Экранирует строковый литерал SQL"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def date_filter(column: str, intent: QueryIntent) -> str:
+    """Условие по дате в том же виде, что и в примерах системного промпта"""
+    if intent.date_from == intent.date_to:
+        return f"{column}::date = {quote(intent.date_from)}"
+    return f"{column}::date BETWEEN {quote(intent.date_from)} AND {quote(intent.date_to)}"
+
+
+def count_videos_sql(intent: QueryIntent) -> str:
+    """Сколько всего видео"""
+    return "SELECT COUNT(id) FROM videos"
+
+
+def count_videos_by_creator_sql(intent: QueryIntent) -> str:
+    """Сколько видео у креатора (за период публикации)"""
+    sql = f"SELECT COUNT(id) FROM videos WHERE creator_id = {quote(intent.creator_id)}"
+    if intent.date_from:
+        sql += " AND " + date_filter('video_created_at', intent)
+    return sql
+
+
+def count_videos_published_sql(intent: QueryIntent) -> str:
+    """Сколько видео опубликовано за дату/период"""
+    return "SELECT COUNT(id) FROM videos WHERE " + date_filter('video_created_at', intent)
+
+
+def count_videos_threshold_sql(intent: QueryIntent) -> str:
+    """Сколько видео набрало больше/меньше N"""
+    return f"SELECT COUNT(id) FROM videos WHERE {intent.metric}_count {intent.operator} {intent.threshold}"
+
+
+def day_filter(intent: QueryIntent) -> str:
+    """Условие по дню для дневных агрегатов"""
+    if intent.date_from == intent.date_to:
+        return f"day = {quote(intent.date_from)}"
+    return f"day BETWEEN {quote(intent.date_from)} AND {quote(intent.date_to)}"
+
+
+def sum_delta_sql(intent: QueryIntent) -> str:
+    """На сколько выросла метрика за дату/период"""
+    if USE_ROLLUPS:
+        return (
+            f"SELECT COALESCE(SUM(sum_delta_{intent.metric}_count), 0) FROM daily_snapshot_stats "
+            f"WHERE {day_filter(intent)}"
+        )
+    return (
+        f"SELECT COALESCE(SUM(delta_{intent.metric}_count), 0) FROM video_snapshots "
+        f"WHERE {date_filter('created_at', intent)}"
+    )
+
+
+def count_videos_with_growth_sql(intent: QueryIntent) -> str:
+    """Сколько разных видео получали прирост метрики за дату/период"""
+    # Число разных видео за несколько дней не складывается из дневных значений
+    if USE_ROLLUPS and intent.date_from == intent.date_to:
+        return (
+            f"SELECT COALESCE(SUM(videos_with_{intent.metric}_growth), 0) FROM daily_snapshot_stats "
+            f"WHERE {day_filter(intent)}"
+        )
+    return (
+        f"SELECT COUNT(DISTINCT video_id) FROM video_snapshots "
+        f"WHERE {date_filter('created_at', intent)} AND delta_{intent.metric}_count > 0"
+    )
+
+
+SQL_BUILDERS: Dict[str, Callable[[QueryIntent], str]] = {
+    'count_videos': count_videos_sql,
+    'count_videos_by_creator': count_videos_by_creator_sql,
+    'count_videos_published': count_videos_published_sql,
+    'count_videos_threshold': count_videos_threshold_sql,
+    'sum_delta': sum_delta_sql,
+    'count_videos_with_growth': count_videos_with_growth_sql,
+}
+INTENT_KINDS = tuple(SQL_BUILDERS)
+
+
+def intent_to_sql(intent: QueryIntent) -> str:
+    """Строит SQL для распознанного вопроса"""
+    return SQL_BUILDERS[intent.kind](intent)
+
+
+class FastPathStats:
+    """Счетчики быстрого пути"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.match_time = 0.0
+
+    def stats(self) -> dict:
+        """Статистика попаданий и среднее время разбора"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0,
+            'avg_match_us': self.match_time / total * 1e6 if total else 0.0,
+        }
+
+
+fast_path_stats = FastPathStats()
+
+
+def match_fast_path(question: str) -> Optional[QueryIntent]:
+    """
+    Распознает типовой вопрос с учетом статистики быстрого пути.
+
+    Время разбора и доля попаданий пишутся в лог.
+    """
+    started = time.perf_counter()
+    intent = match_question(question)
+    elapsed = time.perf_counter() - started
+
+    fast_path_stats.match_time += elapsed
+    if intent is None:
+        fast_path_stats.misses += 1
+        return None
+
+    fast_path_stats.hits += 1
+    stats = fast_path_stats.stats()
+    logger.info(
+        f"Быстрый путь: {intent.kind} за {elapsed * 1e6:.0f} мкс без LLM "
+        f"(попаданий {stats['hits']}/{stats['hits'] + stats['misses']}, {stats['hit_ratio']:.0%})"
+    )
+    return intent
+
+
+registry.gauge('bot_fast_path_hit_ratio', 'Доля вопросов, разобранных без LLM', lambda: fast_path_stats.stats()['hit_ratio'])
@@ -0,0 +1,268 @@
+"""
+LLM Client - обертка над AsyncOpenAI: таймаут каждой попытки, ограничение
+параллельных запросов, дублирующий (hedged) запрос при долгом ответе,
+повторы с экспоненциальной задержкой и разбросом и предохранитель
+(circuit breaker), который при недоступности API сразу отказывает —
+вопросы продолжают обслуживать быстрый путь и кэши
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+
+import openai
+from openai import AsyncOpenAI
+
+from app.services.metrics import registry
+from app.storage.config import (
+    LLM_BREAKER_FAILURES,
+    LLM_BREAKER_RESET,
+    LLM_HEDGE_QUANTILE,
+    LLM_MAX_CONCURRENT,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_DELAY,
+    LLM_TIMEOUT,
+    OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+)
+
+logger = logging.getLogger(__name__)
+
+# Ошибки, после которых имеет смысл повторить запрос (сеть, таймаут, 429, 5xx)
+RETRYABLE_ERRORS = (
+    asyncio.TimeoutError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+# Порог hedging считается по последним LATENCY_WINDOW ответам, не раньше HEDGE_MIN_SAMPLES
+LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+
+
+class LLMUnavailableError(Exception):
+    """LLM недоступен: предохранитель разомкнут или все попытки завершились ошибкой"""
+
+
+class CircuitBreaker:
+    """
+    Предохранитель.
+
+    После failure_threshold ошибок подряд размыкается на reset_timeout секунд:
+    вызовы сразу отклоняются. Затем пропускает один пробный вызов — успех
+    замыкает предохранитель, ошибка снова размыкает.
+    """
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, reset_timeout: float = LLM_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return 'open'
+        return 'half_open'
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half_open' and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info("Предохранитель LLM замкнут: API снова отвечает")
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.probing or (self.opened_at is None and self.failures >= self.failure_threshold):
+            logger.warning(f"Предохранитель LLM разомкнут на {self.reset_timeout:.0f} с после {self.failures} ошибок подряд")
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+    def release(self):
+        """Вызов завершился без вердикта о доступности (отмена, ошибка не сети)"""
+        self.probing = False
+
+
+class LLMClient:
+    """
+    Вызовы chat.completions с защитой от медленного и недоступного API.
+
+    - попытка ограничена timeout секундами (у stream() — вместе с чтением
+      потока); ошибки сети, таймауты, 429 и 5xx повторяются до max_retries
+      попыток с задержкой retry_delay * 2^n со случайным разбросом (чтобы
+      повторы разных вопросов не совпадали);
+    - одновременно идет не больше max_concurrent запросов, остальные ждут;
+    - если ответ дольше квантиля hedge_quantile недавних задержек и есть
+      свободный слот, отправляется второй такой же запрос и берется первый
+      ответ (только create(), не stream());
+    - при разомкнутом предохранителе — сразу LLMUnavailableError.
+    """
+
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        timeout: float = LLM_TIMEOUT,
+        max_retries: int = LLM_MAX_RETRIES,
+        retry_delay: float = LLM_RETRY_DELAY,
+        max_concurrent: int = LLM_MAX_CONCURRENT,
+        hedge_quantile: float = LLM_HEDGE_QUANTILE,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.client = client
+        self.timeout = timeout
+        self.max_retries = max(max_retries, 1)
+        self.retry_delay = retry_delay
+        self.hedge_quantile = hedge_quantile
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.requests = 0
+        self.retries = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.rejected = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """Квантиль недавних задержек или None, если данных мало или hedging выключен"""
+        if self.hedge_quantile <= 0 or len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(len(ordered) * self.hedge_quantile), len(ordered) - 1)]
+
+    async def create(self, **kwargs: Any) -> Any:
+        """
+        client.chat.completions.create(**kwargs) с таймаутом, повторами и hedging.
+
+        Raises:
+            LLMUnavailableError: Предохранитель разомкнут или попытки исчерпаны
+            openai.APIStatusError: Ошибка запроса, которую повтор не исправит (400, 401, ...)
+        """
+        return await self._retry(lambda: self._hedged(kwargs))
+
+    async def stream(self, consume: Callable[[Any], Awaitable[Any]], **kwargs: Any) -> Any:
+        """
+        Потоковый запрос (stream=True): открывает поток и читает его consume(response).
+
+        Таймаут ограничивает попытку целиком — открытие и чтение потока, —
+        поэтому ответ, который приходит по токену слишком медленно, считается
+        ошибкой попытки: повтор и предохранитель, как при любом таймауте.
+        consume вызывается заново на каждой попытке. Без дублей.
+
+        Returns:
+            Результат consume(response)
+        """
+        return await self._retry(lambda: self._call({**kwargs, 'stream': True}, consume))
+
+    async def _retry(self, attempt_call: Callable[[], Awaitable[Any]]) -> Any:
+        """Попытки с повторами и задержкой; исход каждой попытки — в предохранитель"""
+        for attempt in range(1, self.max_retries + 1):
+            if not self.breaker.allow():
+                self.rejected += 1
+                raise LLMUnavailableError("LLM временно недоступен (предохранитель разомкнут)")
+            try:
+                response = await attempt_call()
+            except RETRYABLE_ERRORS as e:
+                self.breaker.record_failure()
+                error = str(e) or type(e).__name__
+                if attempt == self.max_retries:
+                    raise LLMUnavailableError(f"LLM не ответил за {self.max_retries} попыток: {error}")
+                delay = self.retry_delay * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                self.retries += 1
+                logger.warning(f"Ошибка LLM (попытка {attempt}/{self.max_retries}): {error}. Повтор через {delay:.2f} с")
+                await asyncio.sleep(delay)
+                continue
+            except openai.APIStatusError:
+                # API ответил (400, 401, ...) — он доступен, но повтор не поможет
+                self.breaker.record_success()
+                raise
+            finally:
+                self.breaker.release()
+            self.breaker.record_success()
+            return response
+
+    async def _request(self, kwargs: dict, consume: Optional[Callable[[Any], Awaitable[Any]]]) -> Any:
+        """Запрос к API и, для потока, чтение ответа целиком"""
+        response = await self.client.chat.completions.create(**kwargs)
+        if consume is not None:
+            return await consume(response)
+        return response
+
+    async def _call(self, kwargs: dict, consume: Optional[Callable[[Any], Awaitable[Any]]] = None) -> Any:
+        """Одна попытка: слот параллельности и таймаут (для потока — вместе с чтением)"""
+        async with self._semaphore:
+            self.requests += 1
+            started = time.perf_counter()
+            # wait_for, а не asyncio.timeout(): тот есть только начиная с Python 3.11
+            result = await asyncio.wait_for(self._request(kwargs, consume), self.timeout)
+            if consume is None:
+                self.latencies.append(time.perf_counter() - started)
+            return result
+
+    async def _hedged(self, kwargs: dict) -> Any:
+        """Попытка с дублем: если первый запрос отвечает дольше квантиля, отправляем второй"""
+        first = asyncio.create_task(self._call(kwargs))
+        tasks = {first}
+        try:
+            delay = self.hedge_delay()
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                # Без свободного слота дубль только добавил бы очередь
+                if not done and not self._semaphore.locked():
+                    self.hedged += 1
+                    logger.info(f"LLM отвечает дольше {delay * 1000:.0f} мс — отправляем дублирующий запрос")
+                    tasks.add(asyncio.create_task(self._call(kwargs)))
+
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                answered = [task for task in done if task.exception() is None]
+                if answered:
+                    if answered[0] is not first:
+                        self.hedge_wins += 1
+                    return answered[0].result()
+                error = next(iter(done)).exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            'requests': self.requests,
+            'retries': self.retries,
+            'hedged': self.hedged,
+            'hedge_wins': self.hedge_wins,
+            'rejected': self.rejected,
+            'breaker': self.breaker.state,
+        }
+
+
+def make_openai_client(api_key: Optional[str], base_url: Optional[str]) -> AsyncOpenAI:
+    """AsyncOpenAI без собственных повторов SDK — повторяет LLMClient"""
+    return AsyncOpenAI(api_key=api_key, base_url=base_url or None, max_retries=0, timeout=LLM_TIMEOUT)
+
+
+llm_client = LLMClient(make_openai_client(OPENAI_API_KEY, OPENAI_BASE_URL))
+registry.gauge('bot_llm_breaker_open', 'Предохранитель LLM разомкнут (1) или пропускает пробный вызов', lambda: int(llm_client.breaker.state != 'closed'))
+for name in ('retries', 'hedged', 'hedge_wins', 'rejected'):
+    registry.counter_func(
+        f'bot_llm_{name}_total',
+        f'Клиент LLM: {name}',
+        lambda name=name: llm_client.stats()[name],
+    )
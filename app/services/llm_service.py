@@ -1,91 +1,140 @@
 """
 LLM Service для преобразования естественного языка в SQL-запросы
 """
-import os
+import json
 import logging
-from datetime import datetime
-from openai import AsyncOpenAI
+import time
+from typing import Dict, List, Optional, Tuple
+from app.services.llm_client import LLMUnavailableError, llm_client
+from app.services.metrics import LLM_FIRST_TOKEN, LLM_LATENCY, LLM_TOKENS, log_event
+from app.services.prompt_builder import prompt_builder
+from app.storage.config import LLM_STREAMING
 
 logger = logging.getLogger(__name__)
 
-# Инициализация клиента OpenAI
-client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-# Системный промпт для Text-to-SQL
-SYSTEM_PROMPT = """Ты эксперт по PostgreSQL. Твоя задача — генерировать ТОЛЬКО SQL-код на основе вопроса пользователя.
-
-## Схема базы данных
-
-### Таблица `videos` (итоговая статистика по видео)
-- id (String) - идентификатор видео
-- creator_id (String) - идентификатор креатора
-- video_created_at (TIMESTAMP WITH TIME ZONE) - дата и время публикации видео
-- views_count (BIGINT) - финальное количество просмотров
-- likes_count (INTEGER) - финальное количество лайков
-- comments_count (INTEGER) - финальное количество комментариев
-- reports_count (INTEGER) - финальное количество жалоб
-- created_at (TIMESTAMP WITH TIME ZONE) - дата создания записи
-- updated_at (TIMESTAMP WITH TIME ZONE) - дата обновления записи
-
-### Таблица `video_snapshots` (почасовые замеры статистики)
-- id (String) - идентификатор снапшота
-- video_id (String) - ссылка на видео (FK -> videos.id)
-- views_count (BIGINT) - просмотры на момент замера
-- likes_count (INTEGER) - лайки на момент замера
-- comments_count (INTEGER) - комментарии на момент замера
-- reports_count (INTEGER) - жалобы на момент замера
-- delta_views_count (BIGINT) - прирост просмотров с прошлого замера
-- delta_likes_count (INTEGER) - прирост лайков с прошлого замера
-- delta_comments_count (INTEGER) - прирост комментариев с прошлого замера
-- delta_reports_count (INTEGER) - прирост жалоб с прошлого замера
-- created_at (TIMESTAMP WITH TIME ZONE) - время замера (раз в час)
-- updated_at (TIMESTAMP WITH TIME ZONE) - дата обновления записи
-
-## КРИТИЧЕСКИЕ ПРАВИЛА
-
-1. **Ответ должен содержать ТОЛЬКО SQL-запрос** - без markdown, без кавычек, без объяснений
-2. **Запрос ОБЯЗАН возвращать РОВНО ОДНО ЧИСЛО** - используй COUNT, SUM, AVG и т.д.
-3. **Для подсчета количества видео** → используй таблицу `videos`
-4. **Для подсчета динамики/прироста за конкретную дату** → используй таблицу `video_snapshots` и суммируй `delta_*`
-5. **Для фильтрации по датам**:
-   - Используй `::date` для приведения timestamp к дате
-   - Формат дат: 'YYYY-MM-DD'
-   - Для диапазона используй `BETWEEN` или `>=` и `<=`
-6. **Если год не указан** - используй 2025 год (данные из ноября-декабря 2025)
-7. **Текущая дата**: {current_date}
-
-## Примеры запросов
-
-Вопрос: "Сколько всего видео есть в системе?"
-SQL: SELECT COUNT(id) FROM videos
-
-Вопрос: "Сколько видео у креатора с id abc123 вышло с 1 ноября 2025 по 5 ноября 2025 включительно?"
-SQL: SELECT COUNT(id) FROM videos WHERE creator_id = 'abc123' AND video_created_at::date BETWEEN '2025-11-01' AND '2025-11-05'
-
-Вопрос: "Сколько видео набрало больше 100000 просмотров за всё время?"
-SQL: SELECT COUNT(id) FROM videos WHERE views_count > 100000
-
-Вопрос: "На сколько просмотров в сумме выросли все видео 28 ноября 2025?"
-SQL: SELECT COALESCE(SUM(delta_views_count), 0) FROM video_snapshots WHERE created_at::date = '2025-11-28'
-
-Вопрос: "Сколько разных видео получали новые просмотры 27 ноября 2025?"
-SQL: SELECT COUNT(DISTINCT video_id) FROM video_snapshots WHERE created_at::date = '2025-11-27' AND delta_views_count > 0
-
-Вопрос: "Сколько лайков набрали все видео за период с 26 по 28 ноября?"
-SQL: SELECT COALESCE(SUM(delta_likes_count), 0) FROM video_snapshots WHERE created_at::date BETWEEN '2025-11-26' AND '2025-11-28'
-
-## ВАЖНО
-- Всегда используй COALESCE для SUM, чтобы вернуть 0 вместо NULL
-- Для подсчета уникальных видео используй COUNT(DISTINCT video_id)
-- Для фильтрации "больше N" используй оператор >
-- Для фильтрации "меньше N" используй оператор <
-"""
+# Клиент OpenAI (таймауты, повторы, hedging и предохранитель — в llm_client.py)
+client = llm_client.client
+
+
+def record_usage(usage, elapsed: float):
+    """Токены запроса: prompt (из них cached — взяты из кэша префикса) и completion"""
+    if usage is None:
+        return
+    details = getattr(usage, 'prompt_tokens_details', None)
+    cached = (getattr(details, 'cached_tokens', None) or 0) if details else 0
+    LLM_TOKENS.inc(usage.prompt_tokens, type='prompt')
+    LLM_TOKENS.inc(cached, type='cached')
+    LLM_TOKENS.inc(usage.completion_tokens, type='completion')
+    log_event(
+        'llm',
+        prompt_tokens=usage.prompt_tokens,
+        cached_tokens=cached,
+        completion_tokens=usage.completion_tokens,
+        latency_ms=round(elapsed * 1000, 1),
+    )
+
+
+def clean_sql(text: str) -> str:
+    """Убирает markdown-блоки ```sql ... ``` вокруг запроса"""
+    sql_query = text.strip()
+    if sql_query.startswith("```"):
+        # Убираем ```sql и ```
+        sql_query = sql_query.replace("```sql", "").replace("```", "").strip()
+    return sql_query
+
+
+def complete_statement(text: str) -> Optional[str]:
+    """
+    SQL, если в начале потока уже есть законченное выражение, иначе None.
+
+    Выражение закончено на первой ";" вне строк и идентификаторов в кавычках
+    или на закрывающем ``` markdown-блока.
+    """
+    quote = None
+    for index, char in enumerate(text):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ("'", '"'):
+            quote = char
+        elif char == ';':
+            return clean_sql(text[:index])
+    stripped = text.lstrip()
+    if stripped.startswith("```") and stripped.count("```") >= 2:
+        return clean_sql(stripped[:stripped.index("```", 3) + 3])
+    return None
+
+
+async def complete(messages: List[Dict[str, str]]) -> str:
+    """Обычный запрос: ждем весь ответ"""
+    started = time.perf_counter()
+    response = await llm_client.create(
+        model="gpt-4o-mini",  # Можно использовать gpt-3.5-turbo для экономии
+        messages=messages,
+        temperature=0,  # Детерминированный вывод
+        max_tokens=200,  # SQL запросы обычно короткие
+    )
+    
+    elapsed = time.perf_counter() - started
+    LLM_LATENCY.observe(elapsed)
+    record_usage(response.usage, elapsed)
+    content = response.choices[0].message.content
+    # Все, что модель дописала после выражения, отбрасываем
+    return complete_statement(content) or clean_sql(content)
+
+
+async def stream(messages: List[Dict[str, str]]) -> str:
+    """
+    Потоковый запрос: возвращает SQL, как только выражение закончено,
+    и закрывает поток — остаток генерации (пояснения и т.п.) не ждем.
+
+    Поток читается внутри попытки llm_client.stream(): чтение целиком
+    ограничено LLM_TIMEOUT, медленный поток повторяется как любая ошибка.
+    """
+    started = time.perf_counter()
+
+    async def read(response) -> Tuple[Optional[str], List[str]]:
+        parts: List[str] = []
+        try:
+            async for chunk in response:
+                if chunk.usage:
+                    record_usage(chunk.usage, time.perf_counter() - started)
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                if not parts:
+                    LLM_FIRST_TOKEN.observe(time.perf_counter() - started)
+                parts.append(chunk.choices[0].delta.content)
+                sql_query = complete_statement(''.join(parts))
+                if sql_query is not None:
+                    return sql_query, parts
+        finally:
+            # Закрытие соединения останавливает генерацию на стороне API
+            await response.close()
+        return None, parts
+
+    sql_query, parts = await llm_client.stream(
+        read,
+        model="gpt-4o-mini",
+        messages=messages,
+        temperature=0,
+        max_tokens=200,
+        stream_options={"include_usage": True},
+    )
+
+    elapsed = time.perf_counter() - started
+    LLM_LATENCY.observe(elapsed)
+    early = sql_query is not None
+    log_event('llm_stream', early_stop=early, chunks=len(parts), latency_ms=round(elapsed * 1000, 1))
+    return sql_query if early else clean_sql(''.join(parts))
 
 
 async def ask_llm(query: str) -> str:
     """
     Преобразует естественный запрос в SQL.
     
+    С LLM_STREAMING ответ читается потоком, и SQL возвращается сразу после
+    завершающей ";" — не дожидаясь конца генерации.
+    
     Args:
         query: Вопрос пользователя на русском языке
         
@@ -93,36 +142,74 @@ async def ask_llm(query: str) -> str:
         SQL-запрос в виде строки
         
     Raises:
+        LLMUnavailableError: Если LLM недоступен (предохранитель, исчерпаны попытки)
         Exception: Если не удалось получить ответ от LLM
     """
     try:
-        # Формируем промпт с текущей датой
-        current_date = datetime.now().strftime("%Y-%m-%d")
-        system_prompt = SYSTEM_PROMPT.format(current_date=current_date)
+        # Схема и правила — неизменный префикс, затем примеры под вопрос и текущая дата
+        messages = prompt_builder.build(query)
         
         logger.info(f"Отправляем запрос в LLM: {query}")
         
         # Вызываем OpenAI API
-        response = await client.chat.completions.create(
-            model="gpt-4o-mini",  # Можно использовать gpt-3.5-turbo для экономии
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": query}
-            ],
-            temperature=0,  # Детерминированный вывод
-            max_tokens=200,  # SQL запросы обычно короткие
-        )
-        
-        sql_query = response.choices[0].message.content.strip()
-        
-        # Очищаем от возможных markdown блоков
-        if sql_query.startswith("```"):
-            # Убираем ```sql и ```
-            sql_query = sql_query.replace("```sql", "").replace("```", "").strip()
+        sql_query = await (stream(messages) if LLM_STREAMING else complete(messages))
         
         logger.info(f"Получен SQL: {sql_query}")
         return sql_query
         
+    except LLMUnavailableError as e:
+        logger.warning(f"LLM недоступен: {e}")
+        raise
     except Exception as e:
         logger.error(f"Ошибка при обращении к LLM: {e}")
         raise Exception(f"Не удалось сгенерировать SQL-запрос: {e}")
+
+
+async def ask_llm_batch(questions: List[str]) -> List[str]:
+    """
+    Преобразует несколько вопросов в SQL одним запросом к LLM.
+    
+    Модель отвечает JSON-объектом {"queries": [...]} — по SQL на вопрос,
+    в том же порядке.
+    
+    Args:
+        questions: Вопросы пользователя
+        
+    Returns:
+        SQL-запросы в порядке вопросов
+        
+    Raises:
+        LLMUnavailableError: Если LLM недоступен (предохранитель, исчерпаны попытки)
+        Exception: Если LLM не ответил или ответ не разобран
+    """
+    try:
+        messages = prompt_builder.build_batch(questions)
+        logger.info(f"Отправляем в LLM {len(questions)} вопросов одним запросом")
+        
+        started = time.perf_counter()
+        response = await llm_client.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            temperature=0,
+            max_tokens=200 * len(questions),
+            response_format={"type": "json_object"},
+        )
+        elapsed = time.perf_counter() - started
+        LLM_LATENCY.observe(elapsed)
+        record_usage(response.usage, elapsed)
+        
+        queries = json.loads(response.choices[0].message.content).get("queries")
+        if not isinstance(queries, list) or len(queries) != len(questions) \
+                or not all(isinstance(sql, str) and sql.strip() for sql in queries):
+            raise Exception(f"ожидался список из {len(questions)} SQL-запросов")
+        
+        sql_queries = [complete_statement(sql) or clean_sql(sql) for sql in queries]
+        logger.info(f"Получено SQL: {len(sql_queries)}")
+        return sql_queries
+        
+    except LLMUnavailableError as e:
+        logger.warning(f"LLM недоступен: {e}")
+        raise
+    except Exception as e:
+        logger.error(f"Ошибка при обращении к LLM: {e}")
+        raise Exception(f"Не удалось сгенерировать SQL-запросы: {e}")
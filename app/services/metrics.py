@@ -0,0 +1,192 @@
+"""
+Metrics - гистограммы задержек, счетчики и текстовый формат Prometheus для /metrics
+"""
+import json
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм задержек, секунды
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def format_labels(labels: Labels) -> str:
+    """(('stage', 'llm'),) -> {stage="llm"}"""
+    if not labels:
+        return ''
+    pairs = ','.join(f'{name}="{value}"' for name, value in labels)
+    return '{' + pairs + '}'
+
+
+def format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Монотонный счетчик с метками"""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{format_labels(labels)} {format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (как prometheus_client.Histogram)"""
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        # метки -> [счетчики по корзинам, сумма, количество]
+        self._series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Замеряет время блока with"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(tuple(sorted(labels.items())))
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            for bound, bucket_count in zip(self.buckets, counts):
+                le = labels + (('le', format_value(bound)),)
+                lines.append(f"{self.name}_bucket{format_labels(le)} {bucket_count}")
+            lines.append(f"{self.name}_bucket{format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{format_labels(labels)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(labels)} {count}")
+        return lines
+
+
+class Gauge:
+    """Значение, вычисляемое в момент чтения (доля попаданий кэша, занятые соединения)"""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], float]):
+        self.name = name
+        self.help = help_text
+        self.read = read
+
+    def render(self) -> List[str]:
+        try:
+            value = self.read()
+        except Exception as e:
+            logger.warning(f"Не удалось прочитать метрику {self.name}: {e}")
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", f"{self.name} {format_value(value)}"]
+
+
+class CounterFunc(Gauge):
+    """
+    Монотонный счетчик, который ведет сам объект (повторы клиента LLM,
+    отказы планировщика) и читается в момент экспорта. Тип counter:
+    rate() работает, а обнуление при перезапуске процесса Prometheus
+    распознает как сброс счетчика.
+    """
+
+    kind = 'counter'
+
+
+class Registry:
+    """Все метрики процесса"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help_text, buckets))
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float]) -> Gauge:
+        gauge = self._metrics[name] = Gauge(name, help_text, read)
+        return gauge
+
+    def counter_func(self, name: str, help_text: str, read: Callable[[], float]) -> CounterFunc:
+        counter = self._metrics[name] = CounterFunc(name, help_text, read)
+        return counter
+
+    def render(self) -> str:
+        """Текстовый формат экспозиции Prometheus"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+# Задержки этапов обработки вопроса
+QUERY_LATENCY = registry.histogram('bot_query_seconds', 'Полное время обработки вопроса (process_user_query)')
+LLM_LATENCY = registry.histogram('bot_llm_request_seconds', 'Время ответа OpenAI на генерацию SQL')
+LLM_FIRST_TOKEN = registry.histogram('bot_llm_first_token_seconds', 'Время до первого токена ответа OpenAI (LLM_STREAMING)')
+SQL_LATENCY = registry.histogram('bot_sql_execute_seconds', 'Время выполнения SQL в Postgres (без кэша)')
+POOL_CHECKOUT = registry.histogram('bot_db_pool_checkout_seconds', 'Ожидание соединения из пула БД')
+SEND_LATENCY = registry.histogram('bot_telegram_send_seconds', 'Время отправки ответа в Telegram')
+QUEUE_WAIT = registry.histogram('bot_scheduler_queue_wait_seconds', 'Ожидание слота в планировщике')
+
+QUERIES = registry.counter('bot_queries_total', 'Обработанные вопросы по источнику SQL')
+QUERY_ERRORS = registry.counter('bot_query_errors_total', 'Вопросы, завершившиеся ошибкой')
+LLM_TOKENS = registry.counter('bot_llm_tokens_total', 'Токены OpenAI по типу (prompt/cached/completion)')
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    """GET /metrics"""
+    return web.Response(text=registry.render(), content_type='text/plain', charset='utf-8')
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """Отдельный сервер /metrics (в режиме polling, где нет webhook-сервера)"""
+    app = web.Application()
+    app.router.add_get('/metrics', metrics_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Метрики доступны на http://{host}:{port}/metrics")
+    return runner
+
+
+def log_event(event: str, **fields):
+    """Структурированная строка лога: одна JSON-запись на событие"""
+    logger.info(json.dumps({'event': event, **fields}, ensure_ascii=False, default=str))
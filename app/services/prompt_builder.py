@@ -0,0 +1,223 @@
+"""
+Prompt Builder - сообщения для Text-to-SQL в порядке, удобном для кэша префикса:
+сначала неизменная схема и правила, затем примеры, подобранные под вопрос,
+и в самом конце — текущая дата
+"""
+import re
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from app.services.question_normalizer import normalize_question
+from app.storage.config import PROMPT_EXAMPLES, USE_ROLLUPS
+
+# Неизменная часть: одна и та же во всех запросах процесса, поэтому провайдер
+# кэширует ее как префикс (OpenAI — начиная с 1024 токенов)
+SCHEMA_PROMPT = """Ты эксперт по PostgreSQL. Твоя задача — генерировать ТОЛЬКО SQL-код на основе вопроса пользователя.
+
+## Схема базы данных
+
+### Таблица `videos` (итоговая статистика по видео)
+- id (String) - идентификатор видео
+- creator_id (String) - идентификатор креатора
+- video_created_at (TIMESTAMP WITH TIME ZONE) - дата и время публикации видео
+- views_count (BIGINT) - финальное количество просмотров
+- likes_count (INTEGER) - финальное количество лайков
+- comments_count (INTEGER) - финальное количество комментариев
+- reports_count (INTEGER) - финальное количество жалоб
+- created_at (TIMESTAMP WITH TIME ZONE) - дата создания записи
+- updated_at (TIMESTAMP WITH TIME ZONE) - дата обновления записи
+
+### Таблица `video_snapshots` (почасовые замеры статистики)
+- id (String) - идентификатор снапшота
+- video_id (String) - ссылка на видео (FK -> videos.id)
+- views_count (BIGINT) - просмотры на момент замера
+- likes_count (INTEGER) - лайки на момент замера
+- comments_count (INTEGER) - комментарии на момент замера
+- reports_count (INTEGER) - жалобы на момент замера
+- delta_views_count (BIGINT) - прирост просмотров с прошлого замера
+- delta_likes_count (INTEGER) - прирост лайков с прошлого замера
+- delta_comments_count (INTEGER) - прирост комментариев с прошлого замера
+- delta_reports_count (INTEGER) - прирост жалоб с прошлого замера
+- created_at (TIMESTAMP WITH TIME ZONE) - время замера (раз в час)
+- updated_at (TIMESTAMP WITH TIME ZONE) - дата обновления записи
+
+## КРИТИЧЕСКИЕ ПРАВИЛА
+
+1. **Ответ должен содержать ТОЛЬКО SQL-запрос** - без markdown, без кавычек, без объяснений; заверши его точкой с запятой `;`
+2. **Запрос ОБЯЗАН возвращать РОВНО ОДНО ЧИСЛО** - используй COUNT, SUM, AVG и т.д.
+3. **Для подсчета количества видео** → используй таблицу `videos`
+4. **Для подсчета динамики/прироста за конкретную дату** → используй таблицу `video_snapshots` и суммируй `delta_*`
+5. **Для фильтрации по датам**:
+   - Используй `::date` для приведения timestamp к дате
+   - Формат дат: 'YYYY-MM-DD'
+   - Для диапазона используй `BETWEEN` или `>=` и `<=`
+6. **Если год не указан** - используй 2025 год (данные из ноября-декабря 2025)
+7. **Текущая дата** указана в конце, после примеров
+
+## ВАЖНО
+- Всегда используй COALESCE для SUM, чтобы вернуть 0 вместо NULL
+- Для подсчета уникальных видео используй COUNT(DISTINCT video_id)
+- Для фильтрации "больше N" используй оператор >
+- Для фильтрации "меньше N" используй оператор <
+"""
+
+# Дополнение про дневные агрегаты (если USE_ROLLUPS включен) — тоже часть префикса
+ROLLUPS_PROMPT = """
+## Дневные агрегаты (используй их вместо video_snapshots, где возможно)
+
+### Таблица `daily_snapshot_stats` (одна строка на день замера)
+- day (DATE) - день замера (= video_snapshots.created_at::date)
+- snapshots_count (INTEGER) - число замеров за день
+- videos_count (INTEGER) - число разных видео с замерами за день
+- sum_delta_views_count, sum_delta_likes_count, sum_delta_comments_count, sum_delta_reports_count (BIGINT) - суммы приростов за день
+- videos_with_views_growth, videos_with_likes_growth, videos_with_comments_growth, videos_with_reports_growth (INTEGER) - число разных видео с приростом > 0 за день
+
+### Таблица `creator_daily_stats` (одна строка на креатора и день)
+- creator_id (String), day (DATE) и те же колонки, что в `daily_snapshot_stats`
+
+### Правила
+- Сумму прироста за дату или период считай как SUM(sum_delta_*) по `daily_snapshot_stats` с фильтром по `day`
+- Прирост у видео конкретного креатора — по `creator_daily_stats` с фильтром `creator_id = '...'`
+- videos_with_*_growth можно брать только за ОДИН день; число разных видео за период считай по `video_snapshots`
+"""
+
+# Несколько вопросов в одном запросе — после примеров, чтобы не менять префикс
+BATCH_PROMPT = """## Несколько вопросов
+
+Вопросы пронумерованы, по одному на строке. Верни JSON-объект
+{"queries": ["SQL для вопроса 1", "SQL для вопроса 2", ...]} — ровно по одному
+SQL-запросу на каждый вопрос, в том же порядке, без точки с запятой. Все правила
+выше действуют для каждого запроса."""
+
+
+class Example(NamedTuple):
+    """Пример вопроса и SQL для few-shot"""
+    question: str
+    sql: str
+    rollups: Optional[bool] = None  # True — только с USE_ROLLUPS, False — только без, None — всегда
+
+
+EXAMPLES: List[Example] = [
+    Example(
+        "Сколько всего видео есть в системе?",
+        "SELECT COUNT(id) FROM videos",
+    ),
+    Example(
+        "Сколько видео у креатора с id abc123 вышло с 1 ноября 2025 по 5 ноября 2025 включительно?",
+        "SELECT COUNT(id) FROM videos WHERE creator_id = 'abc123' AND video_created_at::date BETWEEN '2025-11-01' AND '2025-11-05'",
+    ),
+    Example(
+        "Сколько видео набрало больше 100000 просмотров за всё время?",
+        "SELECT COUNT(id) FROM videos WHERE views_count > 100000",
+    ),
+    Example(
+        "На сколько просмотров в сумме выросли все видео 28 ноября 2025?",
+        "SELECT COALESCE(SUM(delta_views_count), 0) FROM video_snapshots WHERE created_at::date = '2025-11-28'",
+        rollups=False,
+    ),
+    Example(
+        "Сколько разных видео получали новые просмотры с 25 по 27 ноября 2025?",
+        "SELECT COUNT(DISTINCT video_id) FROM video_snapshots "
+        "WHERE created_at::date BETWEEN '2025-11-25' AND '2025-11-27' AND delta_views_count > 0",
+    ),
+    Example(
+        "Сколько лайков набрали все видео за период с 26 по 28 ноября?",
+        "SELECT COALESCE(SUM(delta_likes_count), 0) FROM video_snapshots WHERE created_at::date BETWEEN '2025-11-26' AND '2025-11-28'",
+        rollups=False,
+    ),
+    Example(
+        "На сколько просмотров в сумме выросли все видео 28 ноября 2025?",
+        "SELECT COALESCE(SUM(sum_delta_views_count), 0) FROM daily_snapshot_stats WHERE day = '2025-11-28'",
+        rollups=True,
+    ),
+    Example(
+        "Сколько разных видео получали новые просмотры 27 ноября 2025?",
+        "SELECT COALESCE(SUM(videos_with_views_growth), 0) FROM daily_snapshot_stats WHERE day = '2025-11-27'",
+        rollups=True,
+    ),
+    Example(
+        "На сколько выросли лайки у видео креатора abc123 с 26 по 28 ноября?",
+        "SELECT COALESCE(SUM(sum_delta_likes_count), 0) FROM creator_daily_stats "
+        "WHERE creator_id = 'abc123' AND day BETWEEN '2025-11-26' AND '2025-11-28'",
+        rollups=True,
+    ),
+]
+
+WORD_RE = re.compile(r'<\w+>|\w{3,}')
+# Слова, одинаковые почти во всех вопросах, не помогают выбрать пример
+STOP_STEMS = {'скол', 'всег', 'виде', 'сумм'}
+
+
+def stems(question: str) -> set:
+    """Основы слов нормализованного вопроса (первые 4 буквы) и плейсхолдеры <date>, <id>, <num>"""
+    words = WORD_RE.findall(normalize_question(question).template)
+    return {word if word.startswith('<') else word[:4] for word in words} - STOP_STEMS
+
+
+def format_examples(examples: Iterable[Example]) -> str:
+    return "## Примеры запросов\n\n" + "\n\n".join(
+        f'Вопрос: "{example.question}"\nSQL: {example.sql}' for example in examples
+    )
+
+
+class PromptBuilder:
+    """
+    Собирает сообщения для chat.completions.
+
+    1. system: схема и правила (+ дневные агрегаты) — неизменный префикс;
+    2. system: examples_count примеров, ближайших к вопросу, и текущая дата;
+    3. user: вопрос.
+
+    examples_count=0 (по умолчанию) кладет все примеры в неизменный префикс:
+    промпт длиннее, но почти весь берется из кэша провайдера. examples_count > 0
+    сокращает промпт, но примеры меняются от вопроса к вопросу и в кэш не попадают.
+    """
+
+    def __init__(self, examples_count: int = PROMPT_EXAMPLES, use_rollups: bool = USE_ROLLUPS):
+        self.examples_count = examples_count
+        self.prefix = SCHEMA_PROMPT + (ROLLUPS_PROMPT if use_rollups else "")
+        self.examples = [
+            (example, stems(example.question))
+            for example in EXAMPLES
+            if example.rollups is None or example.rollups == use_rollups
+        ]
+        if examples_count <= 0:
+            self.prefix += "\n" + format_examples(example for example, _ in self.examples)
+
+    def select_examples(self, question: str) -> List[Example]:
+        """Примеры с наибольшим пересечением основ слов; порядок — как в EXAMPLES"""
+        if self.examples_count <= 0:
+            return []
+        words = stems(question)
+        scored = sorted(
+            range(len(self.examples)),
+            key=lambda index: (-len(words & self.examples[index][1]), index),
+        )
+        chosen = sorted(scored[:self.examples_count])
+        return [self.examples[index][0] for index in chosen]
+
+    def build(self, question: str, now: Optional[datetime] = None) -> List[Dict[str, str]]:
+        """Сообщения для вопроса; текущая дата — в конце, чтобы не ломать кэш префикса"""
+        current_date = (now or datetime.now()).strftime("%Y-%m-%d")
+        examples = self.select_examples(question)
+        tail = f"{format_examples(examples)}\n\n" if examples else ""
+        return [
+            {"role": "system", "content": self.prefix},
+            {"role": "system", "content": f"{tail}Текущая дата: {current_date}"},
+            {"role": "user", "content": question},
+        ]
+
+    def build_batch(self, questions: List[str], now: Optional[datetime] = None) -> List[Dict[str, str]]:
+        """Сообщения для нескольких вопросов сразу: ответ — JSON со списком SQL"""
+        current_date = (now or datetime.now()).strftime("%Y-%m-%d")
+        examples = self.select_examples(" ".join(questions))
+        tail = f"{format_examples(examples)}\n\n" if examples else ""
+        numbered = "\n".join(f"{index}. {question}" for index, question in enumerate(questions, 1))
+        return [
+            {"role": "system", "content": self.prefix},
+            {"role": "system", "content": f"{tail}{BATCH_PROMPT}\n\nТекущая дата: {current_date}"},
+            {"role": "user", "content": numbered},
+        ]
+
+
+prompt_builder = PromptBuilder()
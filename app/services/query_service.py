@@ -1,9 +1,21 @@
 """
 Query Service - главный сервис для обработки запросов пользователя
 """
+import asyncio
 import logging
-from app.services.llm_service import ask_llm
-from app.services.sql_executor import execute_sql_query
+import time
+from typing import Dict, List, Union
+from app.services.columnar import columnar_engine
+from app.services.fast_path import intent_to_sql, match_fast_path
+from app.services.llm_client import LLMUnavailableError
+from app.services.llm_service import ask_llm, ask_llm_batch
+from app.services.metrics import QUERIES, QUERY_ERRORS, QUERY_LATENCY, log_event, registry
+from app.services.result_cache import data_version, result_cache
+from app.services.scheduler import QueryScheduler
+from app.services.sql_cache import sql_template_cache
+from app.services.sql_executor import execute_sql_batch, execute_sql_query
+from app.services.sql_rewriter import rewrite_date_predicates
+from app.storage.cache_store import cache_store
 
 logger = logging.getLogger(__name__)
 
@@ -13,9 +25,13 @@ async def process_user_query(user_query: str) -> int:
     Обрабатывает запрос пользователя на естественном языке.
     
     Workflow:
-    1. Отправляет запрос в LLM для генерации SQL
-    2. Выполняет полученный SQL в базе данных
-    3. Возвращает числовой результат
+    1. Пробует разобрать типовой вопрос без LLM (fast_path) и ответить
+       по колоночной копии в памяти (columnar), если она включена и актуальна
+    2. Ищет SQL-шаблон для нормализованного вопроса в кэше
+    3. Если шаблона нет — генерирует SQL через LLM
+    4. Переписывает фильтры ::date в диапазоны, использующие индексы
+    5. Выполняет полученный SQL в базе данных (и кэширует сгенерированный)
+    6. Возвращает числовой результат
     
     Args:
         user_query: Вопрос пользователя на русском языке
@@ -26,18 +42,192 @@ async def process_user_query(user_query: str) -> int:
     Raises:
         Exception: Если не удалось обработать запрос
     """
+    started = time.perf_counter()
+    timings = {}
+    source = None
     try:
         logger.info(f"Обработка запроса: {user_query}")
         
-        # Шаг 1: Генерируем SQL через LLM
-        sql_query = await ask_llm(user_query)
+        # Шаг 1: Типовые вопросы разбираем локально
+        intent = match_fast_path(user_query)
+        if intent is not None:
+            result = await columnar_engine.answer(intent)
+            if result is not None:
+                elapsed = time.perf_counter() - started
+                QUERY_LATENCY.observe(elapsed)
+                QUERIES.inc(source="columnar")
+                log_event('query', source="columnar", total_ms=round(elapsed * 1000, 1))
+                return result
+        sql_query = intent_to_sql(intent) if intent else None
+        source = "fast_path"
         
-        # Шаг 2: Выполняем SQL
-        result = await execute_sql_query(sql_query)
+        # Шаг 2: Ищем готовый SQL-шаблон в кэше
+        if sql_query is None:
+            sql_query = await sql_template_cache.lookup(user_query)
+            source = "cache"
+        
+        # Шаг 3: Генерируем SQL через LLM
+        generated = sql_query is None
+        if generated:
+            llm_started = time.perf_counter()
+            sql_query = await ask_llm(user_query)
+            timings['llm_ms'] = (time.perf_counter() - llm_started) * 1000
+            source = "llm"
+        
+        logger.info(f"SQL получен ({source}) за {(time.perf_counter() - started) * 1000:.1f} мс")
+        
+        # Шаг 4: Делаем фильтры по датам sargable и выполняем SQL
+        sql_started = time.perf_counter()
+        # SQL быстрого пути построен локально — EXPLAIN для него не нужен
+        result = await execute_sql_query(rewrite_date_predicates(sql_query), trusted=source == "fast_path")
+        timings['sql_ms'] = (time.perf_counter() - sql_started) * 1000
+        
+        # Кэшируем только SQL, который успешно выполнился
+        if generated:
+            sql_template_cache.put(user_query, sql_query)
         
         logger.info(f"Результат: {result}")
+        elapsed = time.perf_counter() - started
+        QUERY_LATENCY.observe(elapsed)
+        QUERIES.inc(source=source)
+        log_event('query', source=source, total_ms=round(elapsed * 1000, 1), **{
+            name: round(value, 1) for name, value in timings.items()
+        })
         return result
         
     except Exception as e:
         logger.error(f"Ошибка при обработке запроса: {e}")
+        QUERY_ERRORS.inc(source=source or "none")
+        log_event('query_error', source=source, total_ms=round((time.perf_counter() - started) * 1000, 1), error=str(e))
         raise
+
+
+async def generate_sql_batch(questions: List[str]) -> List[Union[str, Exception]]:
+    """
+    SQL для вопросов без шаблона: один запрос к LLM на все вопросы.
+    
+    Если пакетный ответ не получен или не разобран, вопросы отправляются
+    в LLM по одному (параллельно); если LLM недоступен — не отправляются.
+    """
+    if len(questions) > 1:
+        try:
+            return await ask_llm_batch(questions)
+        except LLMUnavailableError as e:
+            return [e] * len(questions)
+        except Exception as e:
+            logger.warning(f"Пакетная генерация SQL не удалась, генерируем по одному: {e}")
+    return await asyncio.gather(*(ask_llm(question) for question in questions), return_exceptions=True)
+
+
+async def process_batch(questions: List[str]) -> List[Union[int, Exception]]:
+    """
+    Обрабатывает несколько вопросов одного сообщения.
+    
+    Шаги те же, что в process_user_query(), но SQL для всех вопросов без
+    быстрого пути и шаблона генерируется одним запросом к LLM, а все
+    запросы выполняются одним SELECT (q1), (q2), ... (execute_sql_batch).
+    
+    Args:
+        questions: Вопросы пользователя
+        
+    Returns:
+        Для каждого вопроса — число или исключение (ошибка одного вопроса
+        не мешает ответить на остальные)
+    """
+    started = time.perf_counter()
+    results: List[Union[int, Exception, None]] = [None] * len(questions)
+    sources: Dict[int, str] = {}
+    sql_queries: Dict[int, str] = {}
+    generate: List[int] = []
+    
+    # Шаги 1-2: быстрый путь, колоночный движок и кэш шаблонов — как для одного вопроса
+    for index, question in enumerate(questions):
+        intent = match_fast_path(question)
+        if intent is not None:
+            result = await columnar_engine.answer(intent)
+            if result is not None:
+                results[index] = result
+                sources[index] = "columnar"
+                continue
+            sql_queries[index] = intent_to_sql(intent)
+            sources[index] = "fast_path"
+            continue
+        sql_query = await sql_template_cache.lookup(question)
+        if sql_query is not None:
+            sql_queries[index] = sql_query
+            sources[index] = "cache"
+        else:
+            generate.append(index)
+    
+    # Шаг 3: один запрос к LLM на все оставшиеся вопросы
+    if generate:
+        llm_started = time.perf_counter()
+        generated = await generate_sql_batch([questions[index] for index in generate])
+        logger.info(f"SQL для {len(generate)} вопросов получен за {(time.perf_counter() - llm_started) * 1000:.1f} мс")
+        for index, sql_query in zip(generate, generated):
+            sources[index] = "llm"
+            if isinstance(sql_query, Exception):
+                results[index] = sql_query
+            else:
+                sql_queries[index] = sql_query
+    
+    # Шаги 4-5: все запросы — одним обращением к БД
+    indexes = list(sql_queries)
+    values = await execute_sql_batch(
+        [rewrite_date_predicates(sql_queries[index]) for index in indexes],
+        trusted=[sources[index] == "fast_path" for index in indexes],
+    )
+    for index, value in zip(indexes, values):
+        results[index] = value
+        if sources[index] == "llm" and not isinstance(value, Exception):
+            sql_template_cache.put(questions[index], sql_queries[index])
+    
+    elapsed = time.perf_counter() - started
+    for index, result in enumerate(results):
+        if isinstance(result, Exception):
+            QUERY_ERRORS.inc(source=sources[index])
+        else:
+            QUERY_LATENCY.observe(elapsed)
+            QUERIES.inc(source=sources[index])
+    log_event(
+        'batch', questions=len(questions), generated=len(generate),
+        errors=sum(isinstance(result, Exception) for result in results),
+        total_ms=round(elapsed * 1000, 1),
+    )
+    return results
+
+
+async def warmup_caches():
+    """
+    Загружает SQL-шаблоны и результаты текущей версии данных из постоянного
+    хранилища (CACHE_STORE), чтобы после перезапуска кэши не были пустыми.
+    Запускается в фоне при старте бота: вопросы обрабатываются и во время прогрева.
+    """
+    if not cache_store.enabled:
+        return
+    started = time.perf_counter()
+    version = await data_version.current()
+    templates, results = await asyncio.gather(
+        sql_template_cache.warmup(),
+        result_cache.warmup(version) if version is not None else asyncio.sleep(0, 0),
+    )
+    logger.info(
+        f"Кэши прогреты из хранилища: {templates} SQL-шаблонов, {results} результатов "
+        f"(версия данных {version}) за {(time.perf_counter() - started) * 1000:.0f} мс"
+    )
+
+
+# Единый планировщик для обработчиков бота (см. scheduler.py)
+query_scheduler = QueryScheduler(process_user_query, batch_handler=process_batch)
+for name in ('running', 'queued'):
+    registry.gauge(
+        f'bot_scheduler_{name}',
+        f'Планировщик: {name}',
+        lambda name=name: query_scheduler.stats()[name],
+    )
+for name in ('coalesced', 'rejected'):
+    registry.counter_func(
+        f'bot_scheduler_{name}_total',
+        f'Планировщик: {name}',
+        lambda name=name: query_scheduler.stats()[name],
+    )
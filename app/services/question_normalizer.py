@@ -0,0 +1,187 @@
+"""
+Question Normalizer - приводит вопрос пользователя к канонической форме
+и извлекает из него литералы (даты, идентификаторы, числа)
+"""
+import re
+from datetime import date
+from typing import List, NamedTuple, Optional, Tuple
+
+# Если год не указан — используем 2025 (как и системный промпт LLM)
+DEFAULT_YEAR = 2025
+
+# Основы названий месяцев: "ноября", "ноябрь", "ноябре" и т.д.
+MONTHS = {
+    'январ': 1, 'феврал': 2, 'март': 3, 'апрел': 4, 'ма': 5, 'июн': 6,
+    'июл': 7, 'август': 8, 'сентябр': 9, 'октябр': 10, 'ноябр': 11, 'декабр': 12,
+}
+MONTH_RE = r'(январ[ьяе]|феврал[ьяе]|марта?|марте|апрел[ьяе]|ма[йяе]|июн[ьяе]|июл[ьяе]|августа?|августе|сентябр[ьяе]|октябр[ьяе]|ноябр[ьяе]|декабр[ьяе])'
+YEAR_RE = r'(?:\s+(\d{4})(?:\s*(?:года|год|г\.?))?)?'
+
+# "с 1 по 5 ноября 2025" / "с 26 ноября по 2 декабря"
+DATE_RANGE_RE = re.compile(
+    r'\bс\s+(\d{1,2})(?:\s+' + MONTH_RE + r')?' + YEAR_RE +
+    r'\s+(?:по|до)\s+(\d{1,2})\s+' + MONTH_RE + YEAR_RE + r'(?:\s+включительно)?'
+)
+# "28 ноября 2025"
+DATE_WORDS_RE = re.compile(r'\b(\d{1,2})\s+' + MONTH_RE + YEAR_RE)
+# "2025-11-28"
+DATE_ISO_RE = re.compile(r'\b(\d{4})-(\d{2})-(\d{2})\b')
+# "28.11.2025" / "28.11"
+DATE_DOTS_RE = re.compile(r'\b(\d{1,2})\.(\d{1,2})(?:\.(\d{4}))?\b')
+
+# Идентификаторы: UUID, hex-строки и токены после слова "id"
+UUID_RE = re.compile(r'\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b', re.IGNORECASE)
+ID_AFTER_WORD_RE = re.compile(r'\b(?:id|айди|ид)\s*[:=]?\s*([A-Za-z0-9_-]*\d[A-Za-z0-9_-]*|[A-Za-z][A-Za-z0-9_-]+)', re.IGNORECASE)
+HEX_TOKEN_RE = re.compile(r'\b(?=[0-9a-f]*[a-f])(?=[0-9a-f]*\d)[0-9a-f]{8,}\b', re.IGNORECASE)
+
+# Числа: "100000", "100 000", "1,5 млн", "10 тыс"
+NUMBER_RE = re.compile(
+    r'\b(\d{1,3}(?:[  ]\d{3})+|\d+(?:[.,]\d+)?)'
+    r'(?:\s*(млн|миллион\w*|млрд|миллиард\w*|тыс\w*|k|к)\b)?'
+)
+MULTIPLIERS = {'млн': 10 ** 6, 'миллион': 10 ** 6, 'млрд': 10 ** 9, 'миллиард': 10 ** 9, 'тыс': 10 ** 3, 'k': 10 ** 3, 'к': 10 ** 3}
+
+PUNCTUATION_RE = re.compile(r'[^\w<>\s]')
+SPACES_RE = re.compile(r'\s+')
+
+
+class Literal(NamedTuple):
+    """Литерал, извлеченный из вопроса"""
+    kind: str    # 'date' | 'id' | 'num'
+    value: str   # значение в том виде, в котором оно попадает в SQL
+
+
+class NormalizedQuestion(NamedTuple):
+    """Каноническая форма вопроса: шаблон с плейсхолдерами и литералы по порядку"""
+    template: str
+    literals: Tuple[Literal, ...]
+
+
+def month_number(word: str) -> int:
+    """Возвращает номер месяца по слову ("ноября" -> 11)"""
+    for stem, number in MONTHS.items():
+        if word.startswith(stem) and (stem != 'ма' or word in ('май', 'мая', 'мае')):
+            return number
+    raise ValueError(f"Неизвестный месяц: {word}")
+
+
+def make_date(day: str, month: int, year: Optional[str]) -> Optional[str]:
+    """Собирает дату в формате YYYY-MM-DD или None, если дата некорректна"""
+    try:
+        return date(int(year) if year else DEFAULT_YEAR, month, int(day)).isoformat()
+    except ValueError:
+        return None
+
+
+def parse_number(digits: str, multiplier: Optional[str]) -> Optional[int]:
+    """Переводит "100 000" / "1,5 млн" в целое число"""
+    value = float(re.sub(r'[  ]', '', digits).replace(',', '.'))
+    if multiplier:
+        for stem, factor in MULTIPLIERS.items():
+            if multiplier.startswith(stem):
+                value *= factor
+                break
+    if value != int(value):
+        return None
+    return int(value)
+
+
+def normalize_question(question: str) -> NormalizedQuestion:
+    """
+    Приводит вопрос к канонической форме.
+
+    Регистр, "ё", пунктуация и пробелы сворачиваются, а даты, идентификаторы
+    и числа заменяются плейсхолдерами <date>, <id>, <num>. Извлеченные значения
+    возвращаются в порядке появления в вопросе: даты в формате YYYY-MM-DD,
+    числа — как целые, идентификаторы — с исходным регистром.
+    """
+    found: List[Tuple[int, Literal]] = []
+    text = question.replace('ё', 'е').replace('Ё', 'Е')
+
+    def take(pattern: re.Pattern, handler, source: str) -> str:
+        # Заменяет совпадения плейсхолдером той же длины, чтобы позиции не смещались
+        def replace(match: re.Match) -> str:
+            literals = handler(match)
+            if not literals:
+                return match.group(0)
+            for offset, literal in enumerate(literals):
+                found.append((match.start() + offset, literal))
+            return '\x00' * (match.end() - match.start())
+        return pattern.sub(replace, source)
+
+    # Идентификаторы ищем до приведения к нижнему регистру
+    text = take(UUID_RE, lambda m: [Literal('id', m.group(0))], text)
+    text = take(ID_AFTER_WORD_RE, lambda m: [Literal('id', m.group(1))], text)
+    text = take(HEX_TOKEN_RE, lambda m: [Literal('id', m.group(0))], text)
+    text = text.lower()
+
+    def date_range(m: re.Match):
+        day_from, month_from, year_from, day_to, month_to, year_to = m.groups()
+        month_to_num = month_number(month_to)
+        start = make_date(day_from, month_number(month_from) if month_from else month_to_num, year_from or year_to)
+        end = make_date(day_to, month_to_num, year_to)
+        if start is None or end is None:
+            return None
+        return [Literal('date', start), Literal('date', end)]
+
+    def date_words(m: re.Match):
+        value = make_date(m.group(1), month_number(m.group(2)), m.group(3))
+        return [Literal('date', value)] if value else None
+
+    def date_iso(m: re.Match):
+        value = make_date(m.group(3), int(m.group(2)), m.group(1))
+        return [Literal('date', value)] if value else None
+
+    def date_dots(m: re.Match):
+        value = make_date(m.group(1), int(m.group(2)), m.group(3))
+        return [Literal('date', value)] if value else None
+
+    def number(m: re.Match):
+        value = parse_number(m.group(1), m.group(2))
+        return [Literal('num', str(value))] if value is not None else None
+
+    text = take(DATE_RANGE_RE, date_range, text)
+    text = take(DATE_WORDS_RE, date_words, text)
+    text = take(DATE_ISO_RE, date_iso, text)
+    text = take(DATE_DOTS_RE, date_dots, text)
+    text = take(NUMBER_RE, number, text)
+
+    # Собираем шаблон: каждый вырезанный фрагмент -> один плейсхолдер на литерал
+    found.sort(key=lambda item: item[0])
+    literals = tuple(literal for _, literal in found)
+    placeholders = iter(f' <{literal.kind}> ' for literal in literals)
+    pieces = []
+    position = 0
+    for start, _ in found:
+        if start < position:
+            # Второй литерал того же фрагмента (диапазон дат)
+            pieces.append(next(placeholders))
+            continue
+        end = start
+        while end < len(text) and text[end] == '\x00':
+            end += 1
+        pieces.append(text[position:start])
+        pieces.append(next(placeholders))
+        position = end
+    pieces.append(text[position:])
+
+    template = PUNCTUATION_RE.sub(' ', ''.join(pieces))
+    template = SPACES_RE.sub(' ', template).strip()
+    return NormalizedQuestion(template, literals)
+
+
+# Маркер пункта списка в начале строки: "1.", "2)", "-", "•"
+LIST_MARKER_RE = re.compile(r'^\s*(?:\d{1,2}[.)]|[-•*])\s+')
+
+
+def split_questions(message: str) -> List[str]:
+    """
+    Делит сообщение на вопросы: каждая непустая строка — отдельный вопрос,
+    маркеры списка ("1.", "2)", "-", "•") отбрасываются.
+    """
+    questions = []
+    for line in message.splitlines():
+        question = LIST_MARKER_RE.sub('', line).strip()
+        if question:
+            questions.append(question)
+    return questions
@@ -0,0 +1,176 @@
+"""
+Result Cache - кэш результатов SQL-запросов с инвалидацией по версии данных
+"""
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.database.db import get_data_version
+from app.services.metrics import registry
+from app.storage.cache_store import CacheStore, cache_store
+from app.storage.config import CACHE_STORE_RESULT_TTL, RESULT_CACHE_SIZE, RESULT_CACHE_VERSION_TTL
+
+logger = logging.getLogger(__name__)
+
+# Строковые литералы и идентификаторы в кавычках — их регистр и пробелы значимы
+STRING_LITERAL_RE = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+SPACES_RE = re.compile(r'\s+')
+SPACES_AROUND_PUNCT_RE = re.compile(r'\s*([(),=<>])\s*')
+
+
+def canonicalize_sql(sql: str) -> str:
+    """
+    Приводит SQL к канонической форме для ключа кэша.
+
+    Вне строковых литералов сворачиваются пробелы и регистр,
+    завершающая точка с запятой отбрасывается.
+    """
+    parts = STRING_LITERAL_RE.split(sql.strip().rstrip(';').strip())
+    for index in range(0, len(parts), 2):
+        part = SPACES_RE.sub(' ', parts[index].lower())
+        parts[index] = SPACES_AROUND_PUNCT_RE.sub(r'\1', part)
+    return ''.join(parts).strip()
+
+
+class DataVersion:
+    """
+    Версия данных из loader_state с локальным кэшированием.
+
+    Загрузчик работает в отдельном процессе, поэтому версия читается из БД,
+    но не чаще одного раза в ttl секунд.
+    """
+
+    def __init__(self, ttl: float = RESULT_CACHE_VERSION_TTL):
+        self.ttl = ttl
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+
+    async def current(self) -> Optional[int]:
+        """Возвращает версию данных или None, если ее не удалось прочитать"""
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < self.ttl:
+            return self._version
+
+        try:
+            version = await get_data_version()
+        except Exception as e:
+            logger.warning(f"Не удалось прочитать версию данных, кэш результатов отключен: {e}")
+            self._version = None
+            return None
+
+        if self._version is not None and version != self._version:
+            logger.info(f"Версия данных изменилась: {self._version} -> {version}")
+        self._version = version
+        self._checked_at = now
+        return version
+
+
+def store_key(version: int, key: str) -> str:
+    """Ключ результата в постоянном хранилище: версия данных входит в ключ"""
+    return f"result:{version}:{key}"
+
+
+class ResultCache:
+    """
+    LRU-кэш: канонический SQL -> (версия данных, результат).
+
+    Результаты также сохраняются в постоянное хранилище (store) с версией
+    данных в ключе: lookup() при промахе ищет результат там, warmup()
+    загружает результаты текущей версии при старте.
+    """
+
+    def __init__(self, max_size: int = RESULT_CACHE_SIZE, store: CacheStore = cache_store):
+        self.max_size = max_size
+        self.store = store
+        self._entries: "OrderedDict[str, Tuple[int, int]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.store_hits = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, sql: str, version: int) -> Optional[int]:
+        """Возвращает закэшированный результат, если он получен на той же версии данных"""
+        key = canonicalize_sql(sql)
+        entry = self._entries.get(key)
+
+        if entry is None or entry[0] != version:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    async def lookup(self, sql: str, version: int, shared: bool = True) -> Optional[int]:
+        """
+        get() и, при промахе, поиск результата той же версии в постоянном хранилище.
+
+        shared=False — только локальный кэш: дешевый запрос (быстрый путь)
+        выполняется примерно за то же время, что и поход в хранилище.
+        """
+        value = self.get(sql, version)
+        if value is not None or not shared or not self.store.enabled:
+            return value
+
+        key = canonicalize_sql(sql)
+        stored = await self.store.get(store_key(version, key))
+        if stored is None:
+            return None
+        # Промах get() оказался попаданием
+        self.misses -= 1
+        self.hits += 1
+        self.store_hits += 1
+        self._remember(key, version, int(stored))
+        return int(stored)
+
+    def put(self, sql: str, version: int, value: int, shared: bool = True):
+        """
+        Сохраняет результат запроса для версии данных.
+
+        shared=False — только локальный кэш, как и в lookup(): результат
+        дешевого запроса не стоит записи в хранилище через пул записи.
+        """
+        key = canonicalize_sql(sql)
+        self._remember(key, version, value)
+        if shared:
+            self.store.put(store_key(version, key), str(value), CACHE_STORE_RESULT_TTL)
+
+    def _remember(self, key: str, version: int, value: int):
+        self._entries[key] = (version, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def warmup(self, version: int) -> int:
+        """Загружает результаты версии данных version из постоянного хранилища"""
+        prefix = store_key(version, "")
+        entries = await self.store.scan(prefix, self.max_size)
+        for key, value in entries.items():
+            self._remember(key[len(prefix):], version, int(value))
+        return len(entries)
+
+    def clear(self):
+        """Очищает кэш"""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Статистика попаданий"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'store_hits': self.store_hits,
+            'hit_ratio': self.hits / total if total else 0.0,
+        }
+
+
+data_version = DataVersion()
+result_cache = ResultCache()
+registry.gauge('bot_result_cache_hit_ratio', 'Доля попаданий в кэш результатов SQL', lambda: result_cache.stats()['hit_ratio'])
@@ -0,0 +1,205 @@
+"""
+Scheduler - ограничение параллельных запросов, справедливая очередь
+пользователей и объединение одинаковых вопросов
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Tuple, Union
+
+from app.services.metrics import QUEUE_WAIT
+from app.services.question_normalizer import normalize_question
+from app.storage.config import (
+    SCHEDULER_MAX_CONCURRENT,
+    SCHEDULER_PER_USER_CONCURRENCY,
+    SCHEDULER_PER_USER_QUEUE,
+)
+
+logger = logging.getLogger(__name__)
+
+QueryHandler = Callable[[str], Awaitable[int]]
+BatchHandler = Callable[[List[str]], Awaitable[List[Union[int, Exception]]]]
+
+
+class TooManyRequestsError(Exception):
+    """У пользователя уже слишком много вопросов в очереди"""
+
+
+class UserSlot:
+    """Очередь одного пользователя: его выполняющиеся и ждущие вопросы"""
+
+    def __init__(self):
+        self.active = 0
+        self.pending = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        # Пользователь уже стоит в круговой очереди планировщика
+        self.scheduled = False
+
+
+def coalesce_key(question: str) -> Hashable:
+    """
+    Ключ объединения: нормализованный шаблон вопроса и его литералы.
+
+    "Сколько видео вышло 28 ноября?" и "сколько видео вышло 28.11.2025"
+    дают один ключ и выполняются один раз.
+    """
+    normalized = normalize_question(question)
+    return normalized.template, tuple(literal.value for literal in normalized.literals)
+
+
+class QueryScheduler:
+    """
+    Планировщик обработки вопросов.
+
+    - не более max_concurrent конвейеров LLM+SQL одновременно;
+    - освободившийся слот достается пользователям по кругу (round-robin):
+      у каждого своя очередь, и за один круг каждый пользователь с ждущими
+      вопросами получает один слот, поэтому всплеск из одного чата не
+      отодвигает остальных, сколько бы вопросов он ни поставил первым;
+    - у пользователя выполняется не более per_user_concurrency вопросов,
+      очередь пользователя не длиннее per_user_queue;
+    - одинаковые вопросы, которые уже выполняются, не запускаются повторно:
+      все ждут один и тот же результат (single-flight).
+
+    Несколько вопросов одного сообщения (submit_batch) обрабатываются
+    batch_handler как один вопрос: один слот пользователя и один глобальный.
+    """
+
+    def __init__(
+        self,
+        handler: QueryHandler,
+        batch_handler: Optional[BatchHandler] = None,
+        max_concurrent: int = SCHEDULER_MAX_CONCURRENT,
+        per_user_concurrency: int = SCHEDULER_PER_USER_CONCURRENCY,
+        per_user_queue: int = SCHEDULER_PER_USER_QUEUE,
+    ):
+        self.handler = handler
+        self.batch_handler = batch_handler
+        self.max_concurrent = max_concurrent
+        self.per_user_concurrency = per_user_concurrency
+        self.per_user_queue = per_user_queue
+        self._users: Dict[Hashable, UserSlot] = {}
+        # Пользователи, которым можно выдать слот, в порядке обхода
+        self._ready: Deque[Tuple[Hashable, UserSlot]] = deque()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.running = 0
+        self.started = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    async def submit(self, user_id: Hashable, question: str) -> int:
+        """
+        Обрабатывает вопрос пользователя с учетом ограничений.
+
+        Raises:
+            TooManyRequestsError: Если очередь пользователя переполнена
+            Exception: Ошибка обработки вопроса (общая для объединенных запросов)
+        """
+        return await self._submit(user_id, coalesce_key(question), self.handler, question)
+
+    async def submit_batch(self, user_id: Hashable, questions: List[str]) -> List[Union[int, Exception]]:
+        """
+        Обрабатывает несколько вопросов одного сообщения через batch_handler.
+
+        Raises:
+            TooManyRequestsError: Если очередь пользователя переполнена
+        """
+        key = ('batch',) + tuple(coalesce_key(question) for question in questions)
+        return await self._submit(user_id, key, self.batch_handler, questions)
+
+    async def _submit(self, user_id: Hashable, key: Hashable, handler: Callable[[Any], Awaitable[Any]], payload: Any):
+        """Single-flight по ключу и постановка в очередь пользователя"""
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            logger.info(f"Вопрос пользователя {user_id} объединен с уже выполняющимся")
+            # shield: отмена одного ожидающего не отменяет общий запрос
+            return await asyncio.shield(task)
+
+        slot = self._users.get(user_id)
+        if slot is None:
+            slot = self._users[user_id] = UserSlot()
+        if slot.pending >= self.per_user_concurrency + self.per_user_queue:
+            self.rejected += 1
+            raise TooManyRequestsError(f"Слишком много запросов от пользователя {user_id}")
+
+        slot.pending += 1
+        task = asyncio.create_task(self._run(user_id, slot, handler, payload))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Очередь пользователя освобождается, даже если задачу отменили до начала _run
+        task.add_done_callback(lambda _: self._forget(user_id, slot))
+        return await asyncio.shield(task)
+
+    def _schedule(self, user_id: Hashable, slot: UserSlot):
+        """Ставит пользователя в конец круга, если у него есть ждущие вопросы и свободный слот"""
+        if not slot.scheduled and slot.waiters and slot.active < self.per_user_concurrency:
+            slot.scheduled = True
+            self._ready.append((user_id, slot))
+
+    def _dispatch(self):
+        """Раздает свободные слоты: по одному вопросу следующему пользователю круга"""
+        while self.running < self.max_concurrent and self._ready:
+            user_id, slot = self._ready.popleft()
+            slot.scheduled = False
+            # Ожидание могло быть отменено до выдачи слота
+            while slot.waiters and slot.waiters[0].done():
+                slot.waiters.popleft()
+            if not slot.waiters:
+                continue
+            slot.waiters.popleft().set_result(None)
+            slot.active += 1
+            self.running += 1
+            self._schedule(user_id, slot)
+
+    def _release(self, user_id: Hashable, slot: UserSlot):
+        slot.active -= 1
+        self.running -= 1
+        self._schedule(user_id, slot)
+        self._dispatch()
+
+    async def _acquire(self, user_id: Hashable, slot: UserSlot):
+        """Ждет, пока круговая очередь выдаст вопросу слот"""
+        waiter = asyncio.get_running_loop().create_future()
+        slot.waiters.append(waiter)
+        self._schedule(user_id, slot)
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if not waiter.cancelled():
+                # Слот выдан в тот же момент, когда задачу отменили, — возвращаем его
+                self._release(user_id, slot)
+            elif waiter in slot.waiters:
+                slot.waiters.remove(waiter)
+            raise
+
+    async def _run(self, user_id: Hashable, slot: UserSlot, handler: Callable[[Any], Awaitable[Any]], payload: Any):
+        """Выполняет вопрос, дождавшись слота в круговой очереди"""
+        queued = time.perf_counter()
+        await self._acquire(user_id, slot)
+        try:
+            wait = time.perf_counter() - queued
+            QUEUE_WAIT.observe(wait)
+            if wait > 0.01:
+                logger.info(f"Вопрос пользователя {user_id} ждал в очереди {wait * 1000:.0f} мс")
+            self.started += 1
+            return await handler(payload)
+        finally:
+            self._release(user_id, slot)
+
+    def _forget(self, user_id: Hashable, slot: UserSlot):
+        slot.pending -= 1
+        if slot.pending == 0 and self._users.get(user_id) is slot:
+            del self._users[user_id]
+
+    def stats(self) -> dict:
+        """Текущая загрузка и счетчики планировщика"""
+        return {
+            'running': self.running,
+            'queued': sum(slot.pending for slot in self._users.values()) - self.running,
+            'started': self.started,
+            'coalesced': self.coalesced,
+            'rejected': self.rejected,
+        }
@@ -0,0 +1,183 @@
+"""
+SQL Cache - кэш сгенерированных LLM SQL-шаблонов по нормализованному вопросу
+"""
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.services.metrics import registry
+from app.services.question_normalizer import Literal, normalize_question
+from app.storage.cache_store import CacheStore, cache_store
+from app.storage.config import SQL_CACHE_SIZE, SQL_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+# Литералы, которые не должны остаться в шаблоне после подстановки плейсхолдеров:
+# иначе SQL зависит от чего-то, чего нет среди параметров вопроса
+LEFTOVER_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
+LEFTOVER_NUMBER_RE = re.compile(r"(?<![\w'])(\d+)(?![\w'])")
+# Относительные даты: результат зависит от момента генерации
+RELATIVE_TIME_RE = re.compile(r'\b(now|current_date|current_timestamp|localtimestamp|interval)\b', re.IGNORECASE)
+
+
+def placeholder(index: int) -> str:
+    """Плейсхолдер параметра в SQL-шаблоне"""
+    return f"__p{index}__"
+
+
+def literal_pattern(literal: Literal) -> re.Pattern:
+    """Регулярное выражение для поиска литерала вопроса в SQL"""
+    if literal.kind == 'num':
+        return re.compile(rf"(?<![\w.]){re.escape(literal.value)}(?![\w.])")
+    return re.compile(rf"(?<=')({re.escape(literal.value)})(?=')")
+
+
+def make_sql_template(sql: str, literals: Tuple[Literal, ...]) -> Optional[str]:
+    """
+    Заменяет в SQL значения литералов вопроса плейсхолдерами.
+
+    Возвращает None, если SQL нельзя безопасно переиспользовать с другими
+    значениями: литерал не найден, значения литералов совпадают,
+    в запросе остались другие даты/числа или относительное время.
+    """
+    if RELATIVE_TIME_RE.search(sql):
+        return None
+    if len({literal.value for literal in literals}) != len(literals):
+        return None
+
+    template = sql
+    for index, literal in enumerate(literals):
+        template, replaced = literal_pattern(literal).subn(placeholder(index), template)
+        if not replaced:
+            return None
+
+    if LEFTOVER_DATE_RE.search(template):
+        return None
+    if any(int(number) > 1 for number in LEFTOVER_NUMBER_RE.findall(template)):
+        return None
+    return template
+
+
+def render_sql_template(template: str, literals: Tuple[Literal, ...]) -> str:
+    """Подставляет значения литералов в SQL-шаблон"""
+    sql = template
+    for index, literal in enumerate(literals):
+        sql = sql.replace(placeholder(index), literal.value)
+    return sql
+
+
+class SQLTemplateCache:
+    """
+    LRU-кэш с TTL: нормализованный вопрос -> SQL-шаблон.
+
+    Вопросы, отличающиеся только датами, идентификаторами или порогами,
+    получают один и тот же шаблон, и повторный вызов LLM не нужен.
+
+    Шаблоны также сохраняются в постоянное хранилище (store, ключ "sql:..."):
+    lookup() при промахе ищет там шаблон, сохраненный до перезапуска или
+    другой репликой, а warmup() загружает сохраненные шаблоны при старте.
+    """
+
+    def __init__(self, max_size: int = SQL_CACHE_SIZE, ttl: float = SQL_CACHE_TTL, store: CacheStore = cache_store):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.store = store
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.store_hits = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key(self, template: str, literals: Tuple[Literal, ...]) -> str:
+        """Ключ кэша: шаблон вопроса вместе с типами литералов"""
+        return f"{template}|{','.join(literal.kind for literal in literals)}"
+
+    def get(self, question: str) -> Optional[str]:
+        """Возвращает готовый SQL для вопроса или None"""
+        normalized = normalize_question(question)
+        key = self.key(*normalized)
+        entry = self._entries.get(key)
+
+        if entry is None or entry[1] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        sql = render_sql_template(entry[0], normalized.literals)
+        logger.info(f"SQL-шаблон найден в кэше: {normalized.template}")
+        return sql
+
+    async def lookup(self, question: str) -> Optional[str]:
+        """get() и, при промахе, поиск шаблона в постоянном хранилище"""
+        sql = self.get(question)
+        if sql is not None or not self.store.enabled:
+            return sql
+
+        normalized = normalize_question(question)
+        key = self.key(*normalized)
+        template = await self.store.get(f"sql:{key}")
+        if template is None:
+            return None
+        # Промах get() оказался попаданием
+        self.misses -= 1
+        self.hits += 1
+        self.store_hits += 1
+        self._remember(key, template)
+        logger.info(f"SQL-шаблон найден в постоянном хранилище: {normalized.template}")
+        return render_sql_template(template, normalized.literals)
+
+    def put(self, question: str, sql: str) -> bool:
+        """
+        Сохраняет SQL, сгенерированный для вопроса.
+
+        Возвращает False, если из SQL не удалось построить шаблон.
+        """
+        normalized = normalize_question(question)
+        template = make_sql_template(sql, normalized.literals)
+        if template is None:
+            logger.info(f"SQL не кэшируется: не удалось построить шаблон для '{normalized.template}'")
+            return False
+
+        key = self.key(*normalized)
+        self._remember(key, template)
+        self.store.put(f"sql:{key}", template, self.ttl)
+        return True
+
+    def _remember(self, key: str, template: str):
+        self._entries[key] = (template, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def warmup(self) -> int:
+        """Загружает шаблоны из постоянного хранилища; возвращает их число"""
+        entries = await self.store.scan("sql:", self.max_size)
+        for key, template in entries.items():
+            self._remember(key[len("sql:"):], template)
+        return len(entries)
+
+    def clear(self):
+        """Очищает кэш"""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Статистика попаданий"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'store_hits': self.store_hits,
+            'hit_ratio': self.hits / total if total else 0.0,
+        }
+
+
+sql_template_cache = SQLTemplateCache()
+registry.gauge('bot_sql_cache_hit_ratio', 'Доля попаданий в кэш SQL-шаблонов', lambda: sql_template_cache.stats()['hit_ratio'])
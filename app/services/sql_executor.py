@@ -1,44 +1,215 @@
 """
 SQL Executor - выполняет SQL-запросы и возвращает результаты
 """
+import asyncio
 import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 from sqlalchemy import text
-from app.database.db import AsyncSessionLocal
+from app.database.db import engine, get_read_session, read_data_version, read_router
+from app.services.metrics import POOL_CHECKOUT, SQL_LATENCY, registry
+from app.services.result_cache import data_version, result_cache
+from app.services.sql_guard import SQLRejectedError, admit, begin_read_only, validate_sql
+from app.services.sql_params import parameterize
+from app.storage.config import SQL_STATEMENT_TIMEOUT_MS
 
 logger = logging.getLogger(__name__)
 
 
-async def execute_sql_query(sql_query: str) -> int:
+async def run_query(
+    sql_query: str, params: Dict[str, Any], trusted: bool, with_version: bool = False
+) -> Tuple[Any, Optional[int], Optional[asyncio.Semaphore]]:
+    """
+    Выполняет запрос в read-only транзакции с statement_timeout
+    и возвращает первую строку результата и версию данных, на которой
+    он выполнен (если with_version).
+
+    Недоверенный SQL сначала проходит EXPLAIN (sql_guard.admit). Если запрос
+    понижен в очередь тяжелых, соединение возвращается в пул и запрос
+    не выполняется — возвращается семафор очереди.
+    """
+    started = time.perf_counter()
+    async with get_read_session() as session:
+        POOL_CHECKOUT.observe(time.perf_counter() - started)
+        await begin_read_only(session)
+        lane = None if trusted else await admit(session, sql_query, params)
+        if lane is not None:
+            return None, None, lane
+        # Версия из того же снимка, что и запрос: реплика может отставать от основного сервера
+        version = await read_data_version(session) if with_version else None
+        with SQL_LATENCY.time():
+            result = await session.execute(text(sql_query), params)
+            return result.first(), version, None
+
+
+async def fetch_row(sql_query: str, trusted: bool, with_version: bool = False) -> Tuple[Optional[Any], Optional[int]]:
+    """Параметризует и выполняет запрос; тяжелый — в своей очереди. Возвращает (строка, версия данных)"""
+    # Литералы — в параметры: одинаковые формы запросов берут план из кэша подготовленных выражений
+    statement, params = parameterize(sql_query)
+    row, version, lane = await run_query(statement, params, trusted, with_version)
+    if lane is not None:
+        # Тяжелый запрос ждет своей очереди, не удерживая соединение из пула
+        async with lane:
+            row, version, _ = await run_query(statement, params, True, with_version)
+    return row, version
+
+
+def remember(sql_query: str, version: int, row_version: Optional[int], number: int, shared: bool = True):
+    """
+    Кладет результат в кэш, если он получен на текущей версии данных.
+
+    Результат с отстающей реплики под новой версией разошелся бы с основным
+    сервером и через постоянное хранилище попал бы другим экземплярам бота.
+    shared=False (быстрый путь) — без записи в постоянное хранилище.
+    """
+    if row_version != version:
+        logger.info(f"Результат получен на версии данных {row_version}, текущая {version} — не кэшируем")
+        return
+    result_cache.put(sql_query, version, number, shared)
+
+
+def to_number(value: Any) -> int:
+    """Значение из БД -> int (на случай если вернулся float, Decimal или None)"""
+    if value is None:
+        return 0
+    # PostgreSQL может вернуть Decimal, int, float
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        logger.warning(f"Не удалось преобразовать значение {value} (тип: {type(value)}) в int, возвращаем 0")
+        return 0
+
+
+def sql_error(e: Exception) -> Exception:
+    """Понятная пользователю ошибка выполнения"""
+    if 'statement timeout' in str(e):
+        return Exception(f"Не удалось выполнить запрос: превышено время выполнения ({SQL_STATEMENT_TIMEOUT_MS} мс)")
+    return Exception(f"Не удалось выполнить запрос: {e}")
+
+
+async def execute_sql_query(sql_query: str, trusted: bool = False) -> int:
     """
     Выполняет SQL-запрос и возвращает числовой результат.
     
+    Результаты кэшируются по каноническому тексту SQL и сбрасываются,
+    когда загрузчик меняет версию данных в loader_state.
+    
+    Выполняется только один read-only SELECT (sql_guard), с ограничением
+    времени SQL_STATEMENT_TIMEOUT_MS. Для SQL не из быстрого пути
+    (trusted=False) стоимость плана проверяется через EXPLAIN.
+    
+    Литералы передаются bind-параметрами (sql_params), поэтому вопросы
+    одной формы выполняются одним подготовленным выражением на соединении.
+    
     Args:
         sql_query: SQL-запрос, который должен вернуть одно число
+        trusted: SQL построен локально (fast_path) и не требует EXPLAIN
         
     Returns:
         Числовой результат запроса
         
     Raises:
+        SQLRejectedError: Если запрос не допущен к выполнению
         Exception: Если запрос невалидный или вернул не число
     """
+    sql_query = validate_sql(sql_query)
+
+    version = await data_version.current()
+    if version is not None:
+        cached = await result_cache.lookup(sql_query, version, shared=not trusted)
+        if cached is not None:
+            logger.info(f"Результат SQL взят из кэша (версия данных {version}): {cached}")
+            return cached
+
     try:
         logger.info(f"Выполняем SQL: {sql_query}")
-        
-        async with AsyncSessionLocal() as session:
-            result = await session.execute(text(sql_query))
-            value = result.scalar()
-            
-            # Преобразуем в int (на случай если вернулся float, Decimal или None)
-            if value is None:
-                return 0
-            
-            # PostgreSQL может вернуть Decimal, int, float
-            try:
-                return int(value)
-            except (ValueError, TypeError):
-                logger.warning(f"Не удалось преобразовать значение {value} (тип: {type(value)}) в int, возвращаем 0")
-                return 0
-            
+        row, row_version = await fetch_row(sql_query, trusted, with_version=version is not None)
+    except SQLRejectedError:
+        raise
     except Exception as e:
         logger.error(f"Ошибка при выполнении SQL: {e}")
-        raise Exception(f"Не удалось выполнить запрос: {e}")
+        raise sql_error(e)
+
+    number = to_number(row[0] if row is not None else None)
+    if version is not None:
+        remember(sql_query, version, row_version, number, shared=not trusted)
+        stats = result_cache.stats()
+        logger.info(f"Кэш результатов: {stats['hits']} попаданий, {stats['misses']} промахов ({stats['hit_ratio']:.0%})")
+    return number
+
+
+async def execute_sql_batch(
+    sql_queries: Sequence[str], trusted: Sequence[bool]
+) -> List[Union[int, Exception]]:
+    """
+    Выполняет несколько скалярных запросов за одно обращение к БД.
+    
+    Запросы, которых нет в кэше результатов, объединяются в один
+    SELECT (q1), (q2), ... — одна транзакция, один EXPLAIN и один round trip.
+    Если объединенный запрос не выполнился (отклонен по стоимости, подзапрос
+    вернул больше одной строки и т.п.), запросы выполняются по одному, и
+    ошибка достается только своему вопросу.
+    
+    Args:
+        sql_queries: SQL-запросы, каждый должен вернуть одно число
+        trusted: Для каждого запроса — построен ли он локально (fast_path)
+        
+    Returns:
+        Для каждого запроса — число или исключение
+    """
+    results: List[Union[int, Exception, None]] = [None] * len(sql_queries)
+    statements: Dict[str, List[int]] = {}
+    for index, sql_query in enumerate(sql_queries):
+        try:
+            statements.setdefault(validate_sql(sql_query), []).append(index)
+        except SQLRejectedError as e:
+            results[index] = e
+
+    version = await data_version.current()
+    pending = []
+    for statement, indexes in statements.items():
+        shared = not trusted[indexes[0]]
+        cached = await result_cache.lookup(statement, version, shared) if version is not None else None
+        if cached is not None:
+            for index in indexes:
+                results[index] = cached
+        else:
+            pending.append(statement)
+
+    if len(pending) > 1:
+        merged = "SELECT " + ", ".join(f"({statement})" for statement in pending)
+        merged_trusted = all(trusted[statements[statement][0]] for statement in pending)
+        try:
+            logger.info(f"Выполняем {len(pending)} SQL одним запросом: {merged}")
+            row, row_version = await fetch_row(merged, merged_trusted, with_version=version is not None)
+            values = [to_number(value) for value in row]
+        except Exception as e:
+            logger.warning(f"Объединенный запрос не выполнен, выполняем по одному: {e}")
+        else:
+            for statement, number in zip(pending, values):
+                for index in statements[statement]:
+                    results[index] = number
+                if version is not None:
+                    remember(statement, version, row_version, number, shared=not trusted[statements[statement][0]])
+            pending = []
+
+    for statement in pending:
+        indexes = statements[statement]
+        try:
+            number: Union[int, Exception] = await execute_sql_query(statement, trusted=trusted[indexes[0]])
+        except Exception as e:
+            number = e
+        for index in indexes:
+            results[index] = number
+    return results
+
+
+registry.gauge(
+    'bot_db_pool_checked_out', 'Соединения, взятые из пулов чтения',
+    lambda: sum(target.engine.pool.checkedout() for target in read_router.targets()),
+)
+registry.gauge('bot_db_write_pool_checked_out', 'Соединения, взятые из пула записи', lambda: engine.pool.checkedout())
+registry.gauge(
+    'bot_db_replicas_healthy', 'Реплики, доступные для чтения',
+    lambda: sum(replica.healthy for replica in read_router.replicas),
+)
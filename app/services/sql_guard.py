@@ -0,0 +1,133 @@
+"""
+SQL Guard - допуск сгенерированного SQL к выполнению: только один read-only SELECT,
+оценка стоимости через EXPLAIN и ограничение времени выполнения
+"""
+import asyncio
+import logging
+import re
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services.metrics import registry
+from app.storage.config import (
+    SQL_HEAVY_CONCURRENCY,
+    SQL_HEAVY_COST,
+    SQL_MAX_COST,
+    SQL_STATEMENT_TIMEOUT_MS,
+)
+
+logger = logging.getLogger(__name__)
+
+SQL_REJECTED = registry.counter('bot_sql_rejected_total', 'SQL, не допущенный к выполнению, по причине')
+SQL_HEAVY = registry.counter('bot_sql_heavy_total', 'Дорогие запросы, выполненные в ограниченной очереди')
+
+STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+LINE_COMMENT_RE = re.compile(r'--[^\n]*')
+BLOCK_COMMENT_RE = re.compile(r'/\*.*?\*/', re.DOTALL)
+
+# Команды, меняющие данные, схему или состояние сессии
+FORBIDDEN_KEYWORDS_RE = re.compile(
+    r'\b(insert|update|delete|merge|upsert|drop|alter|create|truncate|grant|revoke|copy|vacuum|'
+    r'analyze|call|do|lock|listen|notify|set|reset|refresh|reindex|cluster|comment|execute|'
+    r'prepare|deallocate|discard|into)\b'
+    r'|\bfor\s+(?:share|no\s+key\s+update|key\s+share)\b',
+    re.IGNORECASE,
+)
+# Функции с побочными эффектами или доступом к серверу
+FORBIDDEN_FUNCTIONS_RE = re.compile(
+    r'\b(pg_sleep\w*|pg_terminate_backend|pg_cancel_backend|pg_read_file|pg_read_binary_file|'
+    r'pg_ls_dir|pg_stat_file|lo_import|lo_export|dblink\w*|set_config|pg_reload_conf|'
+    r'pg_advisory\w*|nextval|setval|txid_current)\s*\(',
+    re.IGNORECASE,
+)
+STARTS_WITH_SELECT_RE = re.compile(r'^\(*\s*(select|with)\b', re.IGNORECASE)
+
+# Дорогие запросы выполняются не больше чем по SQL_HEAVY_CONCURRENCY одновременно
+heavy_lane = asyncio.Semaphore(SQL_HEAVY_CONCURRENCY)
+
+
+class SQLRejectedError(Exception):
+    """SQL не допущен к выполнению"""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+def reject(reason: str, message: str) -> SQLRejectedError:
+    SQL_REJECTED.inc(reason=reason)
+    logger.warning(f"SQL отклонен ({reason}): {message}")
+    return SQLRejectedError(reason, message)
+
+
+def validate_sql(sql: str) -> str:
+    """
+    Проверяет, что sql — ровно один SELECT без побочных эффектов.
+
+    Возвращает запрос без завершающей точки с запятой.
+
+    Raises:
+        SQLRejectedError: Если запрос не read-only SELECT
+    """
+    statement = sql.strip().rstrip(';').strip()
+    # Проверяем текст без строковых литералов и комментариев
+    code = STRING_LITERAL_RE.sub("''", statement)
+    code = BLOCK_COMMENT_RE.sub(' ', LINE_COMMENT_RE.sub(' ', code))
+
+    if not code.strip():
+        raise reject('empty', "Пустой запрос")
+    if ';' in code:
+        raise reject('multiple_statements', "Допускается только одно SQL-выражение")
+    if not STARTS_WITH_SELECT_RE.match(code.strip()):
+        raise reject('not_select', "Допускаются только SELECT-запросы")
+    match = FORBIDDEN_KEYWORDS_RE.search(code)
+    if match:
+        raise reject('forbidden_keyword', f"Недопустимая конструкция: {match.group(0).upper()}")
+    match = FORBIDDEN_FUNCTIONS_RE.search(code)
+    if match:
+        raise reject('forbidden_function', f"Недопустимая функция: {match.group(1)}")
+    return statement
+
+
+async def begin_read_only(session: AsyncSession, timeout_ms: int = SQL_STATEMENT_TIMEOUT_MS):
+    """
+    Открывает read-only транзакцию с ограничением времени выполнения.
+
+    Должно быть первым выражением транзакции сессии; SET LOCAL действует
+    до ее конца и не влияет на соединение после возврата в пул.
+    REPEATABLE READ: все выражения транзакции видят один снимок, поэтому
+    версия данных, прочитанная рядом с запросом, — ровно та, на которой
+    он выполнен (реплика может отставать от основного сервера).
+    """
+    await session.execute(text("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY"))
+    await session.execute(text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
+
+
+async def explain_cost(session: AsyncSession, sql: str, params: Optional[Dict[str, Any]] = None) -> float:
+    """Оценка стоимости плана (Total Cost корневого узла EXPLAIN)"""
+    result = await session.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params or {})
+    plan = result.scalar()
+    return float(plan[0]['Plan']['Total Cost'])
+
+
+async def admit(session: AsyncSession, sql: str, params: Optional[Dict[str, Any]] = None) -> Optional[asyncio.Semaphore]:
+    """
+    Решает, можно ли выполнить запрос, по стоимости его плана.
+
+    Дороже SQL_MAX_COST — отказ; дороже SQL_HEAVY_COST — запрос понижается
+    в ограниченную очередь тяжелых запросов (возвращается ее семафор),
+    чтобы не занимать пул соединений и CPU базы за счет остальных.
+
+    Raises:
+        SQLRejectedError: Если план слишком дорогой
+    """
+    cost = await explain_cost(session, sql, params)
+    if cost > SQL_MAX_COST:
+        raise reject('cost', f"Слишком тяжелый запрос: стоимость плана {cost:,.0f} > {SQL_MAX_COST:,.0f}")
+    if cost > SQL_HEAVY_COST:
+        SQL_HEAVY.inc()
+        logger.info(f"Дорогой запрос (стоимость {cost:,.0f}), выполняется в очереди тяжелых запросов")
+        return heavy_lane
+    return None
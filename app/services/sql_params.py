@@ -0,0 +1,100 @@
+"""
+SQL Params - выносит литералы сгенерированного SQL в bind-параметры,
+чтобы запросы одной формы имели одинаковый текст и переиспользовали
+подготовленные выражения asyncpg (без повторного разбора и планирования)
+"""
+import re
+from datetime import date
+from typing import Any, Dict, Optional, Tuple
+
+DATE_VALUE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+LITERAL_RE = re.compile(
+    # Типизированные литералы: DATE '...', INTERVAL '...' и т.п.
+    r"(?P<typed>\b(?P<type>date|interval|timestamptz|timestamp|time)\s+'(?P<typed_value>(?:[^']|'')*)')"
+    # CAST('...' AS type)
+    r"|(?P<cast_call>\bcast\(\s*'(?P<cast_value>(?:[^']|'')*)'\s+as\s+(?P<cast_type>\w+)\s*\))"
+    # E'...', B'...', X'...' — оставляем как есть
+    r"|(?P<prefixed>\w'(?:[^']|'')*')"
+    r"|'(?P<value>(?:[^']|'')*)'(?:::(?P<cast>\w+))?"
+    # Целые числа справа от сравнения: views_count > 100000
+    r"|(?P<operator>(?:<>|!=|<=|>=|=|<|>)\s*)(?P<number>\d+)(?![\w.]|::)",
+    re.IGNORECASE,
+)
+
+# Числа, которые задают форму запроса, а не значение из вопроса (delta_views_count > 0)
+INLINE_NUMBERS = {'0'}
+
+# Больше bigint не поместится в параметр — такое число остается в тексте (numeric)
+BIGINT_MAX = 2 ** 63 - 1
+
+# Строковые типы, для которых параметр передается как str
+TEXT_TYPES = {'text', 'varchar'}
+
+
+def as_date(value: str) -> Optional[date]:
+    """'YYYY-MM-DD' -> date; None для других строк и несуществующих дат"""
+    if not DATE_VALUE_RE.match(value):
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def parameterize(sql: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Заменяет литералы на :p0, :p1, ... и возвращает (SQL, параметры).
+
+    Параметром становится только литерал, тип которого виден из текста:
+    asyncpg получает голый $n и выводит его тип из контекста, а строка
+    на месте timestamptz или даты, сравниваемой с текстом, дает ошибку.
+
+    - даты DATE '...', '...'::date и CAST('...' AS date) — CAST(:p AS date)
+      со значением datetime.date (сравнение с timestamptz идет в часовом
+      поясе сессии, так же как с исходным литералом);
+    - '...'::text, '...'::varchar и CAST('...' AS text) — CAST(:p AS text);
+    - целые числа после операторов сравнения — CAST(:p AS bigint): иначе
+      asyncpg выводит int4 из колонки likes_count, и 3 млрд не проходит.
+
+    Остальные литералы (строки без приведения, INTERVAL '1 day',
+    '...'::timestamptz, дроби) остаются в тексте.
+    """
+    params: Dict[str, Any] = {}
+
+    def bind(value: Any) -> str:
+        name = f"p{len(params)}"
+        params[name] = value
+        return f":{name}"
+
+    def bind_typed(value: str, type_name: str) -> Optional[str]:
+        """Параметр для литерала с явным типом или None, если тип не поддерживается"""
+        type_name = type_name.lower()
+        if type_name == 'date':
+            day = as_date(value)
+            return f"CAST({bind(day)} AS date)" if day is not None else None
+        if type_name in TEXT_TYPES:
+            return f"CAST({bind(value)} AS text)"
+        return None
+
+    def replace(match: re.Match) -> str:
+        if match.group('typed'):
+            value = match.group('typed_value').replace("''", "'")
+            return bind_typed(value, match.group('type')) or match.group(0)
+        if match.group('cast_call'):
+            value = match.group('cast_value').replace("''", "'")
+            return bind_typed(value, match.group('cast_type')) or match.group(0)
+        if match.group('prefixed'):
+            return match.group(0)
+        if match.group('number') is not None:
+            number = int(match.group('number'))
+            if match.group('number') in INLINE_NUMBERS or number > BIGINT_MAX:
+                return match.group(0)
+            return f"{match.group('operator')}CAST({bind(number)} AS bigint)"
+        if match.group('cast'):
+            value = match.group('value').replace("''", "'")
+            return bind_typed(value, match.group('cast')) or match.group(0)
+        return match.group(0)
+
+    statement = LITERAL_RE.sub(replace, sql)
+    return statement, params
@@ -0,0 +1,84 @@
+"""
+SQL Rewriter - переписывает фильтры вида col::date = '...' в диапазоны,
+которые могут использовать btree-индексы по timestamp-колонкам
+"""
+import logging
+import re
+from datetime import date, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Колонка, приведенная к дате: col::date, DATE(col), CAST(col AS date)
+COLUMN = r'(?:(?P<col1>(?:\w+\.)?\w+)::date|date\(\s*(?P<col2>(?:\w+\.)?\w+)\s*\)|cast\(\s*(?P<col3>(?:\w+\.)?\w+)\s+as\s+date\s*\))'
+
+
+# После литерала не должно идти выражение: '2025-11-02'::date - 1 — не дата,
+# а переписанное сравнение дало бы (...) - 1, то есть boolean - integer.
+# '::' исключает откат, при котором литерал совпал бы без своего ::date
+NOT_EXPRESSION = r'(?!\s*(?:[-+*/%]|\|\||::))'
+
+
+def date_literal(name: str) -> str:
+    """Литерал даты: '2025-11-28', '2025-11-28'::date или DATE '2025-11-28'"""
+    return rf"(?:date\s+)?'(?P<{name}>\d{{4}}-\d{{2}}-\d{{2}})'(?:::date)?" + NOT_EXPRESSION
+
+
+BETWEEN_RE = re.compile(
+    COLUMN + r'\s+between\s+' + date_literal('start') + r'\s+and\s+' + date_literal('end'),
+    re.IGNORECASE,
+)
+COMPARE_RE = re.compile(
+    COLUMN + r'\s*(?P<op>>=|<=|=|>|<)\s*' + date_literal('start'),
+    re.IGNORECASE,
+)
+
+
+def next_day(value: str) -> str:
+    """'2025-11-28' -> '2025-11-29'"""
+    return (date.fromisoformat(value) + timedelta(days=1)).isoformat()
+
+
+def column_of(match: re.Match) -> str:
+    return match.group('col1') or match.group('col2') or match.group('col3')
+
+
+def date_value(value: str) -> str:
+    """Литерал даты с явным типом — sql_params передаст его параметром"""
+    return f"DATE '{value}'"
+
+
+def rewrite_between(match: re.Match) -> str:
+    column = column_of(match)
+    return f"({column} >= {date_value(match.group('start'))} AND {column} < {date_value(next_day(match.group('end')))})"
+
+
+def rewrite_compare(match: re.Match) -> str:
+    column = column_of(match)
+    value = match.group('start')
+    operator = match.group('op')
+    if operator == '=':
+        return f"({column} >= {date_value(value)} AND {column} < {date_value(next_day(value))})"
+    if operator == '>=':
+        return f"{column} >= {date_value(value)}"
+    if operator == '>':
+        return f"{column} >= {date_value(next_day(value))}"
+    if operator == '<=':
+        return f"{column} < {date_value(next_day(value))}"
+    return f"{column} < {date_value(value)}"
+
+
+def rewrite_date_predicates(sql: str) -> str:
+    """
+    Делает фильтры по датам sargable.
+
+    col::date = 'd' превращается в полуоткрытый диапазон
+    col >= DATE 'd' AND col < DATE 'd+1', BETWEEN — в col >= DATE 'a' AND
+    col < DATE 'b+1'. Дата сравнивается с timestamptz в часовом поясе сессии — ровно так же,
+    как работает приведение ::date, поэтому результат запроса не меняется,
+    а планировщик может использовать индекс по col.
+    """
+    rewritten = BETWEEN_RE.sub(rewrite_between, sql)
+    rewritten = COMPARE_RE.sub(rewrite_compare, rewritten)
+    if rewritten != sql:
+        logger.info(f"SQL переписан для использования индексов: {rewritten}")
+    return rewritten
@@ -0,0 +1,161 @@
+"""
+Webhook - прием обновлений Telegram через aiohttp-сервер вместо long polling
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from app.services.metrics import metrics_handler
+from app.storage.config import (
+    SHUTDOWN_TIMEOUT,
+    WEB_WORKERS,
+    WEBAPP_HOST,
+    WEBAPP_PORT,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    WEBHOOK_URL,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateTracker:
+    """
+    Outer-middleware диспетчера: учитывает обновления, которые сейчас обрабатываются.
+
+    Нужен для корректной остановки: новые обновления перестают приниматься,
+    а начатые обработчики успевают отправить ответ.
+    """
+
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+        self.draining = False
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any],
+    ) -> Any:
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        try:
+            return await handler(event, data)
+        finally:
+            self._tasks.discard(task)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    async def drain(self, timeout: float = SHUTDOWN_TIMEOUT):
+        """Ждет завершения начатых обработчиков, но не дольше timeout секунд"""
+        self.draining = True
+        current = asyncio.current_task()
+        pending = {task for task in self._tasks if task is not current}
+        if not pending:
+            return
+        logger.info(f"Ожидание {len(pending)} начатых обработчиков (не дольше {timeout:.0f} с)...")
+        _, not_done = await asyncio.wait(pending, timeout=timeout)
+        if not_done:
+            logger.warning(f"{len(not_done)} обработчиков не завершились за {timeout:.0f} с")
+
+
+def create_app(
+    bot: Bot,
+    dp: Dispatcher,
+    tracker: UpdateTracker,
+    webhook_url: str = WEBHOOK_URL,
+    path: str = WEBHOOK_PATH,
+    secret: str = WEBHOOK_SECRET,
+    register_webhook: bool = True,
+    health: Optional[Callable[[], Dict[str, Any]]] = None,
+) -> web.Application:
+    """
+    Собирает aiohttp-приложение: POST {path} для Telegram, GET /health и GET /metrics.
+
+    register_webhook=True регистрирует webhook в Telegram при старте
+    (при нескольких процессах — только в одном из них).
+    """
+    app = web.Application()
+
+    async def health_handler(request: web.Request) -> web.Response:
+        body = {
+            'status': 'draining' if tracker.draining else 'ok',
+            'in_flight': tracker.in_flight,
+            **(health() if health else {}),
+        }
+        return web.json_response(body, status=503 if tracker.draining else 200)
+
+    async def on_startup(app: web.Application):
+        if register_webhook and webhook_url:
+            await bot.set_webhook(
+                webhook_url.rstrip('/') + path,
+                secret_token=secret or None,
+                allowed_updates=dp.resolve_used_update_types(),
+            )
+            logger.info(f"Webhook зарегистрирован: {webhook_url.rstrip('/')}{path}")
+
+    async def on_shutdown(app: web.Application):
+        await tracker.drain()
+
+    app.router.add_get('/health', health_handler)
+    app.router.add_get('/metrics', metrics_handler)
+    app.on_startup.append(on_startup)
+    # Регистрируется раньше обработчика webhook: сессия бота закрывается только после ожидания
+    app.on_shutdown.append(on_shutdown)
+
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=secret or None).register(app, path=path)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+def run_webhook(app: web.Application, workers: int = WEB_WORKERS):
+    """Запускает сервер; при workers > 1 несколько процессов делят один порт через SO_REUSEPORT"""
+    web.run_app(
+        app,
+        host=WEBAPP_HOST,
+        port=WEBAPP_PORT,
+        reuse_port=workers > 1,
+        shutdown_timeout=SHUTDOWN_TIMEOUT,
+        print=None,
+    )
+
+
+def run_workers(target: Callable[[int], None], workers: int = WEB_WORKERS):
+    """
+    Запускает target(worker_index) в workers процессах и ждет их завершения.
+
+    Каждый процесс поднимает свой event loop, пулы соединений и сервер на
+    общем порту; ядро распределяет входящие соединения между ними.
+    """
+    if workers <= 1:
+        target(0)
+        return
+
+    processes = [
+        multiprocessing.Process(target=target, args=(index,), name=f"web-worker-{index}")
+        for index in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    logger.info(f"Запущено {workers} процессов на {WEBAPP_HOST}:{WEBAPP_PORT}")
+
+    def forward(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signum)
+
+    # SIGTERM пересылается воркерам, и каждый корректно завершает начатые обработчики.
+    # SIGINT из терминала и так получает вся группа процессов.
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for process in processes:
+        process.join()
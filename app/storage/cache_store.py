@@ -0,0 +1,288 @@
+"""
+Cache Store - постоянное хранилище кэшей "вопрос -> SQL-шаблон" и
+"SQL -> результат" (с версией данных в ключе). Переживает перезапуск бота
+и общее для нескольких реплик.
+
+Бэкенды с одинаковым интерфейсом в духе Redis (get / set с TTL / scan по префиксу):
+- SQLiteBackend — локальный файл (общий для процессов одного сервера);
+- PostgresBackend — UNLOGGED-таблица bot_cache в основной БД;
+- RedisBackend — Redis или совместимый сервер, нужен пакет redis (pip install redis).
+
+Ошибки хранилища не мешают отвечать: чтение возвращает None, запись
+выполняется в фоне и только пишется в лог.
+"""
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+
+from app.storage.config import CACHE_STORE, CACHE_STORE_PATH, CACHE_STORE_REDIS_URL
+
+try:
+    import redis.asyncio as redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Сколько записей читать при прогреве
+SCAN_LIMIT = 10000
+
+
+class CacheBackend(ABC):
+    """Интерфейс хранилища: строковые ключи и значения, TTL в секундах"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: float):
+        ...
+
+    @abstractmethod
+    async def scan(self, prefix: str, limit: int = SCAN_LIMIT) -> List[Tuple[str, str]]:
+        """Неистекшие записи с ключом, начинающимся с prefix"""
+
+    async def close(self):
+        pass
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    Файл SQLite; запросы выполняются в потоке, чтобы не блокировать цикл событий.
+
+    Соединение открывается при первом запросе в каждом процессе: хранилище
+    создается при импорте, до fork в run_workers, а соединение SQLite,
+    унаследованное через fork, использовать нельзя.
+    """
+
+    def __init__(self, path: str = CACHE_STORE_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Соединение текущего процесса (вызывается под self._lock)"""
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            # WAL: читатели не ждут писателя, файл можно делить между процессами
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS bot_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            # Соединение родителя (если было) не закрываем: оно принадлежит другому процессу
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _execute(self, sql: str, params: tuple) -> list:
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    async def get(self, key: str) -> Optional[str]:
+        rows = await asyncio.to_thread(
+            self._execute, "SELECT value FROM bot_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        )
+        return rows[0][0] if rows else None
+
+    async def set(self, key: str, value: str, ttl: float):
+        await asyncio.to_thread(
+            self._execute,
+            "INSERT INTO bot_cache (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+            (key, value, time.time() + ttl),
+        )
+
+    async def scan(self, prefix: str, limit: int = SCAN_LIMIT) -> List[Tuple[str, str]]:
+        now = time.time()
+        await asyncio.to_thread(self._execute, "DELETE FROM bot_cache WHERE expires_at <= ?", (now,))
+        # substr вместо LIKE: в ключах бывают % и _
+        rows = await asyncio.to_thread(
+            self._execute,
+            "SELECT key, value FROM bot_cache WHERE substr(key, 1, ?) = ? AND expires_at > ? "
+            "ORDER BY expires_at DESC LIMIT ?",
+            (len(prefix), prefix, now, limit),
+        )
+        return [(key, value) for key, value in rows]
+
+    def _close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+    async def close(self):
+        await asyncio.to_thread(self._close)
+
+
+class PostgresBackend(CacheBackend):
+    """Таблица bot_cache в основной БД (пул записи); UNLOGGED — кэш не пишется в WAL"""
+
+    def __init__(self):
+        from app.database.db import engine
+        self.engine = engine
+        self._ready = False
+
+    async def _ensure_table(self):
+        if self._ready:
+            return
+        async with self.engine.begin() as conn:
+            await conn.execute(text(
+                "CREATE UNLOGGED TABLE IF NOT EXISTS bot_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at TIMESTAMPTZ NOT NULL)"
+            ))
+        self._ready = True
+
+    async def get(self, key: str) -> Optional[str]:
+        await self._ensure_table()
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                text("SELECT value FROM bot_cache WHERE key = :key AND expires_at > now()"), {'key': key}
+            )
+            return result.scalar()
+
+    async def set(self, key: str, value: str, ttl: float):
+        await self._ensure_table()
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                text(
+                    "INSERT INTO bot_cache (key, value, expires_at) "
+                    "VALUES (:key, :value, now() + make_interval(secs => :ttl)) "
+                    "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at"
+                ),
+                {'key': key, 'value': value, 'ttl': ttl},
+            )
+
+    async def scan(self, prefix: str, limit: int = SCAN_LIMIT) -> List[Tuple[str, str]]:
+        await self._ensure_table()
+        async with self.engine.begin() as conn:
+            await conn.execute(text("DELETE FROM bot_cache WHERE expires_at <= now()"))
+            result = await conn.execute(
+                text(
+                    "SELECT key, value FROM bot_cache WHERE left(key, :length) = :prefix AND expires_at > now() "
+                    "ORDER BY expires_at DESC LIMIT :limit"
+                ),
+                {'length': len(prefix), 'prefix': prefix, 'limit': limit},
+            )
+            return [(key, value) for key, value in result.all()]
+
+
+class RedisBackend(CacheBackend):
+    """Redis или совместимый сервер (KeyDB, Valkey, Dragonfly)"""
+
+    # Пространство ключей бота на общем сервере
+    NAMESPACE = "bot_cache:"
+
+    def __init__(self, url: str = CACHE_STORE_REDIS_URL):
+        self.client = redis.from_url(url, decode_responses=True)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.client.get(self.NAMESPACE + key)
+
+    async def set(self, key: str, value: str, ttl: float):
+        await self.client.set(self.NAMESPACE + key, value, ex=max(int(ttl), 1))
+
+    async def scan(self, prefix: str, limit: int = SCAN_LIMIT) -> List[Tuple[str, str]]:
+        keys = []
+        async for key in self.client.scan_iter(match=self.NAMESPACE + prefix + '*', count=1000):
+            keys.append(key)
+            if len(keys) >= limit:
+                break
+        if not keys:
+            return []
+        values = await self.client.mget(keys)
+        skip = len(self.NAMESPACE)
+        return [(key[skip:], value) for key, value in zip(keys, values) if value is not None]
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class CacheStore:
+    """
+    Хранилище кэшей поверх бэкенда.
+
+    Без бэкенда (CACHE_STORE не задан) ничего не хранит. Запись не ждет
+    ответа хранилища: put() запускает ее в фоне, flush() дожидается всех
+    начатых записей (при остановке и в тестах).
+    """
+
+    def __init__(self, backend: Optional[CacheBackend]):
+        self.backend = backend
+        self._writes: Set[asyncio.Task] = set()
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    async def get(self, key: str) -> Optional[str]:
+        if self.backend is None:
+            return None
+        try:
+            return await self.backend.get(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Хранилище кэша недоступно при чтении: {e}")
+            return None
+
+    def put(self, key: str, value: str, ttl: float):
+        if self.backend is None:
+            return
+        task = asyncio.create_task(self._write(key, value, ttl))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    async def _write(self, key: str, value: str, ttl: float):
+        try:
+            await self.backend.set(key, value, ttl)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Не удалось сохранить запись кэша: {e}")
+
+    async def scan(self, prefix: str, limit: int = SCAN_LIMIT) -> Dict[str, str]:
+        if self.backend is None:
+            return {}
+        try:
+            return dict(await self.backend.scan(prefix, limit))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Не удалось прочитать хранилище кэша: {e}")
+            return {}
+
+    async def flush(self):
+        if self._writes:
+            await asyncio.gather(*list(self._writes))
+
+    async def close(self):
+        await self.flush()
+        if self.backend is not None:
+            await self.backend.close()
+
+
+def make_cache_store(kind: str = CACHE_STORE) -> CacheStore:
+    """Хранилище по имени бэкенда из CACHE_STORE"""
+    if not kind:
+        return CacheStore(None)
+    if kind == 'sqlite':
+        return CacheStore(SQLiteBackend())
+    if kind == 'postgres':
+        return CacheStore(PostgresBackend())
+    if kind == 'redis':
+        if redis is None:
+            logger.warning("CACHE_STORE=redis, но пакет redis не установлен — постоянный кэш отключен")
+            return CacheStore(None)
+        return CacheStore(RedisBackend())
+    raise Exception(f"Неизвестный CACHE_STORE: {kind} (ожидается sqlite, postgres или redis)")
+
+
+cache_store = make_cache_store()
@@ -9,5 +9,107 @@ DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("DB_PORT", "5432")
 DB_NAME = os.getenv("DB_NAME", "testbot")
 
+# Пулы соединений по ролям: запись (загрузчик) и чтение (аналитические запросы бота)
+DB_WRITE_POOL_SIZE = int(os.getenv("DB_WRITE_POOL_SIZE", "10"))
+DB_WRITE_MAX_OVERFLOW = int(os.getenv("DB_WRITE_MAX_OVERFLOW", "20"))
+# Размер пула чтения — на каждую реплику (и на основной сервер)
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "10"))
+DB_READ_MAX_OVERFLOW = int(os.getenv("DB_READ_MAX_OVERFLOW", "20"))
+# Реплики для чтения: host[:port] через запятую; пусто — чтение с основного сервера
+DB_REPLICA_HOSTS = [host.strip() for host in os.getenv("DB_REPLICA_HOSTS", "").split(",") if host.strip()]
+# Через сколько секунд снова пробовать реплику, к которой не удалось подключиться
+DB_REPLICA_RETRY_INTERVAL = float(os.getenv("DB_REPLICA_RETRY_INTERVAL", "30"))
+DB_CONNECT_TIMEOUT = float(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+# Подготовленных выражений asyncpg на соединение (формы запросов с bind-параметрами)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))
+
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Другой адрес OpenAI-совместимого API (например, app/tests/fake_openai.py для бенчмарков)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")
+# Примеры (few-shot) в промпте: 0 — все в неизменном префиксе (лучше для кэша префикса),
+# N > 0 — N примеров, ближайших к вопросу (промпт короче, но с теплым кэшем ответ медленнее)
+PROMPT_EXAMPLES = int(os.getenv("PROMPT_EXAMPLES", "0"))
+# Потоковый ответ LLM: SQL выполняется, как только пришла завершающая ";", остаток генерации отменяется
+LLM_STREAMING = os.getenv("LLM_STREAMING", "0") == "1"
+# Сообщение из нескольких строк-вопросов: SQL для всех — одним запросом к LLM,
+# выполнение — одним SELECT; не больше стольких вопросов (1 — не разбивать)
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "10"))
+
+# Клиент OpenAI (app/services/llm_client.py): таймаут одной попытки (для потока — с чтением), попытки
+# с экспоненциальной задержкой и разбросом, параллельные запросы
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "15"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_DELAY = float(os.getenv("LLM_RETRY_DELAY", "0.5"))
+LLM_MAX_CONCURRENT = int(os.getenv("LLM_MAX_CONCURRENT", "16"))
+# Дублирующий запрос, если ответ дольше этого квантиля недавних задержек (0 — без дублей)
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+# Предохранитель: после стольких ошибок подряд LLM не вызывается LLM_BREAKER_RESET секунд
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+
+# Загрузчик данных
+LOADER_CONCURRENCY = int(os.getenv("LOADER_CONCURRENCY", "4"))
+LOADER_MAX_RETRIES = int(os.getenv("LOADER_MAX_RETRIES", "3"))
+LOADER_RETRY_DELAY = float(os.getenv("LOADER_RETRY_DELAY", "1.0"))
+# Процессы разбора JSON по диапазонам байт (1 — потоковый разбор в текущем процессе)
+LOADER_PARSE_WORKERS = int(os.getenv("LOADER_PARSE_WORKERS", "1"))
+
+# Кэш SQL-шаблонов (нормализованный вопрос -> SQL)
+SQL_CACHE_SIZE = int(os.getenv("SQL_CACHE_SIZE", "1024"))
+SQL_CACHE_TTL = float(os.getenv("SQL_CACHE_TTL", "86400"))
+
+# Кэш результатов SQL (инвалидируется по loader_state.data_version)
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "4096"))
+RESULT_CACHE_VERSION_TTL = float(os.getenv("RESULT_CACHE_VERSION_TTL", "5"))
+
+# Постоянное хранилище кэшей SQL-шаблонов и результатов (переживает перезапуск,
+# общее для реплик бота): '' — выключено, 'sqlite' (файл CACHE_STORE_PATH),
+# 'postgres' (таблица bot_cache в основной БД), 'redis' (CACHE_STORE_REDIS_URL)
+CACHE_STORE = os.getenv("CACHE_STORE", "")
+CACHE_STORE_PATH = os.getenv("CACHE_STORE_PATH", "data/cache.sqlite3")
+CACHE_STORE_REDIS_URL = os.getenv("CACHE_STORE_REDIS_URL", "redis://localhost:6379/0")
+# Сколько хранить результаты, секунды (SQL-шаблоны хранятся SQL_CACHE_TTL)
+CACHE_STORE_RESULT_TTL = float(os.getenv("CACHE_STORE_RESULT_TTL", "604800"))
+
+# Дневные агрегаты: отвечать на вопросы по датам из daily_snapshot_stats
+USE_ROLLUPS = os.getenv("USE_ROLLUPS", "1") == "1"
+
+# Колоночная копия таблиц в памяти (NumPy) для типовых вопросов, см. app/services/columnar.py
+COLUMNAR_ENGINE = os.getenv("COLUMNAR_ENGINE", "0") == "1"
+
+# Секционирование video_snapshots по created_at: 'month' или 'day'
+SNAPSHOT_PARTITION_INTERVAL = os.getenv("SNAPSHOT_PARTITION_INTERVAL", "month")
+# Сколько будущих секций создавать заранее при init_db
+SNAPSHOT_PARTITIONS_AHEAD = int(os.getenv("SNAPSHOT_PARTITIONS_AHEAD", "2"))
+
+# Планировщик запросов бота
+SCHEDULER_MAX_CONCURRENT = int(os.getenv("SCHEDULER_MAX_CONCURRENT", "8"))
+SCHEDULER_PER_USER_CONCURRENCY = int(os.getenv("SCHEDULER_PER_USER_CONCURRENCY", "1"))
+SCHEDULER_PER_USER_QUEUE = int(os.getenv("SCHEDULER_PER_USER_QUEUE", "3"))
+
+# Режим получения обновлений: 'polling' или 'webhook'
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+# Публичный адрес, на который Telegram шлет обновления (без пути), например https://bot.example.com
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "0.0.0.0")
+WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", "8080"))
+# Количество процессов, слушающих один порт (SO_REUSEPORT)
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "1"))
+# Сколько секунд при остановке ждать завершения начатых обработчиков
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "30"))
+# Адрес Bot API (например, локальный Bot API server или app/tests/fake_telegram.py)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+
+# Порт /metrics в режиме polling (0 — не поднимать; в режиме webhook /metrics на WEBAPP_PORT)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Допуск сгенерированного SQL: таймаут выполнения и пороги стоимости плана (EXPLAIN)
+SQL_STATEMENT_TIMEOUT_MS = int(os.getenv("SQL_STATEMENT_TIMEOUT_MS", "5000"))
+# Дороже — запрос выполняется в ограниченной очереди тяжелых запросов
+SQL_HEAVY_COST = float(os.getenv("SQL_HEAVY_COST", "200000"))
+SQL_HEAVY_CONCURRENCY = int(os.getenv("SQL_HEAVY_CONCURRENCY", "2"))
+# Дороже — запрос отклоняется
+SQL_MAX_COST = float(os.getenv("SQL_MAX_COST", "5000000"))
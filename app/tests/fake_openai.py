@@ -0,0 +1,269 @@
+"""
+Fake OpenAI - локальная замена Chat Completions API для тестов и бенчмарков.
+
+Отвечает на POST /v1/chat/completions с настраиваемой задержкой и долей ошибок.
+Кэш префикса промпта моделируется как у OpenAI: уже встречавшийся префикс
+от 1024 токенов (с шагом 128) попадает в usage.prompt_tokens_details.cached_tokens,
+а prefill — задержка на каждую 1000 некэшированных токенов промпта.
+С stream=true ответ отдается SSE-чанками, по token_latency на токен; после
+SQL (с завершающей ;) можно добавить tail — "пояснение", которое модели иногда
+дописывают вопреки промпту.
+С response_format json_object (несколько пронумерованных вопросов в одном
+сообщении) отвечает {"queries": [SQL для каждого вопроса]}.
+SQL строится детерминированно: типовые вопросы — через fast_path, несколько
+других форм — по шаблонам, остальное — простой COUNT по videos.
+
+    python -m app.tests.fake_openai --port 8555 --latency 0.8 --jitter 0.3
+    OPENAI_BASE_URL=http://127.0.0.1:8555/v1 OPENAI_API_KEY=fake python bot.py
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+from app.services.fast_path import QueryIntent, date_filter, intent_to_sql, match_question, quote
+from app.services.question_normalizer import normalize_question
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_SQL = "SELECT COUNT(*) FROM videos"
+
+# Вопросы, которых нет в fast_path: нормализованный шаблон -> SQL по литералам
+EXTRA_PATTERNS = [
+    (
+        re.compile(r'^как\w* средн\w* (?:число|количество) просмотров у видео креатора(?: с)? <id>$'),
+        lambda ids, dates: f"SELECT COALESCE(AVG(views_count), 0) FROM videos WHERE creator_id = {quote(ids[0])}",
+    ),
+    (
+        re.compile(r'^сколько снапшотов у видео(?: с)? <id>$'),
+        lambda ids, dates: f"SELECT COUNT(*) FROM video_snapshots WHERE video_id = {quote(ids[0])}",
+    ),
+    (
+        re.compile(r'^сколько креаторов публиковали видео <date>(?: <date>)?$'),
+        lambda ids, dates: "SELECT COUNT(DISTINCT creator_id) FROM videos WHERE " + date_filter(
+            'video_created_at', QueryIntent('count', date_from=dates[0], date_to=dates[-1])
+        ),
+    ),
+]
+
+
+def question_to_sql(question: str) -> str:
+    """SQL, который "сгенерировала" бы модель"""
+    intent = match_question(question)
+    if intent is not None:
+        return intent_to_sql(intent)
+
+    normalized = normalize_question(question)
+    ids = [literal.value for literal in normalized.literals if literal.kind == 'id']
+    dates = [literal.value for literal in normalized.literals if literal.kind == 'date']
+    for pattern, build in EXTRA_PATTERNS:
+        if pattern.match(normalized.template):
+            return build(ids, dates)
+    return FALLBACK_SQL
+
+
+def count_tokens(text: str) -> int:
+    """Грубая оценка числа токенов (~4 байта UTF-8 на токен, кириллица — ~2 символа)"""
+    return max(1, len(text.encode('utf-8')) // 4)
+
+
+CACHE_MIN_TOKENS = 1024
+CACHE_STEP_TOKENS = 128
+PIECE_RE = re.compile(r'\S+\s*|\s+')
+NUMBERED_RE = re.compile(r'^\s*\d+\.\s*(.+)$', re.MULTILINE)
+
+
+class FakeOpenAI:
+    """
+    OpenAI-совместимый сервер.
+
+    latency — базовая задержка ответа (до первого токена), jitter — среднее
+    экспоненциального "хвоста" поверх нее (дает реалистичные p95/p99),
+    failure_rate — доля ответов 500, token_latency — время генерации одного
+    токена ответа.
+    """
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        latency: float = 0.5,
+        jitter: float = 0.2,
+        failure_rate: float = 0.0,
+        seed: Optional[int] = None,
+        prefill: float = 0.0,
+        prefix_cache: bool = True,
+        token_latency: float = 0.0,
+        tail: str = '',
+    ):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.prefill = prefill
+        self.prefix_cache = prefix_cache
+        self.token_latency = token_latency
+        self.tail = tail
+        self.requests = 0
+        self.failures = 0
+        self.cancelled_streams = 0
+        self.questions: List[str] = []
+        self._prefixes: set = set()  # хэши встречавшихся префиксов
+        self._rng = random.Random(seed)
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def base_url(self) -> str:
+        """Адрес для OPENAI_BASE_URL / AsyncOpenAI(base_url=...)"""
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post('/v1/chat/completions', self.chat_completions)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        logger.info(f"Fake OpenAI слушает {self.base_url}")
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    def delay(self, uncached_tokens: int = 0) -> float:
+        tail = self._rng.expovariate(1 / self.jitter) if self.jitter > 0 else 0.0
+        return self.latency + tail + self.prefill * uncached_tokens / 1000
+
+    def cached_tokens(self, prompt: str) -> int:
+        """Длина самого длинного уже встречавшегося префикса (в токенах, шагами по 128)"""
+        if not self.prefix_cache:
+            return 0
+        data = prompt.encode('utf-8')
+        cached = 0
+        for end in range(CACHE_MIN_TOKENS * 4, len(data) + 1, CACHE_STEP_TOKENS * 4):
+            prefix = hash(data[:end])
+            if prefix in self._prefixes:
+                cached = end // 4
+            else:
+                self._prefixes.add(prefix)
+        return cached
+
+    async def chat_completions(self, request: web.Request) -> web.Response:
+        """POST /v1/chat/completions"""
+        body: Dict[str, Any] = await request.json()
+        self.requests += 1
+        messages = body.get('messages', [])
+        prompt = ''.join(m.get('content', '') for m in messages)
+        prompt_tokens = count_tokens(prompt)
+        cached_tokens = self.cached_tokens(prompt)
+        await asyncio.sleep(self.delay(prompt_tokens - cached_tokens))
+
+        if self._rng.random() < self.failure_rate:
+            self.failures += 1
+            return web.json_response(
+                {'error': {'message': 'Fake OpenAI: injected failure', 'type': 'server_error'}},
+                status=500,
+            )
+
+        question = next((m['content'] for m in reversed(messages) if m.get('role') == 'user'), '')
+        if (body.get('response_format') or {}).get('type') == 'json_object':
+            batch = NUMBERED_RE.findall(question)
+            self.questions.extend(batch)
+            content = json.dumps({'queries': [question_to_sql(item) for item in batch]}, ensure_ascii=False)
+        else:
+            self.questions.append(question)
+            content = question_to_sql(question) + ';' + self.tail
+        completion_tokens = count_tokens(content)
+        usage = {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+            'prompt_tokens_details': {'cached_tokens': cached_tokens},
+        }
+        if body.get('stream'):
+            return await self.stream(request, body, content, usage)
+
+        await asyncio.sleep(self.token_latency * completion_tokens)
+        return web.json_response({
+            'id': f"chatcmpl-fake-{self.requests}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'fake'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': usage,
+        })
+
+    async def stream(self, request: web.Request, body: Dict[str, Any], content: str, usage: Dict[str, Any]):
+        """Ответ SSE-чанками chat.completion.chunk, как при stream=true"""
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream'})
+        await response.prepare(request)
+
+        def chunk(delta: Optional[Dict[str, str]], finish_reason: Optional[str] = None, **extra) -> bytes:
+            payload = {
+                'id': f"chatcmpl-fake-{self.requests}",
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': body.get('model', 'fake'),
+                'choices': [] if delta is None else [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+                **extra,
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode('utf-8')
+
+        try:
+            await response.write(chunk({'role': 'assistant', 'content': ''}))
+            for piece in PIECE_RE.findall(content):
+                await asyncio.sleep(self.token_latency * count_tokens(piece))
+                await response.write(chunk({'content': piece}))
+            await response.write(chunk({}, 'stop'))
+            if (body.get('stream_options') or {}).get('include_usage'):
+                await response.write(chunk(None, usage=usage))
+            await response.write(b"data: [DONE]\n\n")
+        except (ConnectionResetError, asyncio.CancelledError):
+            # Клиент закрыл поток — генерация прерывается
+            self.cancelled_streams += 1
+            raise
+        return response
+
+
+async def main():
+    """Запускает сервер до Ctrl+C"""
+    parser = argparse.ArgumentParser(description="Локальная замена OpenAI Chat Completions")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8555)
+    parser.add_argument("--latency", type=float, default=0.5, help="Базовая задержка, с")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Средний экспоненциальный хвост задержки, с")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Доля ответов 500")
+    parser.add_argument("--prefill", type=float, default=0.0, help="Задержка на 1000 некэшированных токенов промпта, с")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Время генерации одного токена ответа, с")
+    parser.add_argument("--tail", default="", help="Текст, который \"модель\" дописывает после SQL")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    fake = FakeOpenAI(
+        args.host, args.port, args.latency, args.jitter, args.failure_rate,
+        prefill=args.prefill, token_latency=args.token_latency, tail=args.tail,
+    )
+    await fake.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await fake.stop()
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,176 @@
+"""
+Fake Telegram - локальная замена Bot API для проверки бота без Telegram.
+
+Отвечает на вызовы методов бота (getMe, sendMessage, setWebhook, getUpdates, ...)
+и доставляет сообщения пользователей в webhook бота или через getUpdates.
+
+Ручная проверка webhook-режима:
+
+    python -m app.tests.fake_telegram --port 8081 --webhook http://127.0.0.1:8080/webhook &
+    TELEGRAM_API_URL=http://127.0.0.1:8081 BOT_MODE=webhook WEBHOOK_URL= python bot.py
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+
+class FakeTelegram:
+    """Минимальный Bot API: запоминает отправленные ботом сообщения"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.host = host
+        self.port = port
+        self.webhook_url: Optional[str] = None
+        self.webhook_secret: Optional[str] = None
+        self.sent: List[Dict[str, Any]] = []
+        self.calls: List[str] = []
+        self._updates: asyncio.Queue = asyncio.Queue()
+        self._sent_event = asyncio.Event()
+        self._ids = itertools.count(1)
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def api_url(self) -> str:
+        """Адрес для TELEGRAM_API_URL / TelegramAPIServer.from_base"""
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        logger.info(f"Fake Telegram слушает {self.api_url}")
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """Вызов метода Bot API: /bot{token}/{method}"""
+        method = request.match_info['method']
+        params = dict(await request.post())
+        self.calls.append(method)
+
+        if method == 'getMe':
+            result: Any = {'id': 42, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_bot'}
+        elif method == 'setWebhook':
+            self.webhook_url = params.get('url')
+            self.webhook_secret = params.get('secret_token')
+            result = True
+        elif method == 'deleteWebhook':
+            self.webhook_url = None
+            result = True
+        elif method == 'getUpdates':
+            result = await self.next_updates(float(params.get('timeout') or 0))
+        elif method == 'sendMessage':
+            result = {
+                'message_id': next(self._ids),
+                'date': int(time.time()),
+                'chat': {'id': int(params['chat_id']), 'type': 'private'},
+                'text': params.get('text', ''),
+            }
+            self.sent.append({'chat_id': int(params['chat_id']), 'text': params.get('text', '')})
+            self._sent_event.set()
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
+
+    async def next_updates(self, timeout: float) -> List[Dict[str, Any]]:
+        """Long polling: ждет хотя бы одно обновление не дольше timeout"""
+        updates = []
+        try:
+            updates.append(await asyncio.wait_for(self._updates.get(), timeout=timeout))
+        except asyncio.TimeoutError:
+            return updates
+        while not self._updates.empty():
+            updates.append(self._updates.get_nowait())
+        return updates
+
+    def make_update(self, text: str, user_id: int = 1) -> Dict[str, Any]:
+        update_id = next(self._ids)
+        return {
+            'update_id': update_id,
+            'message': {
+                'message_id': update_id,
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'from': {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}'},
+                'text': text,
+            },
+        }
+
+    async def send_user_message(self, text: str, user_id: int = 1, webhook_url: Optional[str] = None) -> int:
+        """
+        Доставляет сообщение пользователя боту.
+
+        При зарегистрированном (или переданном) webhook — POST в него,
+        иначе — в очередь getUpdates. Возвращает HTTP-статус webhook (или 200).
+        """
+        update = self.make_update(text, user_id)
+        url = webhook_url or self.webhook_url
+        if not url:
+            await self._updates.put(update)
+            return 200
+
+        headers = {'X-Telegram-Bot-Api-Secret-Token': self.webhook_secret} if self.webhook_secret else {}
+        async with aiohttp.ClientSession() as session:
+            async with session.post(url, json=update, headers=headers) as response:
+                return response.status
+
+    async def wait_sent(self, count: int, timeout: float = 5.0) -> List[Dict[str, Any]]:
+        """Ждет, пока бот отправит не меньше count сообщений"""
+        deadline = time.monotonic() + timeout
+        while len(self.sent) < count:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"Бот отправил {len(self.sent)} сообщений из {count}")
+            self._sent_event.clear()
+            try:
+                await asyncio.wait_for(self._sent_event.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
+        return self.sent
+
+
+async def main():
+    """Интерактивная отправка вопросов боту от имени пользователя"""
+    parser = argparse.ArgumentParser(description="Локальная замена Telegram Bot API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--webhook", help="Адрес webhook бота (если бот не регистрирует его сам)")
+    parser.add_argument("--user", type=int, default=1, help="id пользователя-отправителя")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    fake = FakeTelegram(args.host, args.port)
+    await fake.start()
+    print("Вводите вопросы, ответы бота печатаются ниже (Ctrl+D — выход)")
+    try:
+        while True:
+            try:
+                text = await asyncio.to_thread(input, "> ")
+            except EOFError:
+                break
+            expected = len(fake.sent) + 1
+            await fake.send_user_message(text, args.user, args.webhook)
+            try:
+                print(f"< {(await fake.wait_sent(expected, timeout=60))[-1]['text']}")
+            except TimeoutError as e:
+                print(e)
+    finally:
+        await fake.stop()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
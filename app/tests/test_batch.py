@@ -0,0 +1,61 @@
+"""
+Тесты нескольких вопросов в одном сообщении: разбиение, промпт
+и пакетная генерация SQL (локальная замена OpenAI)
+"""
+import asyncio
+import os
+from datetime import datetime
+
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+from openai import AsyncOpenAI
+
+from app.services import llm_service
+from app.services.llm_client import llm_client
+from app.services.prompt_builder import PromptBuilder
+from app.services.question_normalizer import split_questions
+from app.tests.fake_openai import FakeOpenAI, question_to_sql
+
+
+def test_split_questions():
+    """Каждая непустая строка — вопрос, маркеры списка отбрасываются"""
+    message = "1. Сколько всего видео?\n\n2) Сколько видео вышло 28.11.2025?\n- Сколько видео у креатора с id abc123?\n• Сколько снапшотов?"
+    assert split_questions(message) == [
+        "Сколько всего видео?",
+        "Сколько видео вышло 28.11.2025?",
+        "Сколько видео у креатора с id abc123?",
+        "Сколько снапшотов?",
+    ]
+    assert split_questions("Сколько всего видео?") == ["Сколько всего видео?"]
+
+
+def test_batch_prompt_keeps_prefix():
+    """Префикс тот же, что у одиночного вопроса; вопросы пронумерованы"""
+    builder = PromptBuilder(examples_count=2, use_rollups=False)
+    now = datetime(2025, 11, 28)
+    single = builder.build("Сколько всего видео?", now=now)
+    batch = builder.build_batch(["Сколько всего видео?", "Сколько видео вышло 5 ноября?"], now=now)
+    assert batch[0] == single[0]
+    assert batch[1]['content'].endswith("Текущая дата: 2025-11-28")
+    assert batch[2]['content'] == "1. Сколько всего видео?\n2. Сколько видео вышло 5 ноября?"
+
+
+def test_ask_llm_batch():
+    """Один запрос к LLM — по SQL на каждый вопрос, в порядке вопросов"""
+    async def scenario():
+        fake = FakeOpenAI(latency=0.0, jitter=0.0)
+        await fake.start()
+        client = llm_client.client
+        llm_client.client = AsyncOpenAI(api_key="fake", base_url=fake.base_url)
+        questions = ["Сколько всего видео есть в системе?", "Сколько снапшотов у видео с id abc123"]
+        try:
+            sql_queries = await llm_service.ask_llm_batch(questions)
+        finally:
+            await llm_client.client.close()
+            llm_client.client = client
+            await fake.stop()
+        assert fake.requests == 1
+        assert sql_queries == [question_to_sql(question) for question in questions]
+
+    asyncio.run(scenario())
+
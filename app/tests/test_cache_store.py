@@ -0,0 +1,119 @@
+"""
+Тесты постоянного хранилища кэшей (SQLite во временном каталоге, без БД и OpenAI)
+"""
+import asyncio
+import multiprocessing
+import os
+import tempfile
+
+from app.services.result_cache import ResultCache
+from app.services.sql_cache import SQLTemplateCache
+from app.storage.cache_store import CacheBackend, CacheStore, SQLiteBackend
+
+
+def test_sqlite_backend():
+    """get/set с TTL и выборка по префиксу"""
+    async def scenario(path: str):
+        backend = SQLiteBackend(path)
+        await backend.set("sql:a", "SELECT 1", ttl=60)
+        await backend.set("sql:b", "SELECT 2", ttl=-1)
+        await backend.set("result:1:x", "42", ttl=60)
+        assert await backend.get("sql:a") == "SELECT 1"
+        assert await backend.get("sql:b") is None
+        assert await backend.scan("sql:") == [("sql:a", "SELECT 1")]
+        await backend.close()
+
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(scenario(os.path.join(directory, "cache.sqlite3")))
+
+
+def write_in_child(backend: SQLiteBackend):
+    """Запись из процесса, полученного через fork (как воркеры run_workers)"""
+    asyncio.run(backend.set("sql:child", "SELECT 3", ttl=60))
+    assert backend._pid == os.getpid()
+
+
+def test_sqlite_backend_reconnects_after_fork():
+    """Файл открывается при первом запросе, и у каждого процесса свое соединение"""
+    async def read(backend: SQLiteBackend):
+        value = await backend.get("sql:child")
+        await backend.close()
+        return value
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.sqlite3")
+        backend = SQLiteBackend(path)
+        assert not os.path.exists(path)
+
+        asyncio.run(backend.set("sql:parent", "SELECT 1", ttl=60))
+        child = multiprocessing.get_context('fork').Process(target=write_in_child, args=(backend,))
+        child.start()
+        child.join()
+        assert child.exitcode == 0
+        assert asyncio.run(read(backend)) == "SELECT 3"
+
+
+def test_backend_must_implement_interface():
+    """Бэкенд без scan не создается — ошибка видна сразу, а не при первом обращении к кэшу"""
+    class PartialBackend(CacheBackend):
+        async def get(self, key):
+            return None
+
+        async def set(self, key, value, ttl):
+            pass
+
+    try:
+        PartialBackend()
+        assert False, "ожидался TypeError"
+    except TypeError as e:
+        assert 'scan' in str(e)
+
+
+def test_caches_survive_restart():
+    """Новый процесс (новые экземпляры кэшей) находит шаблоны и результаты предыдущего"""
+    question = "Сколько видео у креатора с id abc123 вышло с 1 по 5 ноября 2025 включительно?"
+    sql = (
+        "SELECT COUNT(id) FROM videos WHERE creator_id = 'abc123' "
+        "AND video_created_at::date BETWEEN '2025-11-01' AND '2025-11-05'"
+    )
+
+    async def first_run(path: str):
+        store = CacheStore(SQLiteBackend(path))
+        assert SQLTemplateCache(store=store).put(question, sql)
+        ResultCache(store=store).put(sql, version=3, value=7)
+        await store.close()
+
+    async def second_run(path: str):
+        store = CacheStore(SQLiteBackend(path))
+        templates = SQLTemplateCache(store=store)
+        other = question.replace("abc123", "def456")
+        assert (await templates.lookup(other)) == sql.replace("abc123", "def456")
+        assert templates.stats()['store_hits'] == 1 and templates.stats()['misses'] == 0
+
+        results = ResultCache(store=store)
+        assert await results.lookup(sql, version=4) is None
+        assert await results.warmup(version=3) == 1
+        assert results.get(sql, version=3) == 7
+        await store.close()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.sqlite3")
+        asyncio.run(first_run(path))
+        asyncio.run(second_run(path))
+
+
+def test_local_results_not_written_to_store():
+    """Результат быстрого пути (shared=False) остается в памяти и не пишется в хранилище"""
+    async def scenario(path: str):
+        store = CacheStore(SQLiteBackend(path))
+        results = ResultCache(store=store)
+        results.put("SELECT COUNT(id) FROM videos", version=1, value=5, shared=False)
+        results.put("SELECT COUNT(id) FROM video_snapshots", version=1, value=9)
+        await store.flush()
+        assert results.get("SELECT COUNT(id) FROM videos", version=1) == 5
+        assert list((await store.scan("result:")).values()) == ["9"]
+        await store.close()
+
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(scenario(os.path.join(directory, "cache.sqlite3")))
+
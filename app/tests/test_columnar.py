@@ -0,0 +1,64 @@
+"""
+Тесты колоночного движка на небольшом наборе строк (без БД, нужен numpy)
+"""
+import pytest
+
+pytest.importorskip("numpy")
+
+from app.services.columnar import ColumnarBuilder, ColumnarData, day_number
+from app.services.fast_path import QueryIntent
+
+NOV_1 = day_number('2025-11-01')
+
+# id, creator_id, день публикации, views, likes, comments, reports
+VIDEOS = [
+    ('v1', 'c1', NOV_1, 1000, 10, 1, 0),
+    ('v2', 'c1', NOV_1 + 1, 50, 2, 0, 0),
+    ('v3', 'c2', NOV_1 + 2, 7000, 70, 3, 1),
+]
+# video_id, день, delta views, likes, comments, reports
+SNAPSHOTS = [
+    ('v1', NOV_1, 100, 1, 0, 0),
+    ('v2', NOV_1, 0, 0, 0, 0),
+    ('v1', NOV_1 + 1, 50, 0, 0, 0),
+    ('v3', NOV_1 + 1, 20, 2, 0, 0),
+    ('v3', NOV_1 + 3, 5, 0, 1, 0),
+]
+
+
+def test_columnar_evaluates_intents():
+    """Ответы совпадают с тем, что вернул бы SQL быстрого пути"""
+    data = ColumnarData.from_rows(1, VIDEOS, SNAPSHOTS)
+    assert data.evaluate(QueryIntent('count_videos')) == 3
+    assert data.evaluate(QueryIntent('count_videos_by_creator', creator_id='c1')) == 2
+    assert data.evaluate(QueryIntent('count_videos_by_creator', creator_id='c1', date_from='2025-11-02', date_to='2025-11-05')) == 1
+    assert data.evaluate(QueryIntent('count_videos_by_creator', creator_id='нет')) == 0
+    assert data.evaluate(QueryIntent('count_videos_published', date_from='2025-11-01', date_to='2025-11-02')) == 2
+    assert data.evaluate(QueryIntent('count_videos_threshold', metric='views', operator='>', threshold=500)) == 2
+    assert data.evaluate(QueryIntent('count_videos_threshold', metric='likes', operator='<', threshold=10)) == 1
+
+
+def test_columnar_day_ranges():
+    """Срезы по индексу дней, включая дни вне диапазона данных и дни без снапшотов"""
+    data = ColumnarData.from_rows(1, VIDEOS, SNAPSHOTS)
+    assert data.evaluate(QueryIntent('sum_delta', metric='views', date_from='2025-11-01', date_to='2025-11-01')) == 100
+    assert data.evaluate(QueryIntent('sum_delta', metric='views', date_from='2025-10-01', date_to='2025-12-31')) == 175
+    assert data.evaluate(QueryIntent('sum_delta', metric='views', date_from='2025-11-03', date_to='2025-11-03')) == 0
+    assert data.evaluate(QueryIntent('sum_delta', metric='views', date_from='2025-12-01', date_to='2025-12-02')) == 0
+    assert data.evaluate(QueryIntent('count_videos_with_growth', metric='views', date_from='2025-11-01', date_to='2025-11-04')) == 2
+    assert data.evaluate(QueryIntent('count_videos_with_growth', metric='comments', date_from='2025-11-04', date_to='2025-11-04')) == 1
+
+
+def test_columnar_builder_chunks():
+    """Копия, собранная по частям, совпадает с собранной из всех строк сразу"""
+    builder = ColumnarBuilder(len(VIDEOS), len(SNAPSHOTS))
+    builder.add_videos(VIDEOS[:2])
+    builder.add_videos(VIDEOS[2:])
+    for start in range(0, len(SNAPSHOTS), 2):
+        builder.add_snapshots(SNAPSHOTS[start:start + 2])
+    chunked = builder.build(1)
+    whole = ColumnarData.from_rows(1, VIDEOS, SNAPSHOTS)
+    assert chunked.snapshot_video.tolist() == whole.snapshot_video.tolist() == [0, 1, 0, 2, 2]
+    assert chunked.day_offsets.tolist() == whole.day_offsets.tolist()
+    assert chunked.evaluate(QueryIntent('count_videos_by_creator', creator_id='c1')) == 2
+
@@ -4,8 +4,8 @@
 import asyncio
 import logging
 from sqlalchemy import select, func
-from src.db import init_db, AsyncSessionLocal
-from src.models import Video, VideoSnapshot
+from app.database.db import init_db, AsyncSessionLocal
+from app.database.models import Video, VideoSnapshot
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
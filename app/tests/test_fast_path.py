@@ -0,0 +1,75 @@
+"""
+Тесты быстрого пути: типовые вопросы разбираются в SQL без LLM
+"""
+from app.services import fast_path
+from app.services.fast_path import intent_to_sql, match_fast_path, match_question
+
+
+def fast_path_sql(question: str) -> str:
+    """SQL быстрого пути так же, как его получает query_service"""
+    intent = match_fast_path(question)
+    assert intent is not None, question
+    return intent_to_sql(intent)
+
+
+def test_prompt_examples():
+    """Примеры из системного промпта дают тот же SQL, что и LLM"""
+    cases = {
+        "Сколько всего видео есть в системе?":
+            "SELECT COUNT(id) FROM videos",
+        "Сколько видео у креатора с id abc123 вышло с 1 ноября 2025 по 5 ноября 2025 включительно?":
+            "SELECT COUNT(id) FROM videos WHERE creator_id = 'abc123' "
+            "AND video_created_at::date BETWEEN '2025-11-01' AND '2025-11-05'",
+        "Сколько видео набрало больше 100000 просмотров за всё время?":
+            "SELECT COUNT(id) FROM videos WHERE views_count > 100000",
+        "На сколько просмотров в сумме выросли все видео 28 ноября 2025?":
+            "SELECT COALESCE(SUM(delta_views_count), 0) FROM video_snapshots WHERE created_at::date = '2025-11-28'",
+        "Сколько разных видео получали новые просмотры 27 ноября 2025?":
+            "SELECT COUNT(DISTINCT video_id) FROM video_snapshots "
+            "WHERE created_at::date = '2025-11-27' AND delta_views_count > 0",
+        "Сколько лайков набрали все видео за период с 26 по 28 ноября?":
+            "SELECT COALESCE(SUM(delta_likes_count), 0) FROM video_snapshots "
+            "WHERE created_at::date BETWEEN '2025-11-26' AND '2025-11-28'",
+    }
+    use_rollups = fast_path.USE_ROLLUPS
+    fast_path.USE_ROLLUPS = False
+    try:
+        for question, sql in cases.items():
+            assert fast_path_sql(question) == sql, question
+    finally:
+        fast_path.USE_ROLLUPS = use_rollups
+
+
+def test_rollups_targeted():
+    """Суммы приростов и дневные счетчики читаются из daily_snapshot_stats"""
+    use_rollups = fast_path.USE_ROLLUPS
+    fast_path.USE_ROLLUPS = True
+    try:
+        assert fast_path_sql("Сколько лайков набрали все видео за период с 26 по 28 ноября?") == (
+            "SELECT COALESCE(SUM(sum_delta_likes_count), 0) FROM daily_snapshot_stats "
+            "WHERE day BETWEEN '2025-11-26' AND '2025-11-28'"
+        )
+        assert fast_path_sql("Сколько разных видео получали новые просмотры 27 ноября 2025?") == (
+            "SELECT COALESCE(SUM(videos_with_views_growth), 0) FROM daily_snapshot_stats WHERE day = '2025-11-27'"
+        )
+        # Число разных видео за период не складывается из дней — остается сырой таблицей
+        assert "FROM video_snapshots" in fast_path_sql("Сколько разных видео получали просмотры с 1 по 3 ноября?")
+    finally:
+        fast_path.USE_ROLLUPS = use_rollups
+
+
+def test_thresholds_and_metrics():
+    """Пороги с множителями и разные метрики"""
+    intent = match_question("Сколько видео набрало больше 1 млн просмотров?")
+    assert intent.threshold == 1_000_000 and intent.operator == '>' and intent.metric == 'views'
+
+    intent = match_question("Сколько видео получили меньше 10 жалоб?")
+    assert intent_to_sql(intent) == "SELECT COUNT(id) FROM videos WHERE reports_count < 10"
+
+
+def test_unknown_questions_fall_back():
+    """Нетиповые вопросы уходят в LLM"""
+    assert match_question("Какой креатор самый популярный?") is None
+    assert match_question("Сколько видео у креатора с id abc123 набрало больше 1000 просмотров?") is None
+    assert match_question("Сколько видео вышло с 5 по 1 ноября?") is None
+
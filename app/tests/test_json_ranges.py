@@ -0,0 +1,65 @@
+"""
+Тесты разбора videos.json по диапазонам байт (без БД)
+"""
+import json
+
+from app.database.json_ranges import read_range_videos, split_ranges
+from app.database.loader import build_range, iter_batches
+
+
+def make_file(tmp_path, indent=None):
+    """Файл с не-ASCII строками и '{' внутри строк снапшотов"""
+    videos = [
+        {
+            'id': f'в{i}',
+            'creator_id': f'к{i % 3}',
+            'snapshots': [{'id': f's{i}-{j}', 'note': '{"creator_id": "ё"}'} for j in range(i % 4)],
+        }
+        for i in range(50)
+    ]
+    path = tmp_path / 'videos.json'
+    path.write_text(json.dumps({'meta': {'x': '{'}, 'videos': videos}, ensure_ascii=False, indent=indent), encoding='utf-8')
+    return path, videos
+
+
+def test_ranges_cover_each_video_once(tmp_path):
+    """Границы диапазонов посреди видео и символов: каждое видео ровно один раз, по порядку"""
+    for indent in (None, 2):
+        path, videos = make_file(tmp_path, indent)
+        for range_bytes in (5, 64, 333, 10 ** 6):
+            ranges = split_ranges(path, range_bytes)
+            assert [video for start, end in ranges for video in read_range_videos(str(path), start, end)] == videos
+
+
+def test_range_batches_match_stream(tmp_path):
+    """Батчи пула собирают те же строки, что и потоковый разбор"""
+    path = tmp_path / 'videos.json'
+    stamp = '2025-11-01T10:00:00Z'
+    video = {'video_created_at': stamp, 'views_count': 1, 'likes_count': 2, 'comments_count': 0, 'reports_count': 0,
+             'created_at': stamp, 'updated_at': stamp}
+    snapshot = {'views_count': 1, 'likes_count': 2, 'comments_count': 0, 'reports_count': 0, 'delta_views_count': 1,
+                'delta_likes_count': 2, 'delta_comments_count': 0, 'delta_reports_count': 0,
+                'created_at': stamp, 'updated_at': stamp}
+    videos = [
+        {**video, 'id': f'v{i}', 'creator_id': 'c1',
+         'snapshots': [{**snapshot, 'id': f'v{i}-{j}', 'video_id': f'v{i}'} for j in range(3)]}
+        for i in range(20)
+    ]
+    path.write_text(json.dumps({'videos': videos}))
+
+    expected = [row for batch in iter_batches(iter(videos), batch_size=7) for rows in batch for row in rows]
+    parallel = [
+        row
+        for start, end in split_ranges(path, 200)
+        for batch in build_range(str(path), start, end, batch_size=7)
+        for rows in batch
+        for row in rows
+    ]
+    assert sorted(parallel) == sorted(expected)
+
+
+def test_file_without_videos_array(tmp_path):
+    """Без массива videos диапазонов нет — загрузчик разбирает файл потоково"""
+    path = tmp_path / 'videos.json'
+    path.write_text('[]')
+    assert split_ranges(path) == []
@@ -0,0 +1,131 @@
+"""
+Тесты клиента LLM: таймауты, повторы, hedging и предохранитель
+(локальная замена OpenAI)
+"""
+import asyncio
+import time
+
+from openai import AsyncOpenAI
+
+from app.services.llm_client import CircuitBreaker, LLMClient, LLMUnavailableError
+from app.tests.fake_openai import FakeOpenAI
+
+MESSAGES = [{"role": "user", "content": "Сколько всего видео есть в системе?"}]
+
+
+class SlowFirstOpenAI(FakeOpenAI):
+    """Первый запрос "зависает" на секунду, остальные отвечают сразу"""
+
+    def delay(self, uncached_tokens: int = 0) -> float:
+        return 1.0 if self.requests == 1 else 0.0
+
+
+def make_client(fake: FakeOpenAI, **kwargs) -> LLMClient:
+    return LLMClient(AsyncOpenAI(api_key="fake", base_url=fake.base_url, max_retries=0), **kwargs)
+
+
+async def ask(client: LLMClient):
+    return await client.create(model="fake", messages=MESSAGES)
+
+
+def test_retries_and_breaker():
+    """Ошибки 500 повторяются, после серии ошибок вызовы отклоняются без запроса к API"""
+    async def scenario():
+        fake = FakeOpenAI(latency=0.0, jitter=0.0, failure_rate=1.0)
+        await fake.start()
+        client = make_client(fake, max_retries=2, retry_delay=0.01, breaker=CircuitBreaker(3, reset_timeout=0.2))
+        try:
+            for _ in range(2):
+                try:
+                    await ask(client)
+                    assert False, "ожидался LLMUnavailableError"
+                except LLMUnavailableError:
+                    pass
+            assert fake.requests == 3 and client.breaker.state == 'open'
+
+            started = time.perf_counter()
+            try:
+                await ask(client)
+                assert False, "ожидался LLMUnavailableError"
+            except LLMUnavailableError:
+                pass
+            assert fake.requests == 3 and time.perf_counter() - started < 0.05
+
+            # После reset_timeout пробный вызов проходит и замыкает предохранитель
+            fake.failure_rate = 0.0
+            await asyncio.sleep(0.25)
+            response = await ask(client)
+            assert response.choices[0].message.content.startswith("SELECT")
+            assert client.breaker.state == 'closed'
+        finally:
+            await client.client.close()
+            await fake.stop()
+
+    asyncio.run(scenario())
+
+
+def test_timeout():
+    """Попытка ограничена таймаутом"""
+    async def scenario():
+        fake = FakeOpenAI(latency=0.5, jitter=0.0)
+        await fake.start()
+        client = make_client(fake, timeout=0.1, max_retries=1)
+        started = time.perf_counter()
+        try:
+            await ask(client)
+            assert False, "ожидался LLMUnavailableError"
+        except LLMUnavailableError:
+            elapsed = time.perf_counter() - started
+        finally:
+            await client.client.close()
+            await fake.stop()
+        assert elapsed < 0.4
+
+    asyncio.run(scenario())
+
+
+def test_stream_read_timeout():
+    """Таймаут ограничивает чтение потока целиком, а не только его открытие"""
+    async def read(response):
+        return [chunk async for chunk in response]
+
+    async def scenario():
+        # Первый токен приходит сразу, весь ответ — примерно за секунду
+        fake = FakeOpenAI(latency=0.0, jitter=0.0, token_latency=0.05)
+        await fake.start()
+        client = make_client(fake, timeout=0.2, max_retries=2, retry_delay=0.01, breaker=CircuitBreaker(2))
+        started = time.perf_counter()
+        try:
+            await client.stream(read, model="fake", messages=MESSAGES)
+            assert False, "ожидался LLMUnavailableError"
+        except LLMUnavailableError:
+            elapsed = time.perf_counter() - started
+        finally:
+            await client.client.close()
+            await fake.stop()
+        assert elapsed < 0.7
+        assert fake.requests == 2 and client.retries == 1 and client.breaker.state == 'open'
+
+    asyncio.run(scenario())
+
+
+def test_hedged_request():
+    """Если ответ дольше квантиля недавних задержек, берется ответ дублирующего запроса"""
+    async def scenario():
+        fake = SlowFirstOpenAI(latency=0.0, jitter=0.0)
+        await fake.start()
+        client = make_client(fake, hedge_quantile=0.95)
+        client.latencies.extend([0.05] * 20)
+        started = time.perf_counter()
+        try:
+            response = await ask(client)
+            elapsed = time.perf_counter() - started
+        finally:
+            await client.client.close()
+            await fake.stop()
+        assert response.choices[0].message.content.startswith("SELECT")
+        assert elapsed < 0.5
+        assert client.hedged == 1 and client.hedge_wins == 1 and fake.requests == 2
+
+    asyncio.run(scenario())
+
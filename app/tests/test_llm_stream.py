@@ -0,0 +1,49 @@
+"""
+Тесты потокового ответа LLM: SQL возвращается на завершающей ";",
+остаток генерации отменяется (локальная замена OpenAI)
+"""
+import asyncio
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+from openai import AsyncOpenAI
+
+from app.services import llm_service
+from app.services.llm_client import llm_client
+from app.services.llm_service import complete_statement
+from app.tests.fake_openai import FakeOpenAI
+
+
+def test_complete_statement():
+    """Выражение закончено на ";" вне кавычек или на закрывающем ```"""
+    assert complete_statement("SELECT COUNT(id) FROM vid") is None
+    assert complete_statement("SELECT COUNT(id) FROM videos; -- пояснение") == "SELECT COUNT(id) FROM videos"
+    assert complete_statement("SELECT 1 FROM videos WHERE creator_id = 'a;b'") is None
+    assert complete_statement("SELECT 1 FROM videos WHERE creator_id = 'a;b';") == "SELECT 1 FROM videos WHERE creator_id = 'a;b'"
+    assert complete_statement("```sql\nSELECT COUNT(id) FROM videos\n") is None
+    assert complete_statement("```sql\nSELECT COUNT(id) FROM videos\n```\nПояснение") == "SELECT COUNT(id) FROM videos"
+
+
+def test_stream_stops_after_statement():
+    """Поток закрывается после ";", не дожидаясь пояснения модели"""
+    async def scenario():
+        tail = " -- пояснение" * 100
+        fake = FakeOpenAI(latency=0.0, jitter=0.0, token_latency=0.01, tail=tail)
+        await fake.start()
+        client = llm_client.client
+        llm_client.client = AsyncOpenAI(api_key="fake", base_url=fake.base_url)
+        try:
+            messages = [{"role": "user", "content": "Сколько всего видео есть в системе?"}]
+            sql = await llm_service.stream(messages)
+            await asyncio.sleep(0.1)
+        finally:
+            await llm_client.client.close()
+            llm_client.client = client
+            await fake.stop()
+        assert sql.upper().startswith("SELECT") and not sql.endswith(";")
+        assert "пояснение" not in sql
+        assert fake.cancelled_streams == 1
+
+    asyncio.run(scenario())
+
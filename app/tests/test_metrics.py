@@ -0,0 +1,36 @@
+"""
+Тесты метрик: гистограммы, счетчики и текстовый формат Prometheus
+"""
+from app.services.metrics import Registry
+
+
+def test_histogram_buckets_are_cumulative():
+    """Каждая корзина считает все наблюдения не больше своей границы"""
+    registry = Registry()
+    histogram = registry.histogram('test_seconds', 'Тест', buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, stage='sql')
+
+    text = registry.render()
+    assert 'test_seconds_bucket{stage="sql",le="0.1"} 1' in text
+    assert 'test_seconds_bucket{stage="sql",le="1"} 2' in text
+    assert 'test_seconds_bucket{stage="sql",le="+Inf"} 3' in text
+    assert 'test_seconds_count{stage="sql"} 3' in text
+    assert '# TYPE test_seconds histogram' in text
+
+
+def test_counter_and_gauge():
+    """Счетчики с метками и вычисляемые gauge"""
+    registry = Registry()
+    counter = registry.counter('test_total', 'Тест')
+    counter.inc(source='llm')
+    counter.inc(2, source='fast_path')
+    registry.gauge('test_ratio', 'Тест', lambda: 0.75)
+    registry.counter_func('test_retries_total', 'Тест', lambda: 3)
+
+    text = registry.render()
+    assert 'test_total{source="fast_path"} 2' in text
+    assert 'test_total{source="llm"} 1' in text
+    assert '# TYPE test_ratio gauge' in text and 'test_ratio 0.75' in text
+    assert '# TYPE test_retries_total counter' in text and 'test_retries_total 3' in text
+
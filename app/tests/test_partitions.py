@@ -0,0 +1,36 @@
+"""
+Тесты расчета секций video_snapshots
+"""
+from datetime import datetime, timedelta, timezone
+
+from app.database.partitions import iter_partitions, name_before, partition_name
+
+MSK = timezone(timedelta(hours=3))
+
+
+def test_partition_name_uses_utc():
+    """Имя секции считается по UTC, а не по часовому поясу значения"""
+    ts = datetime(2025, 12, 1, 1, 0, tzinfo=MSK)  # 2025-11-30 22:00 UTC
+    assert partition_name(ts, 'month') == 'video_snapshots_2025_11'
+    assert partition_name(ts, 'day') == 'video_snapshots_2025_11_30'
+
+
+def test_iter_partitions_covers_range():
+    """Секции покрывают весь диапазон, включая переход через год"""
+    first = datetime(2025, 11, 15, tzinfo=timezone.utc)
+    last = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    partitions = list(iter_partitions(first, last, 'month'))
+    assert [name for name, _, _ in partitions] == [
+        'video_snapshots_2025_11', 'video_snapshots_2025_12', 'video_snapshots_2026_01',
+    ]
+    assert partitions[1][1:] == (datetime(2025, 12, 1, tzinfo=timezone.utc), datetime(2026, 1, 1, tzinfo=timezone.utc))
+
+
+def test_name_before():
+    """Секция отсоединяется, только если целиком лежит раньше границы"""
+    before = datetime(2025, 12, 1, tzinfo=timezone.utc)
+    assert name_before('video_snapshots_2025_11', before)
+    assert not name_before('video_snapshots_2025_12', before)
+    assert name_before('video_snapshots_2025_11_30', before)
+    assert not name_before('video_snapshots_default', before)
+
@@ -0,0 +1,32 @@
+"""
+Тесты сборки промпта Text-to-SQL
+"""
+from datetime import datetime
+
+from app.services.prompt_builder import PromptBuilder
+
+
+def test_prefix_is_stable_and_date_is_last():
+    """Первое сообщение одинаково для любых вопросов и дат, дата — в конце второго"""
+    builder = PromptBuilder(examples_count=2, use_rollups=True)
+    first = builder.build("Сколько видео набрало больше 500 лайков?", now=datetime(2025, 11, 28))
+    second = builder.build("Сколько креаторов публиковали видео 5 ноября?", now=datetime(2025, 12, 1))
+    assert first[0] == second[0]
+    assert "2025-11-28" not in first[0]['content']
+    assert first[1]['content'].endswith("Текущая дата: 2025-11-28")
+    assert first[2] == {"role": "user", "content": "Сколько видео набрало больше 500 лайков?"}
+
+
+def test_relevant_examples_are_selected():
+    """Берутся только examples_count ближайших примеров; с 0 — все примеры в префиксе"""
+    builder = PromptBuilder(examples_count=2, use_rollups=False)
+    examples = builder.select_examples("Сколько видео набрало меньше 500 просмотров за всё время?")
+    assert len(examples) == 2
+    assert any("views_count > 100000" in example.sql for example in examples)
+    assert all('daily_snapshot_stats' not in example.sql for example in builder.select_examples("На сколько выросли просмотры 3 ноября?"))
+
+    shared = PromptBuilder(examples_count=0, use_rollups=True)
+    messages = shared.build("Сколько всего видео?", now=datetime(2025, 11, 28))
+    assert "daily_snapshot_stats WHERE day = '2025-11-28'" in messages[0]['content']
+    assert messages[1]['content'] == "Текущая дата: 2025-11-28"
+
@@ -0,0 +1,62 @@
+"""
+Тесты маршрутизации чтения по репликам и кэширования их результатов (без подключения к БД)
+"""
+import asyncio
+
+from app.database.db import ReadRouter, ReadTarget, make_engine
+from app.services import sql_executor
+from app.services.result_cache import ResultCache
+from app.storage.cache_store import CacheStore
+
+
+def target(name: str) -> ReadTarget:
+    # Движок не подключается, пока из него не берут соединение
+    return ReadTarget(name, make_engine('127.0.0.1', '5432', 1, 0))
+
+
+def test_replicas_round_robin_then_primary():
+    """Реплики чередуются, основной сервер — последний вариант"""
+    a, b, primary = target('a'), target('b'), target('primary')
+    router = ReadRouter([a, b], primary)
+    assert [t.name for t in router.candidates()] == ['a', 'b', 'primary']
+    assert [t.name for t in router.candidates()] == ['b', 'a', 'primary']
+
+
+def test_unhealthy_replica_is_skipped():
+    """Недоступная реплика исключается; если недоступны все — читаем с основного"""
+    a, b, primary = target('a'), target('b'), target('primary')
+    router = ReadRouter([a, b], primary)
+    a.mark_down(ConnectionRefusedError())
+    assert [t.name for t in router.candidates()] == ['b', 'primary']
+    b.mark_down(ConnectionRefusedError())
+    assert [t.name for t in router.candidates()] == ['primary']
+
+
+def test_lagging_replica_result_not_cached():
+    """Результат с реплики, которая видит старую версию данных, не кэшируется под текущей"""
+    sql = "SELECT COUNT(id) FROM videos"
+    seen_versions = iter([4, 5])
+
+    async def fetch_row(sql_query, trusted, with_version=False):
+        assert with_version
+        return (7,), next(seen_versions)
+
+    async def current():
+        return 5
+
+    async def scenario():
+        assert await sql_executor.execute_sql_query(sql, trusted=True) == 7
+        assert len(sql_executor.result_cache) == 0
+        assert await sql_executor.execute_sql_query(sql, trusted=True) == 7
+        assert sql_executor.result_cache.get(sql, version=5) == 7
+
+    saved = sql_executor.fetch_row, sql_executor.result_cache
+    sql_executor.fetch_row = fetch_row
+    sql_executor.result_cache = ResultCache(store=CacheStore(None))
+    sql_executor.data_version.current = current
+    try:
+        asyncio.run(scenario())
+    finally:
+        sql_executor.fetch_row, sql_executor.result_cache = saved
+        del sql_executor.data_version.current
+
@@ -0,0 +1,114 @@
+"""
+Тесты планировщика запросов: лимиты, очередь пользователя и объединение вопросов
+"""
+import asyncio
+
+from app.services.scheduler import QueryScheduler, TooManyRequestsError
+
+
+class SlowHandler:
+    """Обработчик-заглушка: считает вызовы и одновременные выполнения"""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+
+    async def __call__(self, question: str) -> int:
+        self.calls += 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(self.delay)
+        self.running -= 1
+        return len(question)
+
+
+def test_identical_questions_are_coalesced():
+    """Одинаковые (после нормализации) вопросы выполняются один раз"""
+    async def scenario():
+        handler = SlowHandler()
+        scheduler = QueryScheduler(handler, max_concurrent=4)
+        results = await asyncio.gather(*[
+            scheduler.submit(user_id, "Сколько видео вышло 28 ноября 2025?") for user_id in range(10)
+        ])
+        assert len(set(results)) == 1
+        assert handler.calls == 1
+        assert scheduler.coalesced == 9
+
+    asyncio.run(scenario())
+
+
+def test_global_and_per_user_limits():
+    """Глобальный лимит соблюдается, один пользователь не занимает больше своего лимита"""
+    async def scenario():
+        handler = SlowHandler()
+        scheduler = QueryScheduler(handler, max_concurrent=3, per_user_concurrency=1, per_user_queue=10)
+        await asyncio.gather(*[
+            scheduler.submit(f"user{index % 5}", f"Сколько видео у креатора с id c{index}?") for index in range(20)
+        ])
+        assert handler.calls == 20
+        assert handler.max_running == 3
+
+        handler = SlowHandler()
+        scheduler = QueryScheduler(handler, max_concurrent=3, per_user_concurrency=1, per_user_queue=10)
+        await asyncio.gather(*[
+            scheduler.submit("user", f"Сколько видео у креатора с id c{index}?") for index in range(5)
+        ])
+        assert handler.max_running == 1
+
+    asyncio.run(scenario())
+
+
+def test_slots_go_round_robin():
+    """Вопрос второго пользователя не ждет, пока выполнится вся очередь первого"""
+    async def scenario():
+        started = []
+
+        async def handler(question: str) -> int:
+            started.append(question)
+            await asyncio.sleep(0.01)
+            return 0
+
+        scheduler = QueryScheduler(handler, max_concurrent=1, per_user_concurrency=3, per_user_queue=10)
+        heavy = [scheduler.submit("heavy", f"Сколько видео у креатора с id h{index}?") for index in range(4)]
+        light = scheduler.submit("light", "Сколько видео у креатора с id l0?")
+        await asyncio.gather(*heavy, light)
+        # FIFO дал бы h0, h1, h2, h3, l0
+        assert started.index("Сколько видео у креатора с id l0?") == 2
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_frees_its_place():
+    """Отмененный в очереди вопрос не занимает слот и не ломает обход"""
+    async def scenario():
+        handler = SlowHandler(delay=0.02)
+        scheduler = QueryScheduler(handler, max_concurrent=1, per_user_concurrency=1, per_user_queue=10)
+        first = asyncio.create_task(scheduler._submit("a", "k1", handler, "q1"))
+        second = asyncio.create_task(scheduler._submit("a", "k2", handler, "q2"))
+        await asyncio.sleep(0.005)  # q1 выполняется, q2 ждет слота
+        scheduler._inflight["k2"].cancel()
+        third = asyncio.create_task(scheduler._submit("b", "k3", handler, "q3"))
+        assert await first == 2 and await third == 2
+        assert (await asyncio.gather(second, return_exceptions=True))[0].__class__ is asyncio.CancelledError
+        assert scheduler.stats()['running'] == 0 and scheduler.stats()['queued'] == 0
+        assert handler.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_user_queue_overflow_is_rejected():
+    """Вопросы сверх очереди пользователя отклоняются, остальные выполняются"""
+    async def scenario():
+        handler = SlowHandler()
+        scheduler = QueryScheduler(handler, max_concurrent=4, per_user_concurrency=1, per_user_queue=2)
+        results = await asyncio.gather(*[
+            scheduler.submit("user", f"Сколько видео у креатора с id c{index}?") for index in range(5)
+        ], return_exceptions=True)
+        assert sum(isinstance(result, TooManyRequestsError) for result in results) == 2
+        assert handler.calls == 3
+        assert scheduler.stats()['queued'] == 0
+
+    asyncio.run(scenario())
+
@@ -0,0 +1,63 @@
+"""
+Тесты нормализации вопросов и кэша SQL-шаблонов (без БД и OpenAI)
+"""
+from app.services.question_normalizer import normalize_question
+from app.services.sql_cache import SQLTemplateCache, make_sql_template
+
+
+def test_normalize_folds_case_and_punctuation():
+    """Регистр, пробелы и пунктуация не влияют на шаблон"""
+    first = normalize_question("Сколько всего видео есть в системе?")
+    second = normalize_question("  сколько ВСЕГО видео есть в системе!! ")
+    assert first.template == second.template
+    assert first.literals == ()
+
+
+def test_normalize_extracts_literals():
+    """Даты, диапазоны, идентификаторы и числа выносятся в параметры"""
+    normalized = normalize_question(
+        "Сколько видео у креатора с id abc123 вышло с 1 по 5 ноября 2025 включительно?"
+    )
+    assert [literal.value for literal in normalized.literals] == ['abc123', '2025-11-01', '2025-11-05']
+    assert '<id>' in normalized.template and normalized.template.count('<date>') == 2
+
+    normalized = normalize_question("Сколько видео набрало больше 100 000 просмотров?")
+    assert [literal.value for literal in normalized.literals] == ['100000']
+
+
+def test_template_reused_for_other_literals():
+    """Вопрос с другими значениями получает SQL из шаблона без LLM"""
+    cache = SQLTemplateCache(max_size=10, ttl=60)
+    assert cache.get("На сколько просмотров выросли все видео 28 ноября 2025?") is None
+    assert cache.put(
+        "На сколько просмотров выросли все видео 28 ноября 2025?",
+        "SELECT COALESCE(SUM(delta_views_count), 0) FROM video_snapshots WHERE created_at::date = '2025-11-28'",
+    )
+
+    sql = cache.get("на сколько просмотров выросли все видео 3 декабря")
+    assert sql == "SELECT COALESCE(SUM(delta_views_count), 0) FROM video_snapshots WHERE created_at::date = '2025-12-03'"
+    assert cache.stats()['hits'] == 1
+
+
+def test_unsafe_sql_not_templated():
+    """SQL с посторонними литералами или относительным временем не кэшируется"""
+    literals = normalize_question("Сколько видео вышло 28 ноября?").literals
+    assert make_sql_template(
+        "SELECT COUNT(id) FROM videos WHERE video_created_at >= '2025-11-28' AND video_created_at < '2025-11-29'",
+        literals,
+    ) is None
+    assert make_sql_template("SELECT COUNT(id) FROM videos WHERE video_created_at > now()", ()) is None
+
+
+def test_lru_eviction_and_ttl():
+    """Старые записи вытесняются, просроченные не возвращаются"""
+    cache = SQLTemplateCache(max_size=1, ttl=60)
+    cache.put("Сколько всего видео?", "SELECT COUNT(id) FROM videos")
+    cache.put("Сколько всего снапшотов?", "SELECT COUNT(id) FROM video_snapshots")
+    assert cache.get("Сколько всего видео?") is None
+    assert len(cache) == 1
+
+    cache = SQLTemplateCache(max_size=10, ttl=-1)
+    cache.put("Сколько всего видео?", "SELECT COUNT(id) FROM videos")
+    assert cache.get("Сколько всего видео?") is None
+
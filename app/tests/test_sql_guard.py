@@ -0,0 +1,35 @@
+"""
+Тесты проверки сгенерированного SQL (только один read-only SELECT)
+"""
+from app.services.sql_guard import SQLRejectedError, validate_sql
+
+
+def rejected(sql: str) -> str:
+    try:
+        validate_sql(sql)
+    except SQLRejectedError as e:
+        return e.reason
+    return ''
+
+
+def test_selects_are_allowed():
+    """Обычные запросы из промпта проходят, завершающая ; отбрасывается"""
+    assert validate_sql("SELECT COUNT(id) FROM videos;") == "SELECT COUNT(id) FROM videos"
+    assert validate_sql(
+        "WITH d AS (SELECT video_id FROM video_snapshots WHERE delta_views_count > 0) "
+        "SELECT COUNT(DISTINCT video_id) FROM d"
+    )
+    # Ключевые слова внутри литералов и имен колонок не мешают
+    assert validate_sql("SELECT COUNT(*) FROM videos WHERE creator_id = 'drop; delete' AND updated_at > created_at")
+
+
+def test_writes_and_multiple_statements_are_rejected():
+    """Изменение данных, несколько выражений и блокировки не допускаются"""
+    assert rejected("SELECT 1; DROP TABLE videos") == 'multiple_statements'
+    assert rejected("DELETE FROM videos") == 'not_select'
+    assert rejected("WITH x AS (DELETE FROM videos RETURNING 1) SELECT COUNT(*) FROM x") == 'forbidden_keyword'
+    assert rejected("SELECT * INTO backup FROM videos") == 'forbidden_keyword'
+    assert rejected("SELECT id FROM videos FOR UPDATE") == 'forbidden_keyword'
+    assert rejected("SELECT pg_sleep(100)") == 'forbidden_function'
+    assert rejected("-- комментарий\n") == 'empty'
+
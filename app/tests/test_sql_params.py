@@ -0,0 +1,64 @@
+"""
+Тесты выноса литералов SQL в bind-параметры
+"""
+from datetime import date
+
+from app.services.sql_params import parameterize
+
+
+def test_literals_become_params():
+    """Одна форма запроса — один текст SQL при разных значениях"""
+    first = parameterize(
+        "SELECT COUNT(id) FROM videos WHERE creator_id = 'c1' "
+        "AND (video_created_at >= DATE '2025-11-01' AND video_created_at < DATE '2025-11-06')"
+    )
+    second = parameterize(
+        "SELECT COUNT(id) FROM videos WHERE creator_id = 'c1' "
+        "AND (video_created_at >= DATE '2025-12-01' AND video_created_at < DATE '2025-12-02')"
+    )
+    assert first[0] == second[0] == (
+        "SELECT COUNT(id) FROM videos WHERE creator_id = 'c1' "
+        "AND (video_created_at >= CAST(:p0 AS date) AND video_created_at < CAST(:p1 AS date))"
+    )
+    assert first[1] == {'p0': date(2025, 11, 1), 'p1': date(2025, 11, 6)}
+
+    sql, params = parameterize("SELECT COUNT(id) FROM videos WHERE views_count > 100000 AND likes_count >= 0")
+    assert sql == "SELECT COUNT(id) FROM videos WHERE views_count > CAST(:p0 AS bigint) AND likes_count >= 0"
+    assert params == {'p0': 100000}
+
+    sql, params = parameterize(
+        "SELECT 1 WHERE d = '2025-11-29'::date AND e = CAST('2025-11-30' AS date) AND s = 'it''s'::text"
+    )
+    assert sql == "SELECT 1 WHERE d = CAST(:p0 AS date) AND e = CAST(:p1 AS date) AND s = CAST(:p2 AS text)"
+    assert params == {'p0': date(2025, 11, 29), 'p1': date(2025, 11, 30), 'p2': "it's"}
+
+
+def test_large_numbers_bind_as_bigint():
+    """Число больше int32 в сравнении с INTEGER-колонкой: параметр явно bigint"""
+    sql, params = parameterize("SELECT COUNT(id) FROM videos WHERE likes_count > 3000000000")
+    assert sql == "SELECT COUNT(id) FROM videos WHERE likes_count > CAST(:p0 AS bigint)"
+    assert params == {'p0': 3000000000}
+
+    sql = "SELECT COUNT(id) FROM videos WHERE views_count > 100000000000000000000"
+    assert parameterize(sql) == (sql, {})
+
+
+def test_typed_literals_are_kept():
+    """Интервалы, временные метки, дроби и позиционные ссылки остаются в тексте"""
+    sql = (
+        "SELECT COUNT(*) FROM video_snapshots WHERE created_at > now() - INTERVAL '7 days' "
+        "AND created_at < '2025-11-02 10:00:00'::timestamptz AND ratio > 1.5 ORDER BY 1 LIMIT 5"
+    )
+    assert parameterize(sql) == (sql, {})
+
+
+def test_untyped_strings_are_kept():
+    """Строка без явного типа остается литералом: тип параметра asyncpg вывел бы из колонки"""
+    # Строка на месте timestamptz: параметром str asyncpg отклоняет ее с DataError
+    sql = "SELECT COUNT(*) FROM video_snapshots WHERE created_at >= '2025-11-28 10:00:00+00'"
+    assert parameterize(sql) == (sql, {})
+
+    # Строка вида даты, сравниваемая с текстом: CAST(:p AS date) дал бы text = date
+    sql = "SELECT COUNT(*) FROM video_snapshots WHERE to_char(created_at, 'YYYY-MM-DD') = '2025-11-28'"
+    assert parameterize(sql) == (sql, {})
+
@@ -0,0 +1,53 @@
+"""
+Тесты переписывания ::date-фильтров в sargable-диапазоны
+"""
+from app.services.sql_rewriter import rewrite_date_predicates
+
+
+def test_equality_becomes_half_open_range():
+    """created_at::date = 'd' -> created_at >= DATE 'd' AND created_at < DATE 'd+1'"""
+    assert rewrite_date_predicates(
+        "SELECT COALESCE(SUM(delta_views_count), 0) FROM video_snapshots WHERE created_at::date = '2025-11-30'"
+    ) == (
+        "SELECT COALESCE(SUM(delta_views_count), 0) FROM video_snapshots "
+        "WHERE (created_at >= DATE '2025-11-30' AND created_at < DATE '2025-12-01')"
+    )
+
+
+def test_between_includes_last_day():
+    """BETWEEN по датам включает последний день целиком"""
+    assert rewrite_date_predicates(
+        "SELECT COUNT(id) FROM videos WHERE creator_id = 'abc' AND video_created_at::date BETWEEN '2025-11-01' AND '2025-11-05'"
+    ) == (
+        "SELECT COUNT(id) FROM videos WHERE creator_id = 'abc' "
+        "AND (video_created_at >= DATE '2025-11-01' AND video_created_at < DATE '2025-11-06')"
+    )
+
+
+def test_other_forms_and_operators():
+    """DATE(col), CAST(col AS date), DATE-литералы и операторы сравнения"""
+    assert rewrite_date_predicates(
+        "SELECT 1 FROM video_snapshots vs WHERE DATE(vs.created_at) > DATE '2025-12-31' "
+        "AND CAST(vs.created_at AS date) <= '2026-01-31'::date AND vs.created_at::date < '2026-02-01'"
+    ) == (
+        "SELECT 1 FROM video_snapshots vs WHERE vs.created_at >= DATE '2026-01-01' "
+        "AND vs.created_at < DATE '2026-02-01' AND vs.created_at < DATE '2026-02-01'"
+    )
+
+
+def test_plain_date_columns_untouched():
+    """Фильтры без приведения к дате не меняются"""
+    sql = "SELECT COALESCE(SUM(sum_delta_views_count), 0) FROM daily_snapshot_stats WHERE day = '2025-11-28'"
+    assert rewrite_date_predicates(sql) == sql
+
+
+def test_date_arithmetic_untouched():
+    """Литерал внутри выражения — не граница диапазона, сравнение остается как есть"""
+    for sql in (
+        "SELECT COUNT(*) FROM video_snapshots WHERE created_at::date = '2025-11-02'::date - 1",
+        "SELECT COUNT(*) FROM video_snapshots WHERE created_at::date = DATE '2025-11-02' - INTERVAL '1 day'",
+        "SELECT COUNT(*) FROM video_snapshots WHERE created_at::date >= '2025-11-02'::timestamptz",
+        "SELECT COUNT(*) FROM video_snapshots WHERE created_at::date BETWEEN '2025-11-01' AND '2025-11-05'::date + 1",
+    ):
+        assert rewrite_date_predicates(sql) == sql
+
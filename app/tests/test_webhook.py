@@ -0,0 +1,71 @@
+"""
+Тест webhook-режима на локальной замене Telegram (fake_telegram.py)
+"""
+import asyncio
+
+import aiohttp
+from aiogram import Bot, Dispatcher, F
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import Message
+from aiohttp import web
+
+from app.services.webhook import UpdateTracker, create_app
+from app.tests.fake_telegram import FakeTelegram
+
+
+def make_dispatcher(tracker: UpdateTracker) -> Dispatcher:
+    """Диспетчер с медленным эхо-обработчиком вместо LLM+SQL"""
+    dp = Dispatcher()
+    dp.update.outer_middleware(tracker)
+
+    @dp.message(F.text)
+    async def echo(message: Message):
+        await asyncio.sleep(0.3)
+        await message.answer(message.text.upper())
+
+    return dp
+
+
+def test_webhook_health_and_graceful_shutdown():
+    """Обновления приходят через webhook, а начатый обработчик успевает ответить при остановке"""
+    async def scenario():
+        fake = FakeTelegram()
+        await fake.start()
+
+        tracker = UpdateTracker()
+        bot = Bot(token="42:TEST", session=AiohttpSession(api=TelegramAPIServer.from_base(fake.api_url)))
+        runner = web.AppRunner(create_app(
+            bot, make_dispatcher(tracker), tracker,
+            webhook_url="http://127.0.0.1:0", secret="s3cret", register_webhook=False,
+        ))
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        fake.webhook_secret = "s3cret"
+
+        async with aiohttp.ClientSession() as session:
+            async with session.get(base + "/health") as response:
+                assert response.status == 200
+                assert (await response.json())['status'] == 'ok'
+
+        assert await fake.send_user_message("привет", webhook_url=base + "/webhook") == 200
+        assert (await fake.wait_sent(1))[0]['text'] == "ПРИВЕТ"
+
+        # Неверный секрет отклоняется
+        fake.webhook_secret = "wrong"
+        assert await fake.send_user_message("чужой", webhook_url=base + "/webhook") == 401
+        fake.webhook_secret = "s3cret"
+
+        # Остановка во время обработки: ответ все равно отправлен
+        await fake.send_user_message("последний", webhook_url=base + "/webhook")
+        await asyncio.sleep(0.05)
+        assert tracker.in_flight == 1
+        await runner.cleanup()
+        assert [message['text'] for message in fake.sent] == ["ПРИВЕТ", "ПОСЛЕДНИЙ"]
+
+        await fake.stop()
+
+    asyncio.run(scenario())
+
@@ -0,0 +1,103 @@
+"""
+Бенчмарк индексов models.py на запросах из системного промпта.
+
+Для каждого набора индексов (без вторичных индексов, старый btree по created_at,
+composite, covering, BRIN) прогоняет примеры из промпта в sargable-форме
+и выводит план и медианное время. Наборы сравниваются на одних и тех же данных.
+
+    python -m benchmarks.bench_indexes --videos 20000 --hours 720
+"""
+import argparse
+import asyncio
+import logging
+
+from sqlalchemy import text
+
+from app.database.db import engine
+from app.services.sql_rewriter import rewrite_date_predicates
+from benchmarks.common import DROP_TABLES, create_synthetic_tables, explain
+
+logger = logging.getLogger(__name__)
+
+# Название набора -> CREATE INDEX (индексы из models.py и прежний вариант схемы)
+INDEX_SETS = {
+    'без индексов': [],
+    'btree (created_at), (video_created_at)': [
+        "CREATE INDEX bench_snapshots_created_at ON video_snapshots (created_at)",
+        "CREATE INDEX bench_videos_created_at ON videos (video_created_at)",
+    ],
+    'composite (creator_id, video_created_at)': [
+        "CREATE INDEX bench_videos_creator_created_at ON videos (creator_id, video_created_at)",
+    ],
+    'covering (created_at) INCLUDE (video_id, delta_*)': [
+        "CREATE INDEX bench_snapshots_covering ON video_snapshots (created_at) "
+        "INCLUDE (video_id, delta_views_count, delta_likes_count, delta_comments_count, delta_reports_count)",
+    ],
+    'BRIN (created_at)': [
+        "CREATE INDEX bench_snapshots_brin ON video_snapshots USING brin (created_at)",
+    ],
+}
+INDEX_NAMES = [
+    'bench_snapshots_created_at', 'bench_videos_created_at', 'bench_videos_creator_created_at',
+    'bench_snapshots_covering', 'bench_snapshots_brin',
+]
+
+# Примеры из SYSTEM_PROMPT (app/services/llm_service.py)
+QUERIES = [
+    "SELECT COUNT(id) FROM videos WHERE creator_id = 'c7' AND video_created_at::date BETWEEN '2025-11-01' AND '2025-11-05'",
+    "SELECT COUNT(id) FROM videos WHERE views_count > 100000",
+    "SELECT COALESCE(SUM(delta_views_count), 0) FROM video_snapshots WHERE created_at::date = '2025-11-28'",
+    "SELECT COUNT(DISTINCT video_id) FROM video_snapshots WHERE created_at::date = '2025-11-27' AND delta_views_count > 0",
+    "SELECT COALESCE(SUM(delta_likes_count), 0) FROM video_snapshots WHERE created_at::date BETWEEN '2025-11-26' AND '2025-11-28'",
+]
+
+
+async def run(videos: int, hours: int, repeat: int):
+    """Прогоняет запросы на каждом наборе индексов"""
+    async with engine.connect() as conn:
+        # VACUUM нельзя выполнять в транзакции
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        logger.info(f"Генерация данных: {videos} видео, {videos // 10 * hours} снапшотов...")
+        await create_synthetic_tables(conn, videos, hours)
+        # Карта видимости нужна для index-only scan по covering-индексу
+        await conn.execute(text("VACUUM (ANALYZE) videos"))
+        await conn.execute(text("VACUUM (ANALYZE) video_snapshots"))
+
+        try:
+            results = {sql: [] for sql in QUERIES}
+            for name, statements in INDEX_SETS.items():
+                for index in INDEX_NAMES:
+                    await conn.execute(text(f"DROP INDEX IF EXISTS pg_temp.{index}"))
+                for statement in statements:
+                    await conn.execute(text(statement))
+                await conn.execute(text("ANALYZE videos"))
+                await conn.execute(text("ANALYZE video_snapshots"))
+
+                for sql in QUERIES:
+                    nodes, ms = await explain(conn, rewrite_date_predicates(sql), repeat)
+                    results[sql].append((name, ms, nodes))
+
+            for sql, rows in results.items():
+                baseline = rows[0][1]
+                print(f"\n{sql}")
+                for name, ms, nodes in rows:
+                    speedup = baseline / ms if ms else 0.0
+                    print(f"  {name:<52} {ms:8.2f} мс  x{speedup:<6.1f} {', '.join(nodes)}")
+        finally:
+            await conn.execute(text(DROP_TABLES))
+
+
+def main():
+    """Точка входа бенчмарка"""
+    parser = argparse.ArgumentParser(description="Бенчмарк индексов на запросах из промпта")
+    parser.add_argument("--videos", type=int, default=20000)
+    parser.add_argument("--hours", type=int, default=720, help="Сколько часовых снапшотов на видео")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(run(args.videos, args.hours, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
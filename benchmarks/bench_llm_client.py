@@ -0,0 +1,118 @@
+"""
+Бенчмарк клиента LLM (app/services/llm_client.py).
+
+Отправляет одни и те же запросы в локальную замену OpenAI с длинным хвостом
+задержек и долей ошибок 500 — напрямую через AsyncOpenAI (без повторов),
+через LLMClient без дублей и через LLMClient с дублем после квантиля
+задержек — и печатает p50/p95/p99, долю ошибок и число запросов к API.
+
+    python -m benchmarks.bench_llm_client --requests 300 --concurrency 10 --jitter 0.4 --failure-rate 0.05
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import Dict, List
+
+from openai import AsyncOpenAI
+
+from benchmarks.bench_pipeline import make_questions, percentile
+
+logger = logging.getLogger(__name__)
+
+
+async def measure(create, questions: List[str], concurrency: int) -> Dict[str, float]:
+    """Задает вопросы с заданной параллельностью и возвращает задержки и ошибки"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(question: str):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await create(
+                    model="gpt-4o-mini",
+                    messages=[{"role": "user", "content": question}],
+                    temperature=0,
+                    max_tokens=200,
+                )
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(question) for question in questions))
+    latencies.sort()
+    return {
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'errors_pct': errors / len(questions) * 100,
+    }
+
+
+async def run(args: argparse.Namespace):
+    from app.services.llm_client import CircuitBreaker, LLMClient
+    from app.tests.fake_openai import FakeOpenAI
+
+    questions = make_questions(args.requests, 1.0, creators=500, videos=1000, seed=args.seed)
+    fake = FakeOpenAI(
+        port=args.openai_port, latency=args.latency, jitter=args.jitter,
+        failure_rate=args.failure_rate, seed=args.seed,
+    )
+    await fake.start()
+    raw = AsyncOpenAI(api_key="fake", base_url=fake.base_url, max_retries=0, timeout=args.timeout)
+
+    def wrapped(hedge_quantile: float) -> LLMClient:
+        # Предохранитель не должен размыкаться от случайных 500 в бенчмарке
+        client = LLMClient(
+            raw, timeout=args.timeout, retry_delay=0.05, max_concurrent=args.concurrency * 2,
+            hedge_quantile=hedge_quantile, breaker=CircuitBreaker(failure_threshold=args.requests),
+        )
+        # Прогрев окна задержек, по которому считается порог дубля
+        client.latencies.extend(sorted(fake.delay() for _ in range(200)))
+        return client
+
+    scenarios = [
+        ('AsyncOpenAI', raw.chat.completions.create, None),
+        ('LLMClient', None, 0.0),
+        (f'LLMClient + дубль p{args.hedge_quantile * 100:.0f}', None, args.hedge_quantile),
+    ]
+    try:
+        print(f"{'':32s} {'p50, мс':>9s} {'p95, мс':>9s} {'p99, мс':>9s} {'ошибки':>8s} {'запросов':>9s}")
+        for title, create, hedge_quantile in scenarios:
+            client = wrapped(hedge_quantile) if create is None else None
+            before = fake.requests
+            result = await measure(create or client.create, questions, args.concurrency)
+            sent = (fake.requests - before) / len(questions)
+            print(
+                f"{title:32s} {result['p50_ms']:9.0f} {result['p95_ms']:9.0f} {result['p99_ms']:9.0f} "
+                f"{result['errors_pct']:7.1f}% {sent:8.2f}x"
+            )
+    finally:
+        await raw.close()
+        await fake.stop()
+
+
+def main():
+    """Точка входа бенчмарка"""
+    parser = argparse.ArgumentParser(description="Задержки и ошибки LLM с LLMClient и без него")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.2, help="Базовая задержка fake OpenAI, с")
+    parser.add_argument("--jitter", type=float, default=0.4, help="Средний экспоненциальный хвост задержки, с")
+    parser.add_argument("--failure-rate", type=float, default=0.05, help="Доля ответов 500")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Таймаут попытки, с")
+    parser.add_argument("--hedge-quantile", type=float, default=0.95)
+    parser.add_argument("--openai-port", type=int, default=8557)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Бенчмарк загрузчика: строк в секунду для разных режимов записи.
+
+Генерирует синтетический videos.json (benchmarks/generate_videos.py),
+пересоздает таблицы и загружает файл каждым режимом по очереди.
+ВНИМАНИЕ: удаляет все данные в БД из .env — запускается только с --reset.
+
+    python -m benchmarks.bench_loader --reset --videos 2000 --hours 72 --modes copy insert --parse-workers 4
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from app.database.db import drop_db, init_db
+from app.database.loader import BATCH_SIZE, WRITERS, iter_videos, load_data
+from app.storage.config import LOADER_CONCURRENCY, LOADER_PARSE_WORKERS
+from benchmarks.generate_videos import generate
+
+logger = logging.getLogger(__name__)
+
+
+async def run(path: str, rows: int, modes, batch_size: int, concurrency: int, parse_workers: int):
+    """Загружает файл каждым режимом в пустую БД и печатает строк/с"""
+    for mode in modes:
+        await drop_db()
+        await init_db()
+        started = time.perf_counter()
+        await load_data(path, batch_size=batch_size, mode=mode, concurrency=concurrency, parse_workers=parse_workers)
+        elapsed = time.perf_counter() - started
+        print(f"  {mode:8s} {rows} строк за {elapsed:6.2f} с — {rows / elapsed:10,.0f} строк/с")
+
+
+def main():
+    """Точка входа бенчмарка"""
+    parser = argparse.ArgumentParser(description="Бенчмарк загрузчика videos.json")
+    parser.add_argument("--reset", action="store_true", help="Подтверждение: таблицы будут пересозданы")
+    parser.add_argument("--path", help="Готовый JSON (по умолчанию генерируется во временный файл)")
+    parser.add_argument("--videos", type=int, default=2000)
+    parser.add_argument("--hours", type=int, default=72)
+    parser.add_argument("--modes", nargs="+", choices=sorted(WRITERS), default=sorted(WRITERS))
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=LOADER_CONCURRENCY)
+    parser.add_argument("--parse-workers", type=int, default=LOADER_PARSE_WORKERS)
+    args = parser.parse_args()
+
+    if not args.reset:
+        parser.error("бенчмарк пересоздает таблицы; добавьте --reset, если это тестовая БД")
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    path = args.path
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "bench_videos.json")
+        rows = generate(path, args.videos, args.hours)
+        print(f"Сгенерирован {path}: {args.videos} видео × {args.hours} снапшотов")
+    else:
+        rows = sum(1 + len(video.get('snapshots', [])) for video in iter_videos(Path(path)))
+
+    asyncio.run(run(path, rows, args.modes, args.batch_size, args.concurrency, args.parse_workers))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Бенчмарк разбора videos.json: строк в секунду в зависимости от числа процессов.
+
+Генерирует синтетический файл (benchmarks/generate_videos.py) и готовит из него
+батчи так же, как загрузчик, но без записи в БД — замеряется только разбор
+и сборка строк (--parse-workers загрузчика).
+
+    python -m benchmarks.bench_parse --videos 10000 --hours 72 --workers 1 2 4 8
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from app.database.loader import BATCH_SIZE, aiter_batches_parallel
+from benchmarks.generate_videos import generate
+
+
+async def parse(path: Path, workers: int) -> int:
+    """Готовит все батчи файла и возвращает число строк"""
+    rows = 0
+    async for videos, snapshots in aiter_batches_parallel(path, BATCH_SIZE, None, workers):
+        rows += len(videos) + len(snapshots)
+    return rows
+
+
+def main():
+    """Точка входа бенчмарка"""
+    parser = argparse.ArgumentParser(description="Бенчмарк разбора videos.json")
+    parser.add_argument("--path", help="Готовый JSON (по умолчанию генерируется во временный файл)")
+    parser.add_argument("--videos", type=int, default=10000)
+    parser.add_argument("--hours", type=int, default=72)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    path = args.path
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "bench_videos.json")
+        generate(path, args.videos, args.hours)
+    path = Path(path)
+    print(f"{path}: {path.stat().st_size / 2 ** 20:.0f} МиБ, ядер: {os.cpu_count()}")
+
+    for workers in args.workers:
+        started = time.perf_counter()
+        rows = asyncio.run(parse(path, workers))
+        elapsed = time.perf_counter() - started
+        print(f"  процессов {workers:2d}: {rows} строк за {elapsed:6.2f} с — {rows / elapsed:10,.0f} строк/с")
+
+
+if __name__ == '__main__':
+    main()
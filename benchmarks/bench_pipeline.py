@@ -0,0 +1,205 @@
+"""
+Нагрузочный бенчмарк конвейера вопросов.
+
+Поднимает локальную замену OpenAI (app/tests/fake_openai.py) с заданной
+задержкой, параллельно задает смесь типовых и "LLM-вопросов" через
+process_user_query() (или через планировщик бота) и печатает
+p50/p95/p99, пропускную способность и разбивку по источникам SQL.
+
+    python -m benchmarks.bench_pipeline --requests 500 --concurrency 50 --llm-latency 0.5
+    python -m benchmarks.bench_pipeline --json result.json --baseline baseline.json
+    python -m benchmarks.bench_pipeline --llm-token-latency 0.02 --llm-tail " -- пояснение ..." --stream
+    CACHE_STORE=sqlite python -m benchmarks.bench_pipeline  # второй запуск — с кэшами первого
+
+С --baseline бенчмарк завершается с кодом 1, если p95 или пропускная
+способность хуже базовых больше чем на --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Типовые вопросы: разбираются без LLM (fast_path)
+FAST_QUESTIONS = [
+    "Сколько всего видео есть в системе?",
+    "Сколько видео у креатора с id {creator} вышло с {day} по {day2} ноября 2025?",
+    "На сколько просмотров выросли все видео {day} ноября 2025?",
+    "Сколько разных видео получали новые лайки {day} ноября 2025?",
+]
+# Вопросы, для которых нужен LLM (при повторе формы срабатывает кэш SQL-шаблонов)
+LLM_QUESTIONS = [
+    "Какое среднее число просмотров у видео креатора с id {creator}?",
+    "Сколько снапшотов у видео с id {video}?",
+    "Сколько креаторов публиковали видео {day} ноября 2025?",
+]
+
+
+def make_questions(count: int, llm_share: float, creators: int, videos: int, seed: int) -> List[str]:
+    """Смесь вопросов со случайными креаторами, видео и датами"""
+    rng = random.Random(seed)
+    questions = []
+    for _ in range(count):
+        shapes = LLM_QUESTIONS if rng.random() < llm_share else FAST_QUESTIONS
+        day = rng.randint(1, 27)
+        questions.append(rng.choice(shapes).format(
+            creator=f"c{rng.randrange(creators):05d}",
+            video=f"v{rng.randrange(videos):08d}",
+            day=day,
+            day2=day + rng.randint(0, 3),
+        ))
+    return questions
+
+
+def percentile(values: List[float], share: float) -> float:
+    """Перцентиль по отсортированному списку (nearest rank)"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(share * len(values))) - 1))
+    return values[index]
+
+
+async def run(args: argparse.Namespace) -> Dict[str, float]:
+    """Выполняет нагрузку и возвращает сводку"""
+    # Модули приложения читают OPENAI_BASE_URL при импорте — импортируем после настройки окружения
+    from app.services.metrics import LLM_TOKENS, QUERIES
+    from app.services.query_service import process_user_query, query_scheduler, warmup_caches
+    from app.storage.cache_store import cache_store
+    from app.tests.fake_openai import FakeOpenAI
+
+    fake = FakeOpenAI(
+        port=args.openai_port,
+        latency=args.llm_latency,
+        jitter=args.llm_jitter,
+        failure_rate=args.failure_rate,
+        seed=args.seed,
+        token_latency=args.llm_token_latency,
+        tail=args.llm_tail,
+    )
+    await fake.start()
+    # С CACHE_STORE повторный прогон начинается с кэшами, сохраненными предыдущим
+    await warmup_caches()
+
+    questions = make_questions(args.requests, args.llm_share, args.creators, args.videos, args.seed)
+    latencies: List[float] = []
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for index, question in enumerate(questions):
+        queue.put_nowait((index, question))
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            index, question = queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                if args.scheduler:
+                    await query_scheduler.submit(index % args.users, question)
+                else:
+                    await process_user_query(question)
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                errors += 1
+
+    sources_before = {source: QUERIES.value(source=source) for source in ('columnar', 'fast_path', 'cache', 'llm')}
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+    elapsed = time.perf_counter() - started
+    await fake.stop()
+    await cache_store.close()
+
+    latencies.sort()
+    summary = {
+        'requests': len(questions),
+        'errors': errors,
+        'elapsed_s': elapsed,
+        'throughput_rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': (latencies[-1] if latencies else 0.0) * 1000,
+        'llm_requests': fake.requests,
+        'llm_failures': fake.failures,
+        'prompt_tokens': LLM_TOKENS.value(type='prompt'),
+        'cached_tokens': LLM_TOKENS.value(type='cached'),
+        'completion_tokens': LLM_TOKENS.value(type='completion'),
+    }
+    for source, before in sources_before.items():
+        summary[f'source_{source}'] = QUERIES.value(source=source) - before
+    return summary
+
+
+def print_summary(summary: Dict[str, float], baseline: Optional[Dict[str, float]]):
+    """Печатает сводку (и отличие от базовой)"""
+    for key, value in summary.items():
+        line = f"  {key:20s} {value:12.1f}" if isinstance(value, float) else f"  {key:20s} {value:12d}"
+        if baseline and key in baseline and baseline[key]:
+            line += f"   ({(value - baseline[key]) / baseline[key]:+.0%} к базовой)"
+        print(line)
+
+
+def regressions(summary: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    """Метрики, ухудшившиеся больше чем на tolerance"""
+    found = []
+    for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+        if baseline.get(key) and summary[key] > baseline[key] * (1 + tolerance):
+            found.append(f"{key}: {baseline[key]:.1f} -> {summary[key]:.1f}")
+    if baseline.get('throughput_rps') and summary['throughput_rps'] < baseline['throughput_rps'] * (1 - tolerance):
+        found.append(f"throughput_rps: {baseline['throughput_rps']:.1f} -> {summary['throughput_rps']:.1f}")
+    return found
+
+
+def main():
+    """Точка входа бенчмарка"""
+    parser = argparse.ArgumentParser(description="Нагрузочный бенчмарк process_user_query()")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--llm-share", type=float, default=0.3, help="Доля вопросов, которым нужен LLM")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Базовая задержка fake OpenAI, с")
+    parser.add_argument("--llm-jitter", type=float, default=0.2, help="Средний хвост задержки, с")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Доля ответов 500 от fake OpenAI")
+    parser.add_argument("--llm-token-latency", type=float, default=0.0, help="Время генерации токена fake OpenAI, с")
+    parser.add_argument("--llm-tail", default="", help="Текст, который fake OpenAI дописывает после SQL")
+    parser.add_argument("--stream", action="store_true", help="LLM_STREAMING=1: SQL выполняется сразу после ';'")
+    parser.add_argument("--openai-port", type=int, default=8555)
+    parser.add_argument("--scheduler", action="store_true", help="Задавать вопросы через планировщик бота")
+    parser.add_argument("--users", type=int, default=100, help="Число пользователей для --scheduler")
+    parser.add_argument("--creators", type=int, default=500)
+    parser.add_argument("--videos", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Сохранить сводку в JSON")
+    parser.add_argument("--baseline", help="JSON с базовой сводкой для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.openai_port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ["LLM_STREAMING"] = "1" if args.stream else "0"
+
+    summary = asyncio.run(run(args))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_summary(summary, baseline)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+    if baseline:
+        found = regressions(summary, baseline, args.tolerance)
+        if found:
+            print("Регрессия: " + "; ".join(found))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Бенчмарк bind-параметров (app/services/sql_params.py).
+
+На загруженных данных выполняет одни и те же формы запросов со случайными
+литералами: как есть (каждый текст разбирается и планируется заново) и после
+parameterize() (одно подготовленное выражение на форму). Данные не меняются.
+
+    python -m benchmarks.bench_prepared --queries 2000
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+
+from sqlalchemy import text
+
+from app.database.db import engine
+from app.services.fast_path import QueryIntent, intent_to_sql
+from app.services.sql_params import parameterize
+from app.services.sql_rewriter import rewrite_date_predicates
+
+logger = logging.getLogger(__name__)
+
+
+def make_queries(count: int, creators: list, seed: int) -> list:
+    """SQL быстрого пути со случайными креаторами, датами и порогами"""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        day = rng.randint(1, 27)
+        date_from = f"2025-11-{day:02d}"
+        date_to = f"2025-11-{day + rng.randint(0, 3):02d}"
+        intent = rng.choice([
+            QueryIntent('count_videos_by_creator', creator_id=rng.choice(creators), date_from=date_from, date_to=date_to),
+            QueryIntent('count_videos_threshold', metric='views', operator='>', threshold=rng.randint(1, 100000)),
+            QueryIntent('count_videos_with_growth', metric='likes', date_from=date_from, date_to=date_to),
+        ])
+        queries.append(rewrite_date_predicates(intent_to_sql(intent)))
+    return queries
+
+
+async def run(count: int, seed: int):
+    async with engine.connect() as conn:
+        creators = (await conn.execute(text("SELECT DISTINCT creator_id FROM videos"))).scalars().all()
+        if not creators:
+            print("Таблица videos пуста — сначала загрузите данные")
+            return
+        queries = make_queries(count, creators, seed)
+
+        for label, prepared in (("литералы", False), ("параметры", True)):
+            started = time.perf_counter()
+            for sql in queries:
+                if prepared:
+                    statement, params = parameterize(sql)
+                    await conn.execute(text(statement), params)
+                else:
+                    await conn.execute(text(sql))
+            elapsed = time.perf_counter() - started
+            print(f"  {label:10s} {elapsed / count * 1e6:8.0f} мкс/запрос ({count} запросов)")
+
+
+def main():
+    """Точка входа бенчмарка"""
+    parser = argparse.ArgumentParser(description="Бенчмарк подготовленных выражений с bind-параметрами")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(run(args.queries, args.seed))
+
+
+if __name__ == '__main__':
+    main()
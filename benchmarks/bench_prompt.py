@@ -0,0 +1,129 @@
+"""
+Бенчмарк промпта Text-to-SQL (app/services/prompt_builder.py).
+
+Задает одни и те же вопросы с прежним промптом (вся схема, все примеры,
+дата в середине), с PromptBuilder по умолчанию (все примеры в неизменном
+префиксе, дата в конце) и с PromptBuilder(examples_count=N) (примеры под
+вопрос после префикса) и печатает средние токены prompt/cached/completion
+и время ответа — с теплым кэшем префикса (частые вопросы) и с холодным
+(редкие вопросы: кэш провайдера живет минуты, первый вопрос после паузы
+платит за весь промпт).
+
+По умолчанию запросы идут в локальную замену OpenAI (app/tests/fake_openai.py),
+которая моделирует кэш префикса и время prefill; с --real — в настоящий API
+из .env (OPENAI_API_KEY, OPENAI_BASE_URL).
+
+    python -m benchmarks.bench_prompt --requests 50 --prefill 0.2 --examples 3
+    python -m benchmarks.bench_prompt --real --requests 20
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from benchmarks.bench_pipeline import make_questions, percentile
+
+logger = logging.getLogger(__name__)
+
+
+def legacy_messages(question: str) -> List[Dict[str, str]]:
+    """Прежний промпт: одно system-сообщение, дата в правилах, все примеры"""
+    from app.services.prompt_builder import EXAMPLES, format_examples, prompt_builder
+
+    current_date = datetime.now().strftime("%Y-%m-%d")
+    prompt = prompt_builder.prefix.replace(
+        "7. **Текущая дата** указана в конце, после примеров", f"7. **Текущая дата**: {current_date}"
+    )
+    prompt += "\n" + format_examples(EXAMPLES)
+    return [{"role": "system", "content": prompt}, {"role": "user", "content": question}]
+
+
+async def measure(client, build, questions: List[str]) -> Dict[str, float]:
+    """Последовательно задает вопросы и возвращает средние значения"""
+    latencies = []
+    totals = {'prompt': 0, 'cached': 0, 'completion': 0}
+    for question in questions:
+        started = time.perf_counter()
+        response = await client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=build(question),
+            temperature=0,
+            max_tokens=200,
+        )
+        latencies.append(time.perf_counter() - started)
+        usage = response.usage
+        details = getattr(usage, 'prompt_tokens_details', None)
+        totals['prompt'] += usage.prompt_tokens
+        totals['cached'] += (getattr(details, 'cached_tokens', None) or 0) if details else 0
+        totals['completion'] += usage.completion_tokens
+
+    latencies.sort()
+    count = len(questions)
+    return {
+        'prompt_tokens': totals['prompt'] / count,
+        'cached_tokens': totals['cached'] / count,
+        'uncached_tokens': (totals['prompt'] - totals['cached']) / count,
+        'completion_tokens': totals['completion'] / count,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'mean_ms': sum(latencies) / count * 1000,
+    }
+
+
+async def run(args: argparse.Namespace):
+    from app.services.llm_service import client
+    from app.services.prompt_builder import PromptBuilder
+
+    questions = make_questions(args.requests, 1.0, creators=500, videos=1000, seed=args.seed)
+    scenarios = [('теплый кэш префикса', True)] if args.real else [('теплый кэш префикса', True), ('холодный кэш', False)]
+    for title, prefix_cache in scenarios:
+        fake = None
+        if not args.real:
+            from app.tests.fake_openai import FakeOpenAI
+            fake = FakeOpenAI(
+                port=args.openai_port, latency=args.llm_latency, jitter=0.0,
+                prefill=args.prefill, prefix_cache=prefix_cache,
+            )
+            await fake.start()
+        try:
+            before = await measure(client, legacy_messages, questions)
+            shared = await measure(client, PromptBuilder(examples_count=0).build, questions)
+            selected = await measure(client, PromptBuilder(examples_count=args.examples).build, questions)
+        finally:
+            if fake:
+                await fake.stop()
+
+        print(f"{title}:")
+        print(f"  {'':20s} {'прежний':>10s} {'все примеры (0)':>16s} {f'под вопрос ({args.examples})':>16s}")
+        for key in before:
+            line = f"  {key:20s} {before[key]:10.1f}"
+            for value in (shared[key], selected[key]):
+                change = f"{(value - before[key]) / before[key]:+.0%}" if before[key] else ""
+                line += f" {value:8.1f} {change:>7s}"
+            print(line)
+
+
+def main():
+    """Точка входа бенчмарка"""
+    parser = argparse.ArgumentParser(description="Токены и время ответа для прежнего промпта и PromptBuilder")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--real", action="store_true", help="Настоящий OpenAI API вместо fake_openai")
+    parser.add_argument("--llm-latency", type=float, default=0.1, help="Базовая задержка fake OpenAI, с")
+    parser.add_argument("--prefill", type=float, default=0.2, help="Задержка fake OpenAI на 1000 некэшированных токенов, с")
+    parser.add_argument("--examples", type=int, default=3, help="Примеров под вопрос для PROMPT_EXAMPLES > 0")
+    parser.add_argument("--openai-port", type=int, default=8556)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if not args.real:
+        os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.openai_port}/v1"
+        os.environ.setdefault("OPENAI_API_KEY", "fake")
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
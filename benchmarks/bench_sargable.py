@@ -0,0 +1,69 @@
+"""
+Бенчмарк переписывания ::date-фильтров (app/services/sql_rewriter.py).
+
+Создает временные таблицы с синтетическими данными, строит те же индексы,
+что и models.py, и для каждого примера из промпта сравнивает план и время
+исходного запроса и переписанного.
+
+    python -m benchmarks.bench_sargable --videos 20000 --hours 720
+"""
+import argparse
+import asyncio
+import logging
+
+from sqlalchemy import text
+
+from app.database.db import engine
+from app.services.sql_rewriter import rewrite_date_predicates
+from benchmarks.common import create_synthetic_tables, explain
+
+logger = logging.getLogger(__name__)
+
+INDEXES = [
+    "CREATE INDEX ON videos (video_created_at)",
+    "CREATE INDEX ON video_snapshots (created_at)",
+    "ANALYZE videos",
+    "ANALYZE video_snapshots",
+]
+
+QUERIES = [
+    "SELECT COUNT(id) FROM videos WHERE creator_id = 'c7' AND video_created_at::date BETWEEN '2025-11-01' AND '2025-11-05'",
+    "SELECT COALESCE(SUM(delta_views_count), 0) FROM video_snapshots WHERE created_at::date = '2025-11-28'",
+    "SELECT COUNT(DISTINCT video_id) FROM video_snapshots WHERE created_at::date = '2025-11-27' AND delta_views_count > 0",
+    "SELECT COALESCE(SUM(delta_likes_count), 0) FROM video_snapshots WHERE created_at::date BETWEEN '2025-11-26' AND '2025-11-28'",
+]
+
+
+async def run(videos: int, hours: int, repeat: int):
+    """Сравнивает исходные и переписанные запросы на одних и тех же данных"""
+    async with engine.connect() as conn:
+        logger.info(f"Генерация данных: {videos} видео, {videos // 10 * hours} снапшотов...")
+        await create_synthetic_tables(conn, videos, hours)
+        for statement in INDEXES:
+            await conn.execute(text(statement))
+
+        for sql in QUERIES:
+            rewritten = rewrite_date_predicates(sql)
+            before_nodes, before_ms = await explain(conn, sql, repeat)
+            after_nodes, after_ms = await explain(conn, rewritten, repeat)
+            print(f"\n{sql}\n  -> {rewritten}")
+            print(f"  было:  {before_ms:8.2f} мс  {', '.join(before_nodes)}")
+            print(f"  стало: {after_ms:8.2f} мс  {', '.join(after_nodes)}")
+            print(f"  ускорение: x{before_ms / after_ms:.1f}" if after_ms else "")
+        await conn.rollback()
+
+
+def main():
+    """Точка входа бенчмарка"""
+    parser = argparse.ArgumentParser(description="Бенчмарк sargable-фильтров по датам")
+    parser.add_argument("--videos", type=int, default=20000)
+    parser.add_argument("--hours", type=int, default=720, help="Сколько часовых снапшотов на видео")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(run(args.videos, args.hours, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
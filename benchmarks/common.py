@@ -0,0 +1,84 @@
+"""
+Общие утилиты бенчмарков: синтетические временные таблицы и замеры запросов
+"""
+import json
+import time
+
+from sqlalchemy import text
+
+# Временные таблицы перекрывают одноименные таблицы схемы (pg_temp первым в search_path),
+# поэтому запросы из промпта выполняются без изменений
+CREATE_TABLES = [
+    """
+    CREATE TEMP TABLE videos (
+        id text PRIMARY KEY,
+        creator_id text NOT NULL,
+        video_created_at timestamptz NOT NULL,
+        views_count bigint NOT NULL,
+        likes_count integer NOT NULL
+    )
+    """,
+    """
+    CREATE TEMP TABLE video_snapshots (
+        id text PRIMARY KEY,
+        video_id text NOT NULL,
+        views_count bigint NOT NULL,
+        delta_views_count bigint NOT NULL,
+        delta_likes_count integer NOT NULL,
+        delta_comments_count integer NOT NULL,
+        delta_reports_count integer NOT NULL,
+        created_at timestamptz NOT NULL
+    )
+    """,
+]
+
+FILL_TABLES = [
+    """
+    INSERT INTO videos
+    SELECT 'v' || g, 'c' || (g % 50),
+           TIMESTAMPTZ '2025-11-01' + (g % (:hours)) * INTERVAL '1 hour',
+           (random() * 200000)::bigint, (random() * 5000)::int
+    FROM generate_series(1, :videos) AS g
+    """,
+    # Снапшоты вставляются в порядке времени, как их пишет загрузчик
+    """
+    INSERT INTO video_snapshots
+    SELECT 'v' || v || '-' || h, 'v' || v, 0,
+           (random() * 100)::bigint, (random() * 10)::int, (random() * 3)::int, (random() * 1.1)::int,
+           TIMESTAMPTZ '2025-11-01' + h * INTERVAL '1 hour'
+    FROM generate_series(0, :hours - 1) AS h, generate_series(1, :videos / 10) AS v
+    """,
+]
+
+DROP_TABLES = "DROP TABLE IF EXISTS pg_temp.video_snapshots, pg_temp.videos"
+
+
+async def create_synthetic_tables(conn, videos: int, hours: int):
+    """Создает и заполняет временные videos / video_snapshots (без вторичных индексов)"""
+    for statement in CREATE_TABLES + FILL_TABLES:
+        await conn.execute(text(statement), {'videos': videos, 'hours': hours})
+
+
+def plan_nodes(plan: dict) -> list:
+    """Типы узлов плана, обращающихся к таблицам"""
+    nodes = []
+    if 'Relation Name' in plan:
+        nodes.append(f"{plan['Node Type']} on {plan['Relation Name']}")
+    for child in plan.get('Plans', []):
+        nodes.extend(plan_nodes(child))
+    return nodes
+
+
+async def explain(conn, sql: str, repeat: int) -> tuple:
+    """Возвращает узлы плана и медианное время выполнения (мс)"""
+    result = await conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+    plan = result.scalar()
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await conn.execute(text(sql))
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return plan_nodes(plan[0]['Plan']), timings[len(timings) // 2]
@@ -0,0 +1,92 @@
+"""
+Генератор синтетического videos.json: N видео × M почасовых снапшотов.
+
+Файл пишется потоково и имеет тот же формат, что и data/videos.json,
+поэтому подходит для загрузчика и бенчмарков.
+
+    python -m benchmarks.generate_videos data/bench_videos.json --videos 10000 --hours 72
+"""
+import argparse
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List
+
+START = datetime(2025, 11, 1, tzinfo=timezone.utc)
+
+
+def iso(ts: datetime) -> str:
+    return ts.isoformat().replace('+00:00', 'Z')
+
+
+def make_video(index: int, hours: int, creators: int, rng: random.Random) -> Dict[str, Any]:
+    """Видео со снапшотами: счетчики монотонно растут, дельты — приросты за час"""
+    video_id = f"v{index:08d}"
+    published = START + timedelta(hours=rng.randrange(hours))
+    counters = {'views': 0, 'likes': 0, 'comments': 0, 'reports': 0}
+    snapshots: List[Dict[str, Any]] = []
+    for hour in range(hours):
+        created = START + timedelta(hours=hour)
+        deltas = {
+            'views': rng.randrange(200),
+            'likes': rng.randrange(12),
+            'comments': rng.randrange(3),
+            'reports': int(rng.random() < 0.02),
+        }
+        for metric, delta in deltas.items():
+            counters[metric] += delta
+        snapshots.append({
+            'id': f"{video_id}-{hour}",
+            'video_id': video_id,
+            **{f"{metric}_count": value for metric, value in counters.items()},
+            **{f"delta_{metric}_count": value for metric, value in deltas.items()},
+            'created_at': iso(created),
+            'updated_at': iso(created),
+        })
+
+    last = START + timedelta(hours=hours - 1)
+    return {
+        'id': video_id,
+        'creator_id': f"c{rng.randrange(creators):05d}",
+        'video_created_at': iso(published),
+        **{f"{metric}_count": value for metric, value in counters.items()},
+        'created_at': iso(last),
+        'updated_at': iso(last),
+        'snapshots': snapshots,
+    }
+
+
+def iter_videos(videos: int, hours: int, creators: int, seed: int) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(seed)
+    for index in range(videos):
+        yield make_video(index, hours, creators, rng)
+
+
+def generate(path: str, videos: int, hours: int, creators: int = 500, seed: int = 42) -> int:
+    """Пишет файл и возвращает общее количество строк (видео + снапшоты)"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"videos": [')
+        for index, video in enumerate(iter_videos(videos, hours, creators, seed)):
+            if index:
+                f.write(',')
+            json.dump(video, f, ensure_ascii=False, separators=(',', ':'))
+        f.write(']}')
+    return videos * (hours + 1)
+
+
+def main():
+    """Точка входа генератора"""
+    parser = argparse.ArgumentParser(description="Генерация синтетического videos.json")
+    parser.add_argument("path", nargs="?", default="data/bench_videos.json")
+    parser.add_argument("--videos", type=int, default=1000)
+    parser.add_argument("--hours", type=int, default=48, help="Сколько почасовых снапшотов у каждого видео")
+    parser.add_argument("--creators", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rows = generate(args.path, args.videos, args.hours, args.creators, args.seed)
+    print(f"{args.path}: {args.videos} видео, {rows - args.videos} снапшотов")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,7 +4,10 @@ Telegram-бот для аналитики видео
 import asyncio
 import logging
 import os
+import time
 from aiogram import Bot, Dispatcher, F
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.types import Message
 from aiogram.filters import Command
 from dotenv import load_dotenv
@@ -12,7 +15,14 @@ from dotenv import load_dotenv
 # Загружаем переменные окружения В ПЕРВУЮ ОЧЕРЕДЬ
 load_dotenv()
 
-from app.services.query_service import process_user_query
+from app.services.llm_client import LLMUnavailableError
+from app.services.metrics import SEND_LATENCY, log_event, start_metrics_server
+from app.services.query_service import query_scheduler, warmup_caches
+from app.services.question_normalizer import split_questions
+from app.services.scheduler import TooManyRequestsError
+from app.services.webhook import UpdateTracker, create_app, run_webhook, run_workers
+from app.storage.cache_store import cache_store
+from app.storage.config import BATCH_MAX_QUESTIONS, BOT_MODE, METRICS_PORT, TELEGRAM_API_URL, WEB_WORKERS, WEBAPP_HOST
 
 # Настройка логирования
 logging.basicConfig(
@@ -26,9 +36,31 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 if not BOT_TOKEN:
     raise ValueError("BOT_TOKEN не установлен в .env файле!")
 
-bot = Bot(token=BOT_TOKEN)
+# TELEGRAM_API_URL — локальный Bot API server или app/tests/fake_telegram.py
+session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)) if TELEGRAM_API_URL else None
+bot = Bot(token=BOT_TOKEN, session=session)
 dp = Dispatcher()
 
+# Учет начатых обработчиков для корректной остановки
+update_tracker = UpdateTracker()
+dp.update.outer_middleware(update_tracker)
+
+# Прогрев кэшей из постоянного хранилища — в фоне, не задерживая старт
+background_tasks = set()
+
+
+@dp.startup()
+async def on_startup():
+    task = asyncio.create_task(warmup_caches())
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+
+@dp.shutdown()
+async def on_shutdown():
+    # Дописываем начатые записи в хранилище кэша
+    await cache_store.flush()
+
 
 @dp.message(Command("start"))
 async def cmd_start(message: Message):
@@ -51,11 +83,26 @@ async def cmd_help(message: Message):
         "• Сколько видео у креатора с id XXX?\n"
         "• Сколько видео вышло с 1 по 5 ноября 2025?\n"
         "• На сколько просмотров выросли все видео 28 ноября?\n"
-        "• Сколько разных видео получали просмотры 27 ноября?\n"
+        "• Сколько разных видео получали просмотры 27 ноября?\n\n"
+        "Несколько вопросов можно задать одним сообщением — по одному на строке."
     )
     await message.answer(help_text)
 
 
+def format_batch_answer(results: list) -> str:
+    """Нумерованные ответы в порядке вопросов"""
+    lines = []
+    for number, result in enumerate(results, 1):
+        if isinstance(result, LLMUnavailableError):
+            lines.append(f"{number}. ⚠️ сейчас не могу ответить на такой вопрос, попробуйте позже")
+        elif isinstance(result, Exception):
+            logger.error(f"Ошибка при обработке вопроса {number}: {result}")
+            lines.append(f"{number}. 😔 не удалось ответить, переформулируйте вопрос")
+        else:
+            lines.append(f"{number}. {result}")
+    return "\n".join(lines)
+
+
 @dp.message(F.text)
 async def handle_text_message(message: Message):
     """Обработчик всех текстовых сообщений"""
@@ -66,19 +113,45 @@ async def handle_text_message(message: Message):
         return
     
     logger.info(f"Получен запрос от пользователя {message.from_user.id}: {user_query}")
+    started = time.perf_counter()
+    
+    # Несколько строк — несколько вопросов (BATCH_MAX_QUESTIONS=1 отключает разбиение)
+    questions = split_questions(user_query) if BATCH_MAX_QUESTIONS > 1 else [user_query]
+    if len(questions) > max(BATCH_MAX_QUESTIONS, 1):
+        await message.answer(f"Задайте не больше {BATCH_MAX_QUESTIONS} вопросов в одном сообщении.")
+        return
     
     try:
         # Отправляем индикатор "печатает..."
         await message.bot.send_chat_action(message.chat.id, "typing")
         
-        # Обрабатываем запрос через LLM + SQL
-        result = await process_user_query(user_query)
+        # Обрабатываем запрос через LLM + SQL (с ограничением параллельности)
+        if len(questions) > 1:
+            results = await query_scheduler.submit_batch(message.from_user.id, questions)
+            result = format_batch_answer(results)
+        else:
+            # Вопрос без маркера списка — тот же текст, что видят быстрый путь и кэш шаблонов
+            result = await query_scheduler.submit(message.from_user.id, questions[0])
         
         # Отправляем результат
-        await message.answer(str(result))
+        with SEND_LATENCY.time():
+            await message.answer(str(result))
         
         logger.info(f"Отправлен ответ пользователю {message.from_user.id}: {result}")
+        log_event('message', user_id=message.from_user.id, total_ms=round((time.perf_counter() - started) * 1000, 1))
         
+    except TooManyRequestsError as e:
+        logger.warning(str(e))
+        await message.answer("⏳ Слишком много вопросов подряд. Дождитесь ответов на предыдущие.")
+
+    except LLMUnavailableError as e:
+        # Предохранитель: без LLM отвечаем только на типовые вопросы и вопросы из кэша
+        logger.warning(f"LLM недоступен: {e}")
+        await message.answer(
+            "⚠️ Генерация запросов временно недоступна. Типовые вопросы (см. /help) "
+            "работают, остальные попробуйте задать позже."
+        )
+
     except Exception as e:
         logger.error(f"Ошибка при обработке запроса: {e}")
         error_message = (
@@ -89,7 +162,7 @@ async def handle_text_message(message: Message):
 
 
 async def main():
-    """Главная функция запуска бота"""
+    """Главная функция запуска бота (long polling)"""
     logger.info("Запуск бота...")
     
     # Проверяем наличие необходимых переменных окружения
@@ -99,15 +172,41 @@ async def main():
     
     logger.info("Бот успешно запущен и готов к работе!")
     
+    # В режиме webhook /metrics отдает webhook-сервер
+    metrics_runner = await start_metrics_server(WEBAPP_HOST, METRICS_PORT) if METRICS_PORT else None
+    
     # Запускаем polling
     try:
+        # getUpdates не работает, пока зарегистрирован webhook (после запуска в режиме webhook)
+        await bot.delete_webhook()
         await dp.start_polling(bot)
     finally:
+        await update_tracker.drain()
+        await cache_store.close()
         await bot.session.close()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+
+
+def serve_webhook(worker_index: int = 0):
+    """Запускает webhook-сервер в текущем процессе"""
+    # Webhook регистрирует один процесс, остальные только принимают обновления
+    app = create_app(
+        bot,
+        dp,
+        update_tracker,
+        register_webhook=worker_index == 0,
+        health=lambda: {'worker': worker_index, 'scheduler': query_scheduler.stats()},
+    )
+    logger.info(f"Webhook-сервер запущен (процесс {worker_index})")
+    run_webhook(app)
 
 
 if __name__ == '__main__':
-    try:
-        asyncio.run(main())
-    except KeyboardInterrupt:
-        logger.info("Бот остановлен пользователем.")
+    if BOT_MODE == 'webhook':
+        run_workers(serve_webhook, WEB_WORKERS)
+    else:
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            logger.info("Бот остановлен пользователем.")